@@ -1,20 +1,56 @@
 import argparse
+import asyncio
+import atexit
 import ipaddress
+import socket
+import socketserver
+import ssl
 import sys
 import os
 import json
 import base64
+import queue
+import gc
+import hashlib
+import heapq
+import hmac
+import io
+import multiprocessing
+import shutil
+import signal
+import tempfile
+import urllib.error
+import urllib.request
 import xml.etree.ElementTree as ET
-from playwright.sync_api import sync_playwright
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import threading
 import time
+import struct
+import tarfile
+import zipfile
+import zlib
 
-# Set Playwright browsers path for bundled executable
-if getattr(sys, 'frozen', False):
-    # Running as compiled executable
-    os.environ['PLAYWRIGHT_BROWSERS_PATH'] = os.path.join(sys._MEIPASS, 'playwright_browsers')
+try:
+    import mmh3  # Optional, fingerprint_mmh3() falls back to a pure Python MurmurHash3
+except ImportError:
+    mmh3 = None
+
+def get_sync_playwright():
+    """
+    Import Playwright when the browser engine actually starts.
+    Playwright is heavy to import, so CLI paths that never launch a browser
+    (-h, input validation errors, report generation) don't pay for it.
+    """
+    # Set Playwright browsers path for bundled executable
+    if getattr(sys, 'frozen', False):
+        # Running as compiled executable
+        os.environ['PLAYWRIGHT_BROWSERS_PATH'] = os.path.join(sys._MEIPASS, 'playwright_browsers')
+    
+    from playwright.sync_api import sync_playwright
+    return sync_playwright
 
 def get_resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -29,6 +65,20 @@ def get_resource_path(relative_path):
 # Thread safety lock for JSON file writing
 json_write_lock = threading.Lock()
 
+# Content-addressed screenshot store: paths already written, so duplicates cost a set lookup
+screenshot_store_lock = threading.Lock()
+screenshot_store_known = set()
+screenshot_store_failed = set()  # Paths the writer stage could not write, cleared from the results at the end
+
+# Screenshot writer stage of a scan (queue, threads and optional process pool), None when not running
+screenshot_writer = None
+screenshot_queue_size = 64  # Screenshots waiting to be written before the capture blocks
+screenshot_writer_threads = 2
+screenshot_optimize_enabled = False  # Lossless PNG recompression (--optimize-screenshots)
+
+# Warm browser of the current thread (serve subcommand)
+browser_local = threading.local()
+
 # Delay Configuration (in milliseconds)
 DELAY_FROM = 20
 DELAY_TO = 800
@@ -96,6 +146,9 @@ DEFAULT_PORTS_3 = [
 DEFAULT_PORTS_1_2 = DEFAULT_PORTS_1 + DEFAULT_PORTS_2
 DEFAULT_PORTS_ALL = DEFAULT_PORTS_1 + DEFAULT_PORTS_2 + DEFAULT_PORTS_3
 
+# Scanner service names that denote a web service (nmap, gnmap and JSON inputs)
+HTTP_SERVICE_KEYWORDS = ['http', 'https', 'web', 'www']
+
 # Variables used in the script
 # Variables used in the script
 ips_to_view = []
@@ -105,6 +158,7 @@ sockets_to_view = []
 visits = {}
 html = ""
 threads = 10
+workers = 1  # Scan processes, each running `threads` browser threads (--workers)
 verbosity_level = 0
 subdir_timestamped = False
 subdir_screenshots = False
@@ -114,6 +168,199 @@ output_json_filename = "pagehawk_results.json"
 output_json_final_filename = "pagehawk_results.json"  # Will be set based on args
 output_filename = "pagehawk_results.html"
 start_time = None  # Will track when recon starts
+visit_timeout = 30  # Navigation timeout of a visit in seconds
+visit_idle_timeout = 5  # Extra wait in seconds for the network to become idle after loading
+scan_stats = {
+    "scan_seconds": 0.0,  # Wall time of main_recon_process()
+    "json_writes": 0,  # Number of per-visit JSON dumps
+    "json_write_seconds": 0.0,  # Time spent dumping the JSON after each visit
+    "report_write_seconds": 0.0,  # Time spent generating and saving the final report
+    "screenshots_written": 0,  # Screenshots with new content, written to disk
+    "screenshots_deduplicated": 0  # Screenshots identical to a stored one, not written again
+}
+
+# Baseline Configuration (incremental rescans with --baseline)
+baseline_fresh_hours = 24  # Sockets visited more recently than this are not revisited
+baseline_timeout = 10  # Timeout in seconds of the revalidation requests
+baseline_max_body = 10 * 1024 * 1024  # Larger bodies are not hashed, the page is revisited
+
+# Diff Configuration (diff subcommand)
+diff_hash_size = 16  # The perceptual hash compares a 16x16 grid of brightness gradients (256 bits)
+diff_max_rows = 4096  # Only the top of long full-page screenshots is decoded
+diff_samples_per_cell = 8  # Pixels sampled per grid cell on each row
+
+# Scheduling Configuration (--max-duration, --priority)
+recon_deadline = None  # time.time() at which the scan must end, None for no limit
+recon_deadline_margin = 5  # Seconds kept free before the deadline to save the output
+recon_min_visit_seconds = 3  # No visit is started with less time than this before the deadline
+priority_hosts = set()  # IPs/URLs visited first (--priority)
+priority_sockets = set()  # "target:port" sockets visited first (--priority)
+PORT_TIERS = {port: tier for tier, ports in ((2, DEFAULT_PORTS_3), (1, DEFAULT_PORTS_2), (0, DEFAULT_PORTS_1)) for port in ports}
+
+# DNS Configuration (pre-resolution of the URL targets)
+dns_threads = 32  # Concurrent lookups of the pre-resolution stage
+dns_cache = {}  # Hostname -> resolved addresses ([] if it doesn't resolve), shared by all scans of the process
+dns_cache_expires = {}  # Hostname -> time.time() after which it is resolved again
+dns_cache_ttl = 300  # Seconds a resolved hostname is reused by later scans (serve jobs)
+dns_negative_ttl = 30  # Seconds a hostname that didn't resolve is reused
+dns_cache_lock = threading.Lock()
+dns_host_rules = ""  # Chromium --host-resolver-rules for the hostnames of the current scan
+dns_host_rules_max = 100000  # Longer rules are not passed to Chromium (command line length limit)
+
+# Viewport Configuration (--viewports)
+VIEWPORT_PROFILES = {
+    "desktop": {"width": 1280, "height": 720},
+    "laptop": {"width": 1440, "height": 900},
+    "tablet": {"width": 768, "height": 1024},
+    "mobile": {"width": 390, "height": 844}
+}
+viewports = []  # Profiles captured on each page, the first one is the main screenshot (empty: browser default)
+viewport_settle_ms = 300  # Wait after a resize for the layout to settle
+
+# Tracing Configuration (--trace)
+trace_percentile = None  # Traces of visits at or above this duration percentile are kept, None: no tracing
+trace_window = 1000  # Recent visit durations the percentile is computed on
+trace_min_samples = 20  # Below this many durations, only the traces of failed visits are kept
+trace_durations = []
+trace_lock = threading.Lock()
+trace_dirname = "traces"  # Folder of the kept traces in the output folder
+
+# Fingerprint Configuration (collected from the navigation of each visit)
+FINGERPRINT_FIELDS = {
+    "title": "",
+    "server": "",
+    "technologies": [],
+    "tls_subject": "",
+    "tls_issuer": "",
+    "tls_san": [],
+    "tls_valid_to": "",
+    "favicon_hash": ""
+}
+FINGERPRINT_HEADERS = {  # Header -> technology (None: the header value itself)
+    "x-powered-by": None,
+    "x-generator": None,
+    "x-aspnet-version": "ASP.NET",
+    "x-aspnetmvc-version": "ASP.NET MVC",
+    "x-drupal-cache": "Drupal",
+    "x-jenkins": "Jenkins",
+    "x-amz-cf-id": "Amazon CloudFront",
+    "cf-ray": "Cloudflare"
+}
+FINGERPRINT_COOKIES = {  # Session cookie name prefix -> technology
+    "PHPSESSID": "PHP",
+    "JSESSIONID": "Java",
+    "ASP.NET_SessionId": "ASP.NET",
+    "ASPSESSIONID": "ASP",
+    "laravel_session": "Laravel",
+    "ci_session": "CodeIgniter",
+    "csrftoken": "Django",
+    "wordpress_": "WordPress"
+}
+FINGERPRINT_SCRIPT = """() => {
+    const technologies = [];
+    const generator = document.querySelector('meta[name="generator" i]');
+    if (generator && generator.content) technologies.push(generator.content);
+    if (window.jQuery && window.jQuery.fn) technologies.push(window.jQuery.fn.jquery ? 'jQuery ' + window.jQuery.fn.jquery : 'jQuery');
+    if (window.React || document.querySelector('[data-reactroot], [data-reactid]')) technologies.push('React');
+    if (window.__NEXT_DATA__) technologies.push('Next.js');
+    if (window.Vue || document.querySelector('[data-v-app]')) technologies.push('Vue.js');
+    if (window.__NUXT__) technologies.push('Nuxt.js');
+    const angular = document.querySelector('[ng-version]');
+    if (angular) technologies.push('Angular ' + angular.getAttribute('ng-version'));
+    else if (window.angular) technologies.push('AngularJS');
+    if (document.querySelector('link[href*="/wp-content/"], script[src*="/wp-content/"]')) technologies.push('WordPress');
+    const icons = Array.from(document.querySelectorAll('link[rel~="icon" i]'), link => link.href);
+    icons.push(new URL('/favicon.ico', location.href).href);
+    return {technologies: technologies, icons: icons};
+}"""
+
+# Memory Governor Configuration (--memory-soft, --memory-hard)
+memory_soft_limit = None  # Bytes of RSS (PageHawk and its browsers) above which no new visit starts
+memory_hard_limit = None  # Bytes of RSS above which the biggest browser is recycled
+memory_sample_seconds = 1  # Sampling interval of the governor
+memory_recycle_seconds = 10  # Minimum time between two browser recycles
+memory_admit = threading.Event()  # Cleared by the governor while above the soft limit
+memory_admit.set()
+
+# Retry Configuration (--retries, --retry-threads)
+RETRY_RESPONSES = {"timeout", "reset", "error"}  # Transient failures, "refused" and "unreachable" are final
+retry_attempts = 1  # Retry rounds after the main pass
+retry_threads = 2  # Concurrent visits of the retry rounds (default: a quarter of --threads)
+retry_timeout_factor = 2  # Each retry round multiplies the visit timeout by this
+
+# Sharding Configuration (--workers)
+shard_queue = None  # Set in shard processes: progress and results are sent to the parent through it
+
+# Coordinator Configuration (--listen, see the worker subcommand)
+coordinator_lease_seconds = 300  # Sockets without a result after this time are leased to another worker
+coordinator_token = ""  # Shared secret expected from workers in the X-PageHawk-Token header
+
+# Serve Configuration (serve subcommand)
+serve_browsers = 10  # Warm browsers, also the maximum number of threads of a job
+serve_token = ""  # Shared secret expected from clients in the X-PageHawk-Token header
+serve_history = 100  # Finished jobs kept for status requests
+serve_queue = None  # Bounded queue of the jobs waiting to run
+serve_jobs = {}  # Job id -> job, queued, running and recently finished
+serve_job_counter = 0
+serve_condition = threading.Condition()  # Guards serve_jobs and the job events
+
+# Sharded Report Configuration (--report-shards, report --shards)
+report_shards = None  # None: single-file report, else "subnet", "port" or a number of sockets per shard
+report_shard_buffer = 10000  # Sockets held in memory before being appended to their shard files
+report_summary_top = 20  # Entries of the top lists in the index of a sharded report
+
+# Archive Configuration (--archive)
+output_archive = None  # Archive the scan streams its results into (see archive_open())
+archive_journal_records = 1000  # Visit records per journal member of the archive
+archive_journal_seconds = 60  # Buffered records are added at least this often
+
+# Live Report Configuration (--live-report)
+live_report = None  # Chunk files of the report written during the scan (see live_report_open())
+live_report_chunk_records = 500  # Visit records per chunk file
+live_report_chunk_seconds = 10  # Queued records are written at least this often
+live_report_poll_seconds = 5  # The page looks for new chunks this often
+
+# Logging Configuration (--log-json, progress line)
+PRINT_COLORS = {
+    "red": "\033[91m",
+    "green": "\033[92m",
+    "yellow": "\033[93m",
+    "blue": "\033[94m",
+    "magenta": "\033[95m",
+    "cyan": "\033[96m",
+    "white": "\033[97m",
+    "orange": "\033[38;5;208m",
+    "grey": "\033[90m",
+    "reset": "\033[0m"
+}
+PRINT_LEVELS = {  # Level -> (prefix, default color, name in the JSON log)
+    -1: ("[ERROR]:  ", "red", "error"),
+    0: ("", "white", "default"),
+    1: ("[WARNING]:", "yellow", "warning"),
+    2: ("[INFO]:   ", "cyan", "info"),
+    3: ("[DEBUG]:  ", "grey", "debug")
+}
+log_queue = None  # Messages for the logger thread (see log_start()), None: print2() writes directly
+log_thread = None
+log_lock = threading.Lock()  # Direct writes of print2() without the logger thread
+log_json_file = None  # JSON lines log of --log-json
+log_json_level = 2  # Messages up to this level go to the JSON log, whatever the verbosity
+progress_state = None  # Counters of the progress line (see progress_start())
+progress_lock = threading.Lock()
+progress_interval = 0.5  # Seconds between redraws of the progress line on a terminal
+progress_plain_interval = 10  # Seconds between progress lines when the output is not a terminal, and between JSON log progress records
+
+# Profiling Configuration (enabled with --profile)
+profile_enabled = False
+profile_sample_interval = 0.005  # Seconds between stack samples of the worker threads
+profile_pstats_filename = "pagehawk_profile.pstats"
+profile_speedscope_filename = "pagehawk_profile.speedscope.json"
+profile_summary_filename = "pagehawk_profile.json"
+profile_stats_lock = threading.Lock()
+profile_stage_profiles = []  # cProfile.Profile objects of the single-threaded stages
+profile_stage_times = {}  # Stage name -> wall time in seconds
+profile_thread_times = {}  # Thread name -> {"visits", "wall", "lock_wait", "lock_held"}
+profile_samples = {}  # Thread name -> {stack tuple: sampled seconds}
 
 
 def print2(text, color=None, level=0):
@@ -125,45 +372,255 @@ def print2(text, color=None, level=0):
      1 = warning (yellow)
      2 = info (cyan)
      3 = debug (light grey)
+    Messages are written by the logger thread when it runs (see log_start()),
+    and sent to the parent process from a --workers scan process.
     """
-    global verbosity_level
-    
-    # Don't print if verbosity level is too low
-    if level > verbosity_level:
+    # Don't print if verbosity level is too low (the JSON log may still want it)
+    if level > verbosity_level and (log_json_file is None or level > log_json_level):
         return
     
-    colors = {
-        "red": "\033[91m",
-        "green": "\033[92m",
-        "yellow": "\033[93m",
-        "blue": "\033[94m",
-        "magenta": "\033[95m",
-        "cyan": "\033[96m",
-        "white": "\033[97m",
-        "orange": "\033[38;5;208m",
-        "grey": "\033[90m",
-        "reset": "\033[0m"
-    }
+    if shard_queue is not None:
+        shard_queue.put(("log", text, color, level))
+    elif log_queue is not None:
+        log_queue.put((time.time(), text, color, level))
+    else:
+        output, json_line = log_format(time.time(), text, color, level)
+        with log_lock:
+            if output:
+                sys.stdout.write(output)
+                sys.stdout.flush()
+            if json_line:
+                log_json_file.write(json_line)
+
+def log_format(created, text, color, level):
+    """
+    Format a message for the terminal and for the JSON log.
+    Returns (terminal text, JSON line), either may be None.
+    """
+    prefix, default_color, level_name = PRINT_LEVELS.get(level, PRINT_LEVELS[0])
+    output = None
+    json_line = None
     
-    # Define default colors and prefixes for each level
-    level_config = {
-        -1: {"prefix": "[ERROR]:  ", "default_color": "red"},
-        1: {"prefix": "[WARNING]:", "default_color": "yellow"},
-        2: {"prefix": "[INFO]:   ", "default_color": "cyan"},
-        3: {"prefix": "[DEBUG]:  ", "default_color": "grey"},
-        0: {"prefix": "", "default_color": "white"}
-    }
+    if level <= verbosity_level:
+        # Use provided color or default color for the level
+        color_code = PRINT_COLORS.get((color or default_color).lower(), PRINT_COLORS["white"])
+        output = f"{color_code}{prefix} {text}{PRINT_COLORS['reset']}\n"
+    if log_json_file is not None and level <= log_json_level and text.strip():
+        json_line = json.dumps({
+            "time": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+            "level": level_name,
+            "message": text.strip()
+        }) + "\n"
+    
+    return output, json_line
+
+def log_start(json_path=None):
+    """
+    Start the logger thread: print2() only queues its messages, the thread
+    writes them in batches and keeps the progress line (see progress_start())
+    at the bottom of the terminal. With json_path, messages up to
+    log_json_level and periodic progress records are also written there as
+    JSON lines.
+    Returns True if successful, False otherwise.
+    """
+    global log_queue, log_thread, log_json_file
+    
+    if log_queue is not None:
+        return True
+    
+    if json_path:
+        try:
+            log_json_file = open(json_path, 'a', encoding='utf-8')
+        except OSError as e:
+            print2(f"Can't open the log file {json_path}: {str(e)}", level=-1)
+            return False
+    
+    log_queue = queue.Queue()
+    log_thread = threading.Thread(target=log_run, args=(log_queue,), name="pagehawk-logger", daemon=True)
+    log_thread.start()
+    atexit.register(log_stop)
+    return True
+
+def log_run(messages):
+    """
+    Logger thread: write the queued messages until it gets None, and refresh
+    the progress line every progress_interval seconds.
+    """
+    terminal = sys.stdout.isatty()
+    progress_shown = False  # The progress line is on screen, without a line break
+    progress_drawn = 0
+    progress_logged = time.time()
+    
+    while True:
+        try:
+            records = [messages.get(timeout=progress_interval)]
+        except queue.Empty:
+            records = []
+        # Everything queued meanwhile is written at once
+        while records and records[-1] is not None:
+            try:
+                records.append(messages.get_nowait())
+            except queue.Empty:
+                break
+        stopping = bool(records) and records[-1] is None
+        
+        output = []
+        json_lines = []
+        for record in records:
+            if record is not None:
+                text, json_line = log_format(*record)
+                if text:
+                    output.append(text)
+                if json_line:
+                    json_lines.append(json_line)
+        
+        now = time.time()
+        state = progress_state
+        if state is not None and state["closed"]:
+            state = None
+        progress = None
+        if state is not None and (state["finished"] or now - progress_drawn >= (progress_interval if terminal else progress_plain_interval)):
+            progress = progress_text(state)
+            progress_drawn = now
+            if log_json_file is not None and (state["finished"] or now - progress_logged >= progress_plain_interval):
+                json_lines.append(json.dumps(dict(progress_snapshot(state), stage=state["label"].lower(), time=datetime.fromtimestamp(now).isoformat(timespec="milliseconds"), level="progress")) + "\n")
+                progress_logged = now
+            # The final line stays on screen, progress_stop() waits for it
+            state["closed"] = state["finished"]
+        
+        if terminal and progress_shown and (output or progress):
+            # Messages go above the progress line, which is drawn again below them
+            output.insert(0, "\r\033[K")
+            progress_shown = False
+            if progress is None and state is not None:
+                progress = progress_text(state)
+        if progress:
+            if terminal:
+                # A wrapped line could not be redrawn in place
+                progress = progress[:shutil.get_terminal_size().columns - 1]
+            progress = f"{PRINT_COLORS['white']}{progress}{PRINT_COLORS['reset']}"
+            if terminal and not state["closed"]:
+                output.append(progress)
+                progress_shown = True
+            else:
+                output.append(progress + "\n")
+        
+        if output:
+            sys.stdout.write("".join(output))
+            sys.stdout.flush()
+        if json_lines:
+            log_json_file.write("".join(json_lines))
+            log_json_file.flush()
+        
+        if stopping:
+            if progress_shown:
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+            return
+
+def log_stop():
+    """
+    Write the queued messages and stop the logger thread.
+    """
+    global log_queue, log_thread, log_json_file
     
-    config = level_config.get(level, level_config[0])
-    prefix = config["prefix"]
+    if log_queue is None:
+        return
+    log_queue.put(None)
+    log_thread.join()
+    log_queue = None
+    log_thread = None
+    if log_json_file is not None:
+        log_json_file.close()
+        log_json_file = None
+
+def progress_start(total, label="Progress"):
+    """
+    Start the progress line of a scan over total sockets: completed count,
+    throughput, ETA, visits in flight and per-status tallies, redrawn in
+    place by the logger thread (one line every progress_plain_interval
+    seconds when the output is not a terminal).
+    """
+    global progress_state
     
-    # Use provided color or default color for the level
-    if color is None:
-        color = config["default_color"]
+    progress_state = {
+        "label": label,
+        "total": total,
+        "completed": 0,
+        "in_flight": 0,
+        "statuses": {},
+        "started": time.time(),
+        "finished": False,
+        "closed": False
+    }
+
+def progress_advance(response):
+    """
+    Count a completed socket and its response.
+    """
+    state = progress_state
+    if state is None:
+        return
+    status = str(response or "-")
+    with progress_lock:
+        state["completed"] += 1
+        state["statuses"][status] = state["statuses"].get(status, 0) + 1
+
+def progress_in_flight(count):
+    """
+    Set the number of visits in progress.
+    """
+    if progress_state is not None:
+        progress_state["in_flight"] = count
+
+def progress_stop():
+    """
+    Draw the final progress line and stop updating it.
+    """
+    global progress_state
     
-    color_code = colors.get(color.lower(), colors["white"])
-    reset_code = colors["reset"]
-    print(f"{color_code}{prefix} {text}{reset_code}")
+    state = progress_state
+    if state is None:
+        return
+    state["in_flight"] = 0
+    if log_queue is not None:
+        state["finished"] = True
+        # Wait for the logger thread to draw it, the next messages go below
+        deadline = time.time() + 2 * progress_interval + 1
+        while not state["closed"] and time.time() < deadline and log_thread.is_alive():
+            time.sleep(0.05)
+    progress_state = None
+
+def progress_snapshot(state):
+    """
+    Return the counters of the progress line with throughput and ETA.
+    """
+    with progress_lock:
+        completed = state["completed"]
+        statuses = dict(state["statuses"])
+    elapsed = max(time.time() - state["started"], 0.001)
+    rate = completed / elapsed
+    remaining = max(state["total"] - completed, 0)
+    return {
+        "completed": completed,
+        "total": state["total"],
+        "rate": round(rate, 2),
+        "eta_seconds": round(remaining / rate) if rate > 0 else None,
+        "in_flight": state["in_flight"],
+        "statuses": statuses
+    }
+
+def progress_text(state):
+    """
+    Format the progress line (without colors), statuses by decreasing count.
+    """
+    snapshot = progress_snapshot(state)
+    total = snapshot["total"]
+    percent = snapshot["completed"] * 100 / total if total else 100
+    eta = str(timedelta(seconds=snapshot["eta_seconds"])) if snapshot["eta_seconds"] is not None else "-"
+    statuses = ", ".join(f"{status}: {count}" for status, count in sorted(snapshot["statuses"].items(), key=lambda item: -item[1]))
+    return (f" {state['label']}: {snapshot['completed']}/{total} ({percent:.1f}%) | {snapshot['rate']:.1f}/s | "
+            f"ETA {eta} | {snapshot['in_flight']} in flight{f' | {statuses}' if statuses else ''}")
 
 def arguments_parse():
     """
@@ -230,6 +687,112 @@ def arguments_parse():
         default=10,
         help="Number of concurrent threads (default: 10)"
     )
+    parser.add_argument(
+        "--max-duration",
+        type=duration_parse,
+        help="Time budget of the whole run (e.g. 90m, 2h): the most valuable sockets are visited first, timeouts shrink near the end and the output is written in time"
+    )
+    parser.add_argument(
+        "--priority",
+        help="Targets to visit first (same formats as --input)"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=1,
+        help="Retry rounds for visits that failed with a timeout, reset or error, after the main pass (default: 1, 0 to disable)"
+    )
+    parser.add_argument(
+        "--retry-threads",
+        type=int,
+        help="Concurrent visits of the retry rounds (default: a quarter of --threads)"
+    )
+    parser.add_argument(
+        "--trace",
+        type=trace_percentile_parse,
+        nargs="?",
+        const=95,
+        metavar="PERCENTILE",
+        help="Record a Playwright trace of each visit, and keep it only for failed (error) visits and the visits at or above this duration percentile of the recent ones (default: 95, the slowest 5%%), in the traces folder"
+    )
+    parser.add_argument(
+        "--viewports",
+        type=viewport_parse,
+        help=f"Viewports captured from each loaded page, the first one is the main screenshot ({', '.join(VIEWPORT_PROFILES)} or WIDTHxHEIGHT, e.g. desktop,mobile)"
+    )
+    parser.add_argument(
+        "--optimize-screenshots",
+        action="store_true",
+        help="Losslessly recompress the screenshots in a process pool before writing them"
+    )
+    parser.add_argument(
+        "--report-shards",
+        type=report_shards_parse,
+        metavar="MODE",
+        help="Write a sharded report for very large scans: an index page, and shards loaded on demand by subnet, port, or N sockets each (subnet, port or N)"
+    )
+    parser.add_argument(
+        "--live-report",
+        action="store_true",
+        help="Write the HTML report when the scan starts and update it as visits complete: open it to triage partial results, it loads new results every few seconds"
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="FILE",
+        help="Stream the screenshots and visit records into a .tar, .tar.gz or .zip file as they are produced, then add the report and final JSON: the scan ends with one file to ship (screenshots are not kept as separate files)"
+    )
+    parser.add_argument(
+        "--memory-soft",
+        type=memory_size_parse,
+        help="Stop starting new visits while PageHawk and its browsers use more memory (RSS) than this, e.g. 6G"
+    )
+    parser.add_argument(
+        "--memory-hard",
+        type=memory_size_parse,
+        help="Recycle the biggest browser while PageHawk and its browsers use more memory (RSS) than this, e.g. 8G"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of scan processes, each with its own --threads browsers (default: 1)"
+    )
+    parser.add_argument(
+        "--listen",
+        metavar="HOST:PORT",
+        help="Coordinate a distributed scan: serve the sockets to `pagehawk.py worker` processes instead of visiting them"
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=int,
+        default=300,
+        help="With --listen, sockets without a result after this many seconds are leased to another worker (default: 300)"
+    )
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("PAGEHAWK_TOKEN", ""),
+        help="With --listen, shared secret the workers must send (default: PAGEHAWK_TOKEN environment variable)"
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Results JSON of a previous scan: only revisit changed or stale sockets and merge into it"
+    )
+    parser.add_argument(
+        "--baseline-fresh",
+        type=float,
+        default=24,
+        help="Sockets of the baseline visited within this many hours are not revisited (default: 24)"
+    )
+    parser.add_argument(
+        "--log-json",
+        metavar="FILE",
+        help="Also write the log as JSON lines to FILE (info messages whatever the verbosity, and progress records every 10 seconds)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the scan pipeline and write pstats/speedscope files to the output folder"
+    )
     parser.add_argument(
         "-v",
         action="count",
@@ -239,21 +802,85 @@ def arguments_parse():
     
     args = parser.parse_args()
     
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.retries < 0 or (args.retry_threads is not None and args.retry_threads < 1):
+        parser.error("--retries can't be negative and --retry-threads must be at least 1")
+    if args.memory_soft and args.memory_hard and args.memory_hard < args.memory_soft:
+        parser.error("--memory-hard must be above --memory-soft")
+    if args.profile and args.workers > 1:
+        parser.error("--profile can only profile a single scan process, use it without --workers")
+    if args.archive:
+        if not args.archive.lower().endswith((".zip", ".tar", ".tar.gz", ".tgz")):
+            parser.error("--archive must be a .zip, .tar, .tar.gz or .tgz file")
+        if args.workers > 1:
+            parser.error("--archive is written by a single scan process, use it without --workers")
+    if args.live_report:
+        if args.workers > 1:
+            parser.error("--live-report is written by a single scan process, use it without --workers")
+        if args.report_shards:
+            parser.error("--live-report can't be combined with --report-shards, it loads its results in chunks already")
+    if args.listen:
+        if args.workers > 1 or args.profile:
+            parser.error("--listen can't be combined with --workers or --profile")
+        if args.max_duration or args.priority:
+            parser.error("--max-duration and --priority schedule local visits, they can't be combined with --listen")
+        if args.viewports:
+            parser.error("--viewports can't be combined with --listen, workers upload a single screenshot")
+        if args.trace:
+            parser.error("--trace can't be combined with --listen, the visits run on the workers")
+        if ':' not in args.listen or not args.listen.rsplit(':', 1)[1].isdigit():
+            parser.error("--listen must be HOST:PORT")
+    
     # Set global verbosity level and threads
-    global verbosity_level, threads
+    global verbosity_level, threads, workers, profile_enabled, baseline_fresh_hours
+    global coordinator_lease_seconds, coordinator_token, recon_deadline
+    global retry_attempts, retry_threads, memory_soft_limit, memory_hard_limit, viewports
+    global screenshot_optimize_enabled, report_shards, log_json_level, trace_percentile
     verbosity_level = args.v
+    log_json_level = max(log_json_level, verbosity_level)
+    if not log_start(args.log_json):
+        sys.exit(1)
     threads = args.threads
+    retry_attempts = args.retries
+    retry_threads = args.retry_threads or max(1, threads // 4)
+    memory_soft_limit = args.memory_soft
+    viewports = args.viewports or []
+    trace_percentile = args.trace
+    screenshot_optimize_enabled = args.optimize_screenshots
+    report_shards = args.report_shards
+    memory_hard_limit = args.memory_hard
+    workers = args.workers
+    profile_enabled = args.profile
+    baseline_fresh_hours = args.baseline_fresh
+    coordinator_lease_seconds = args.lease_seconds
+    coordinator_token = args.token
+    if args.max_duration:
+        # The budget covers the whole run, input parsing and output included
+        recon_deadline = time.time() + args.max_duration
     
     print2("PageHawk - Reconnaissance Tool", level=0)
     print2("=" * 50, level=0)
     print2(f"Input: {args.input}", level=0)
     print2(f"Output: {args.output}", level=0)
     print2(f"Threads: {threads}", level=0)
+    if workers > 1:
+        print2(f"Workers: {workers} processes ({workers * threads} threads in total)", level=0)
+    if args.max_duration:
+        print2(f"Max duration: {format_elapsed(args.max_duration)}", level=0)
     print2("=" * 50, level=0)
     print2("", level=0)
     
     return args
 
+def input_targets():
+    """
+    Return the module-level target lists used by the command-line scan.
+    The input and build functions accept another dict with the same keys,
+    which is how Scanner keeps its own targets.
+    """
+    return {"ips": ips_to_view, "urls": urls_to_view, "ports": ports_to_view, "sockets": sockets_to_view}
+
 def input_ip_split(input_value):
     """
     Split input value by commas if it contains commas.
@@ -279,37 +906,33 @@ def input_ip_parse_input_file(filepath):
     targets = []
     
     try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-        
         print2(f"Reading targets from file: {filepath}", level=3)
         
-        # Split by newlines first
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Skip empty lines and comments
-            if not line or line.startswith('#'):
-                continue
-            
-            # Try splitting by different delimiters
-            # First try comma
-            if ',' in line:
-                parts = [p.strip() for p in line.split(',')]
-                targets.extend([p for p in parts if p])
-            # Then try tab
-            elif '\t' in line:
-                parts = [p.strip() for p in line.split('\t')]
-                targets.extend([p for p in parts if p])
-            # Then try space (but be careful with CIDR notation which has no spaces)
-            elif ' ' in line:
-                parts = [p.strip() for p in line.split(' ')]
-                targets.extend([p for p in parts if p])
-            # Single entry per line
-            else:
-                targets.append(line)
+        # Read line by line instead of loading the whole file
+        with open(filepath, 'r') as f:
+            for line in f:
+                line = line.strip()
+                
+                # Skip empty lines and comments
+                if not line or line.startswith('#'):
+                    continue
+                
+                # Try splitting by different delimiters
+                # First try comma
+                if ',' in line:
+                    parts = [p.strip() for p in line.split(',')]
+                    targets.extend([p for p in parts if p])
+                # Then try tab
+                elif '\t' in line:
+                    parts = [p.strip() for p in line.split('\t')]
+                    targets.extend([p for p in parts if p])
+                # Then try space (but be careful with CIDR notation which has no spaces)
+                elif ' ' in line:
+                    parts = [p.strip() for p in line.split(' ')]
+                    targets.extend([p for p in parts if p])
+                # Single entry per line
+                else:
+                    targets.append(line)
         
         print2(f"Parsed {len(targets)} targets from file", level=3)
         return targets
@@ -325,93 +948,35 @@ def input_ip_parse_nmap_file(filepath):
     """
     Parse an nmap XML file and extract IP:port combinations for HTTP services.
     Looks for ports with HTTP-related services (http, https, http-proxy, etc.) that are open.
+    The file is parsed incrementally, one host element at a time.
     
     Returns a list of "ip:port" strings, or None on error.
     """
     sockets = []
     
     try:
-        # First, check if this is an nmap XML file
+        # First, check if this is an nmap XML file (the DOCTYPE comes before any host)
         with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+            head = f.read(4096)
         
-        if '<!DOCTYPE nmaprun>' not in content:
+        if '<!DOCTYPE nmaprun>' not in head:
             print2(f"File {filepath} is not a valid nmap XML file (missing DOCTYPE nmaprun)", level=-1)
             return None
         
         print2(f"Parsing nmap XML file: {filepath}", level=3)
         
-        # Parse the XML
-        root = ET.fromstring(content)
-        
-        # Iterate through all host elements
-        for host in root.findall('host'):
-            # Get the IP address from the address element
-            address_elem = host.find('address[@addrtype="ipv4"]')
-            if address_elem is None:
-                # Try IPv6 if IPv4 not found
-                address_elem = host.find('address[@addrtype="ipv6"]')
-            
-            if address_elem is None:
-                print2(f"No IP address found for host, skipping", level=3)
-                continue
-            
-            ip_addr = address_elem.get('addr')
-            
-            # Check for user-provided hostname first
-            target = ip_addr  # Default to IP address
-            hostnames_elem = host.find('hostnames')
-            if hostnames_elem is not None:
-                # Look for hostname with type="user"
-                for hostname_elem in hostnames_elem.findall('hostname'):
-                    if hostname_elem.get('type') == 'user':
-                        target = hostname_elem.get('name')
-                        print2(f"Found host: {target} (user-provided hostname, IP: {ip_addr})", level=3)
-                        break
-                else:
-                    # No user-provided hostname found, use IP
-                    print2(f"Found host: {ip_addr} (no user-provided hostname)", level=3)
-            else:
-                print2(f"Found host: {ip_addr} (no hostnames)", level=3)
-            
-            # Find the ports element
-            ports_elem = host.find('ports')
-            if ports_elem is None:
-                print2(f"No ports found for {target}, skipping", level=3)
-                continue
-            
-            # Iterate through all port elements
-            for port in ports_elem.findall('port'):
-                # Get port ID
-                port_id = port.get('portid')
-                
-                # Check if port is open
-                state_elem = port.find('state')
-                if state_elem is None or state_elem.get('state') != 'open':
-                    print2(f"Port {port_id} on {target} is not open, skipping", level=3)
-                    continue
-                
-                # Check if service is HTTP-related
-                service_elem = port.find('service')
-                if service_elem is not None:
-                    service_name = service_elem.get('name', '').lower()
-                    
-                    # Look for HTTP-related services
-                    http_keywords = ['http', 'https', 'web', 'www']
-                    is_http_service = any(keyword in service_name for keyword in http_keywords)
-                    
-                    if is_http_service:
-                        socket = f"{target}:{port_id}"
-                        sockets.append(socket)
-                        print2(f"Found HTTP service: {socket} (service: {service_name})", level=2)
-                    else:
-                        print2(f"Port {port_id} on {target} has non-HTTP service: {service_name}, skipping", level=3)
-                else:
-                    print2(f"No service information for port {port_id} on {target}, skipping", level=3)
+        # Parse the XML host by host, dropping each host element once processed
+        root = None
+        for event, elem in ET.iterparse(filepath, events=("start", "end")):
+            if root is None:
+                root = elem
+            if event == "end" and elem.tag == "host":
+                sockets.extend(input_nmap_host_sockets(elem))
+                root.clear()
         
         print2(f"Parsed {len(sockets)} HTTP sockets from nmap file", level=2)
         return sockets
-        
+    
     except FileNotFoundError:
         print2(f"File not found: {filepath}", level=-1)
         return None
@@ -422,19 +987,241 @@ def input_ip_parse_nmap_file(filepath):
         print2(f"Error reading nmap file {filepath}: {str(e)}", level=-1)
         return None
 
-def input_ip_check_target_validity(target):
+def input_nmap_host_sockets(host):
+    """
+    Return the "target:port" sockets of the open HTTP services of an nmap XML
+    host element. The target is the user-provided hostname if any, else the IP.
+    """
+    sockets = []
+    
+    # Get the IP address from the address element
+    address_elem = host.find('address[@addrtype="ipv4"]')
+    if address_elem is None:
+        # Try IPv6 if IPv4 not found
+        address_elem = host.find('address[@addrtype="ipv6"]')
+    
+    if address_elem is None:
+        print2(f"No IP address found for host, skipping", level=3)
+        return sockets
+    
+    ip_addr = address_elem.get('addr')
+    
+    # Check for user-provided hostname first
+    target = ip_addr  # Default to IP address
+    hostnames_elem = host.find('hostnames')
+    if hostnames_elem is not None:
+        # Look for hostname with type="user"
+        for hostname_elem in hostnames_elem.findall('hostname'):
+            if hostname_elem.get('type') == 'user':
+                target = hostname_elem.get('name')
+                print2(f"Found host: {target} (user-provided hostname, IP: {ip_addr})", level=3)
+                break
+        else:
+            # No user-provided hostname found, use IP
+            print2(f"Found host: {ip_addr} (no user-provided hostname)", level=3)
+    else:
+        print2(f"Found host: {ip_addr} (no hostnames)", level=3)
+    
+    # Find the ports element
+    ports_elem = host.find('ports')
+    if ports_elem is None:
+        print2(f"No ports found for {target}, skipping", level=3)
+        return sockets
+    
+    # Iterate through all port elements
+    for port in ports_elem.findall('port'):
+        # Get port ID
+        port_id = port.get('portid')
+        
+        # Check if port is open
+        state_elem = port.find('state')
+        if state_elem is None or state_elem.get('state') != 'open':
+            print2(f"Port {port_id} on {target} is not open, skipping", level=3)
+            continue
+        
+        # Check if service is HTTP-related
+        service_elem = port.find('service')
+        if service_elem is not None:
+            service_name = service_elem.get('name', '').lower()
+            
+            # Look for HTTP-related services
+            if input_service_is_http(service_name):
+                socket = f"{target}:{port_id}"
+                sockets.append(socket)
+                print2(f"Found HTTP service: {socket} (service: {service_name})", level=2)
+            else:
+                print2(f"Port {port_id} on {target} has non-HTTP service: {service_name}, skipping", level=3)
+        else:
+            print2(f"No service information for port {port_id} on {target}, skipping", level=3)
+    
+    return sockets
+
+def input_service_is_http(service_name):
+    """
+    Return True if a scanner service name looks like a web service.
+    """
+    return any(keyword in service_name.lower() for keyword in HTTP_SERVICE_KEYWORDS)
+
+def input_scan_format(filepath):
+    """
+    Detect the scanner output format of a file from its first lines:
+    "gnmap" (nmap -oG), "masscan" (masscan -oL), "json" (masscan -oJ, or JSON
+    lines of host/port records), or None for anything else.
+    """
+    if filepath.lower().endswith('.gnmap'):
+        return "gnmap"
+    
+    try:
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            for line_number, line in enumerate(f):
+                if line_number >= 50:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("Host: ") or (line.startswith("# Nmap") and "-oG" in line):
+                    return "gnmap"
+                if line.startswith("#masscan") or line.split()[:2] == ["open", "tcp"]:
+                    return "masscan"
+                if line.startswith("{") or line.replace(" ", "") in ("[", "[{"):
+                    return "json"
+                if not line.startswith("#"):
+                    return None
+    except OSError:
+        return None
+    return None
+
+def input_gnmap_records(f):
+    """
+    Yield (host, port, service) for the open TCP ports of an nmap greppable
+    (-oG) output, one line at a time.
+    Line format: "Host: <ip> (<name>)<tab>Ports: <port>/<state>/<proto>/<owner>/<service>/<rpc>/<version>/, ..."
+    """
+    for line in f:
+        if not line.startswith("Host: ") or "\tPorts: " not in line:
+            continue
+        host = line[6:].split(" ", 1)[0]
+        ports_field = line.split("\tPorts: ", 1)[1].split("\t", 1)[0]
+        for port_entry in ports_field.split(","):
+            fields = port_entry.strip().split("/")
+            if len(fields) >= 5 and fields[1] == "open" and fields[2] == "tcp":
+                yield host, fields[0], fields[4]
+
+def input_masscan_records(f):
+    """
+    Yield (host, port, service) for the open TCP ports of a masscan list
+    (-oL) output, one line at a time. masscan doesn't name services.
+    Line format: "open tcp <port> <ip> <timestamp>"
+    """
+    for line in f:
+        parts = line.split()
+        if len(parts) >= 4 and parts[0] == "open" and parts[1] == "tcp":
+            yield parts[3], parts[2], ""
+
+def input_json_records(f):
+    """
+    Yield (host, port, service) from one JSON record per line: masscan -oJ
+    ({"ip", "ports": [{"port", "proto", "status"}]}, inside a "[ ... ]" array
+    with trailing commas) or host/port records like naabu's
+    ({"host" or "ip", "port", optional "service"}).
+    """
+    for line in f:
+        line = line.strip().rstrip(",")
+        if not line or line in ("[", "]") or line.startswith("#"):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            print2(f"Skipping invalid JSON record: {line[:100]}", level=3)
+            continue
+        if not isinstance(record, dict):
+            continue
+        
+        host = record.get("host") or record.get("ip") or record.get("address")
+        if not host:
+            continue
+        if isinstance(record.get("ports"), list):
+            for port_record in record["ports"]:
+                if not isinstance(port_record, dict):
+                    continue
+                if port_record.get("status", "open") == "open" and port_record.get("proto", "tcp") == "tcp":
+                    service = port_record.get("service")
+                    yield host, port_record.get("port"), service.get("name", "") if isinstance(service, dict) else ""
+        elif "port" in record:
+            service = record.get("service")
+            yield host, record["port"], service if isinstance(service, str) else ""
+
+def input_scan_parse(filepath, scan_format, targets):
+    """
+    Stream the open web sockets of a scanner output file into targets["sockets"],
+    without loading the file: a port counts as web when its service name looks
+    like HTTP or, when the scanner doesn't name services, when it is one of
+    DEFAULT_PORTS_ALL. Scanners report a socket again on each rescan or banner,
+    it is only kept once.
+    Returns True if successful, False otherwise.
+    """
+    readers = {"gnmap": input_gnmap_records, "masscan": input_masscan_records, "json": input_json_records}
+    web_ports = set(DEFAULT_PORTS_ALL)
+    seen = set(targets["sockets"])
+    records = 0
+    added = 0
+    
+    try:
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            for host, port, service in readers[scan_format](f):
+                records += 1
+                try:
+                    port_num = int(port)
+                except (TypeError, ValueError):
+                    continue
+                if not 1 <= port_num <= 65535:
+                    continue
+                if not (input_service_is_http(service) if service else port_num in web_ports):
+                    continue
+                if ':' in host:
+                    # IPv6 address, the socket keeps the last colon for the port
+                    host = host.strip("[]")
+                socket_value = f"{host}:{port_num}"
+                if socket_value in seen:
+                    continue
+                seen.add(socket_value)
+                targets["sockets"].append(socket_value)
+                added += 1
+    except OSError as e:
+        print2(f"Error reading {scan_format} file {filepath}: {str(e)}", level=-1)
+        return False
+    
+    print2(f"Parsed {added} web sockets out of {records} open ports from {scan_format} file", level=2)
+    return True
+
+def ip_address_check(value):
     """
-    Check if the given target is valid and add it to the appropriate list.
+    Validate an IP address, raising ValueError like ipaddress.ip_address() does.
+    socket.inet_pton is much cheaper than building an ipaddress object, which
+    matters for inputs with millions of targets.
+    """
+    try:
+        socket.inet_pton(socket.AF_INET6 if ':' in value else socket.AF_INET, value)
+    except (OSError, TypeError):
+        raise ValueError(f"{value!r} does not appear to be an IPv4 or IPv6 address")
+
+def input_ip_check_target_validity(target, targets=None):
+    """
+    Check if the given target is valid and add it to the appropriate list
+    of targets (see input_targets()).
     Supports: URLs (http://..., https://...), single IPs, CIDR notation, IP:port format, and domain names.
     Returns True if valid, False otherwise.
     """
+    if targets is None:
+        targets = input_targets()
+    
     try:
         target = target.strip()
         
         # Check 1: Is it a URL? (starts with http:// or https://)
         if target.startswith('http://') or target.startswith('https://'):
             print2(f"Found URL: {target}", level=3)
-            urls_to_view.append(target)
+            targets["urls"].append(target)
             return True
         
         # Check 2: Is it an IP with port? (contains : but not /)
@@ -448,12 +1235,12 @@ def input_ip_check_target_validity(target):
                 
                 try:
                     # Validate IP part
-                    ipaddress.ip_address(ip_part)
+                    ip_address_check(ip_part)
                     # Validate port part
                     port_num = int(port_part)
                     if 1 <= port_num <= 65535:
                         print2(f"Found IP:port socket: {target}", level=3)
-                        sockets_to_view.append(target)
+                        targets["sockets"].append(target)
                         return True
                     else:
                         print2(f"Port out of range in socket: {target}", level=-1)
@@ -461,7 +1248,7 @@ def input_ip_check_target_validity(target):
                 except (ValueError, ipaddress.AddressValueError):
                     # Not a valid IP:port, might be a domain:port or URL without protocol
                     print2(f"Found domain:port or URL without protocol: {target}", level=3)
-                    urls_to_view.append(target)
+                    targets["urls"].append(target)
                     return True
             
         # Check 3: Is it CIDR notation? (contains /)
@@ -473,35 +1260,36 @@ def input_ip_check_target_validity(target):
             
             # Try to validate if base_part is an IP address
             try:
-                ipaddress.ip_address(base_part)
+                ip_address_check(base_part)
                 # It's an IP, so this might be CIDR notation
                 # Now try to parse as CIDR
                 try:
                     print2(f"Found CIDR notation: {target}", level=3)
                     network = ipaddress.ip_network(target, strict=False)
+                    ips_before = len(targets["ips"])
                     for host in network.hosts():
-                        ips_to_view.append(str(host))
+                        targets["ips"].append(str(host))
                     # If it's a /32 or /31, hosts() returns empty, so add network address
                     if network.num_addresses <= 2:
-                        ips_to_view.append(str(network.network_address))
-                    print2(f"Expanded CIDR to {len(list(network.hosts()))} IPs", level=3)
+                        targets["ips"].append(str(network.network_address))
+                    print2(f"Expanded CIDR to {len(targets['ips']) - ips_before} IPs", level=3)
                     return True
                 except (ValueError, ipaddress.AddressValueError) as e:
                     # Not valid CIDR, treat as URL with path
                     print2(f"Found URL with path: {target}", level=3)
-                    urls_to_view.append(target)
+                    targets["urls"].append(target)
                     return True
             except ValueError:
                 # Base part is not an IP, so this is a URL/domain with path
                 print2(f"Found URL with path: {target}", level=3)
-                urls_to_view.append(target)
+                targets["urls"].append(target)
                 return True
         
         # Check 4: Is it a plain IP address?
         try:
-            ipaddress.ip_address(target)
+            ip_address_check(target)
             print2(f"Found IP address: {target}", level=3)
-            ips_to_view.append(target)
+            targets["ips"].append(target)
             return True
         except ValueError:
             # Not a valid IP, might be a domain name
@@ -510,7 +1298,7 @@ def input_ip_check_target_validity(target):
         # Check 5: Treat as domain name or URL without protocol
         if len(target) > 0:
             print2(f"Found domain name or URL: {target}", level=3)
-            urls_to_view.append(target)
+            targets["urls"].append(target)
             return True
         
         # If we got here, target is empty or invalid
@@ -521,19 +1309,25 @@ def input_ip_check_target_validity(target):
         print2(f"Error parsing target '{target}': {str(e)}", level=-1)
         return False
 
-def input_ip_parse(input_value):
+def input_ip_parse(input_value, targets=None):
     """
     Process the input value and validate if it's a valid target (IP, URL, domain, etc.).
     First checks if the input is a file path, and if so, parses the file.
-    Supports nmap XML files (.xml extension).
+    Supports nmap XML files (.xml extension) and the port scanner outputs of
+    input_scan_format() (gnmap, masscan list, masscan JSON / JSON lines).
+    Targets are added to the given lists (default: the module-level lists).
     Returns True if valid, False otherwise.
     """
+    if targets is None:
+        targets = input_targets()
     input_list = []
     
     # First, check if input_value is a file
     if os.path.isfile(input_value):
         print2(f"Input is a file: {input_value}", level=2)
         
+        scan_format = input_scan_format(input_value)
+        
         # Check if it's an XML file (potentially nmap output)
         if input_value.lower().endswith('.xml'):
             print2("Detected XML file, attempting to parse as nmap output", level=2)
@@ -550,15 +1344,23 @@ def input_ip_parse(input_value):
             else:
                 # Successfully parsed nmap file, add sockets directly
                 print2(f"Successfully parsed nmap XML file with {len(parsed_sockets)} HTTP sockets", level=2)
-                sockets_to_view.extend(parsed_sockets)
+                targets["sockets"].extend(parsed_sockets)
                 
                 # Print summary
                 print2(f"Total sockets from nmap: {len(parsed_sockets)}", level=2)
-                if len(parsed_sockets) > 0:
+                if len(parsed_sockets) > 0 and verbosity_level >= 3:
                     print2(f"Sockets: {', '.join(parsed_sockets)}", level=3)
                 
-                # Return early since we already added to sockets_to_view
+                # Return early since we already added to the sockets
                 return True
+        elif scan_format:
+            # Port scanner output, streamed straight into the sockets
+            print2(f"Detected {scan_format} scanner output", level=2)
+            if not input_scan_parse(input_value, scan_format, targets):
+                print2("Failed to parse scanner output", level=-1)
+                return False
+            print2(f"Total sockets to check: {len(targets['sockets'])}", level=2)
+            return True
         else:
             # Regular text file
             parsed_targets = input_ip_parse_input_file(input_value)
@@ -575,20 +1377,22 @@ def input_ip_parse(input_value):
     # Now validate each entry
     all_valid = True
     for item in input_list:
-        if not input_ip_check_target_validity(item):
+        if not input_ip_check_target_validity(item, targets):
             all_valid = False
     
     # Print summary of parsed targets
-    print2(f"Total IPs to check: {len(ips_to_view)}", level=2)
-    print2(f"Total URLs to check: {len(urls_to_view)}", level=2)
-    print2(f"Total sockets to check: {len(sockets_to_view)}", level=2)
+    print2(f"Total IPs to check: {len(targets['ips'])}", level=2)
+    print2(f"Total URLs to check: {len(targets['urls'])}", level=2)
+    print2(f"Total sockets to check: {len(targets['sockets'])}", level=2)
     
-    if len(ips_to_view) > 0:
-        print2(f"IPs: {', '.join(ips_to_view)}", level=3)
-    if len(urls_to_view) > 0:
-        print2(f"URLs: {', '.join(urls_to_view)}", level=3)
-    if len(sockets_to_view) > 0:
-        print2(f"Sockets: {', '.join(sockets_to_view)}", level=3)
+    # Only build the (potentially huge) lists when they will be printed
+    if verbosity_level >= 3:
+        if len(targets["ips"]) > 0:
+            print2(f"IPs: {', '.join(targets['ips'])}", level=3)
+        if len(targets["urls"]) > 0:
+            print2(f"URLs: {', '.join(targets['urls'])}", level=3)
+        if len(targets["sockets"]) > 0:
+            print2(f"Sockets: {', '.join(targets['sockets'])}", level=3)
     
     return all_valid
 
@@ -602,15 +1406,18 @@ def input_port_split(port_value):
     else:
         return [port_value]
 
-def input_port_check_validity(port):
+def input_port_check_validity(port, targets=None):
     """
-    Check if the given port is valid and add it to ports_to_view if valid.
+    Check if the given port is valid and add it to the ports of the targets if valid.
     Returns True if valid, False otherwise.
     """
+    if targets is None:
+        targets = input_targets()
+    
     try:
         port_num = int(port)
         if 1 <= port_num <= 65535:
-            ports_to_view.append(port_num)
+            targets["ports"].append(port_num)
             return True
         else:
             print2(f"Port out of range (1-65535): {port}", level=-1)
@@ -619,17 +1426,19 @@ def input_port_check_validity(port):
         print2(f"Could not parse port number: {port}", level=-1)
         return False
 
-def input_port_parse(args):
+def input_port_parse(args, targets=None):
     """
     Process the ports argument and validate ports.
     Returns True if valid, False otherwise.
     """
-    global ports_to_view
+    if targets is None:
+        targets = input_targets()
+    ports = targets["ports"]
     
     # If no ports specified, use default
     if not args.ports:
         print2("No ports specified, using DEFAULT_PORTS_ALL", level=2)
-        ports_to_view = DEFAULT_PORTS_ALL.copy()
+        ports[:] = DEFAULT_PORTS_ALL
     else:
         # Split by commas
         port_list = input_port_split(args.ports)
@@ -641,71 +1450,199 @@ def input_port_parse(args):
             # Check for default keywords
             if item_lower in ["default", "default1"]:
                 print2("Adding DEFAULT_PORTS_1", level=3)
-                ports_to_view.extend(DEFAULT_PORTS_1)
+                ports.extend(DEFAULT_PORTS_1)
             elif item_lower == "default2":
                 print2("Adding DEFAULT_PORTS_2", level=3)
-                ports_to_view.extend(DEFAULT_PORTS_2)
+                ports.extend(DEFAULT_PORTS_2)
             elif item_lower == "default3":
                 print2("Adding DEFAULT_PORTS_3", level=3)
-                ports_to_view.extend(DEFAULT_PORTS_3)
+                ports.extend(DEFAULT_PORTS_3)
             elif item_lower == "default_all":
                 print2("Adding DEFAULT_PORTS_ALL", level=3)
-                ports_to_view.extend(DEFAULT_PORTS_ALL)
+                ports.extend(DEFAULT_PORTS_ALL)
             else:
                 # Try to parse as port number
-                if not input_port_check_validity(item):
+                if not input_port_check_validity(item, targets):
                     all_valid = False
         
         if not all_valid:
             return False
     
     # Remove duplicates while preserving order
-    ports_to_view = list(dict.fromkeys(ports_to_view))
+    ports[:] = list(dict.fromkeys(ports))
     
     # Print port count and list at info level
-    print2(f"Total ports to check: {len(ports_to_view)}", level=2)
-    print2(f"Ports: {', '.join(map(str, ports_to_view))}", level=3)
+    print2(f"Total ports to check: {len(ports)}", level=2)
+    print2(f"Ports: {', '.join(map(str, ports))}", level=3)
     
     return True
 
-def build_sockets():
+def dns_hostname(url):
     """
-    Build sockets_to_view from ips_to_view, ports_to_view, and urls_to_view.
-    For IPs: Creates IP:port combinations
-    For URLs: Creates URL with port combinations (will be converted to http:// or https:// later)
-    Returns True if successful.
+    Return the hostname of a URL target, with or without scheme, port and path.
     """
-    global sockets_to_view
-    
-    # Add IP:port combinations
-    for ip in ips_to_view:
-        for port in ports_to_view:
-            socket = f"{ip}:{port}"
-            sockets_to_view.append(socket)
+    try:
+        return urlsplit("//" + url.split("://", 1)[-1]).hostname or ""
+    except ValueError:
+        return ""
+
+def dns_lookup(hostname):
+    """
+    Resolve a hostname. Like Chromium, localhost and *.localhost are loopback
+    (RFC 6761) without asking the resolver.
+    Returns the list of addresses, empty if the hostname doesn't resolve.
+    """
+    if hostname == "localhost" or hostname.endswith(".localhost"):
+        return ["127.0.0.1"]
+    try:
+        ip_address_check(hostname)
+        return [hostname]
+    except ValueError:
+        pass
     
-    # Add URL:port combinations (same as IPs now)
-    for url in urls_to_view:
-        for port in ports_to_view:
-            socket = f"{url}:{port}"
-            sockets_to_view.append(socket)
+    try:
+        infos = socket.getaddrinfo(hostname, None, proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError):
+        return []
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+def dns_socket_hostname(socket_value):
+    """
+    Return the hostname of a "target:port" socket, or "" if the target is an IP.
+    """
+    host = socket_value.rsplit(':', 1)[0]
+    try:
+        ip_address_check(host)
+        return ""
+    except ValueError:
+        return dns_hostname(host)
+
+def dns_resolve(targets=None):
+    """
+    Resolve the hostnames of the URL targets and of the sockets (nmap or
+    scanner outputs) concurrently into dns_cache, and drop the targets that
+    don't resolve before any browser work (default targets: see input_targets()).
+    Cached entries are reused until they expire (dns_cache_ttl, dns_negative_ttl
+    for the hostnames that didn't resolve). dns_host_rules maps the hostnames
+    of these targets only: each scan (serve job) gets its own rules.
+    Returns True if successful.
+    """
+    global dns_host_rules
+    
+    if targets is None:
+        targets = input_targets()
+    
+    hostnames, socket_hostnames = dns_target_hostnames(targets)
+    now = time.time()
+    with dns_cache_lock:
+        missing = [hostname for hostname in hostnames if hostname not in dns_cache or dns_cache_expires.get(hostname, now) < now]
+    
+    if missing:
+        print2(f"Resolving {len(missing)} hostnames", level=2)
+        with ThreadPoolExecutor(max_workers=min(dns_threads, len(missing))) as executor:
+            resolved = dict(zip(missing, executor.map(dns_lookup, missing)))
+        
+        now = time.time()
+        with dns_cache_lock:
+            dns_cache.update(resolved)
+            for hostname, addresses in resolved.items():
+                dns_cache_expires[hostname] = now + (dns_cache_ttl if addresses else dns_negative_ttl)
+    
+    # Chromium gets the addresses too, so navigations skip their own lookups
+    dns_host_rules = dns_rules_build(hostnames)
+    
+    unresolved = {url for url in targets["urls"] if not dns_cache.get(dns_hostname(url))}
+    if unresolved:
+        targets["urls"][:] = [url for url in targets["urls"] if url not in unresolved]
+        print2(f"Dropped {len(unresolved)} URL targets that don't resolve", level=1)
+        for url in sorted(unresolved):
+            print2(f"  - {url}", level=2)
+    
+    unresolved = {socket_value for socket_value, hostname in socket_hostnames.items() if not dns_cache.get(hostname)}
+    if unresolved:
+        targets["sockets"][:] = [socket_value for socket_value in targets["sockets"] if socket_value not in unresolved]
+        print2(f"Dropped {len(unresolved)} sockets whose hostname doesn't resolve", level=1)
+    
+    return True
+
+def dns_target_hostnames(targets):
+    """
+    Return the hostnames of the URL targets and of the sockets, and the
+    {socket: hostname} of the sockets that have one (scanner outputs are mostly IPs).
+    """
+    hostnames = {dns_hostname(url) for url in targets["urls"]}
+    socket_hostnames = {}
+    for socket_value in targets["sockets"]:
+        hostname = dns_socket_hostname(socket_value)
+        if hostname:
+            socket_hostnames[socket_value] = hostname
+    hostnames.update(socket_hostnames.values())
+    return hostnames, socket_hostnames
+
+def dns_rules_build(hostnames):
+    """
+    Build the Chromium --host-resolver-rules mapping the hostnames to their
+    dns_cache address ("" if the rules are longer than dns_host_rules_max).
+    """
+    with dns_cache_lock:
+        rules = ", ".join(
+            f"MAP {hostname} {f'[{addresses[0]}]' if ':' in addresses[0] else addresses[0]}"
+            for hostname, addresses in ((hostname, dns_cache.get(hostname)) for hostname in sorted(hostnames))
+            if addresses and hostname != addresses[0]
+        )
+    return rules if len(rules) <= dns_host_rules_max else ""
+
+def dns_address(ip_entry):
+    """
+    Return the address of a target: its IP, or the first address its hostname
+    resolved to ("" if unknown).
+    """
+    if ip_entry["ip"]:
+        return ip_entry["ip"]
+    addresses = dns_cache.get(dns_hostname(ip_entry["url"]))
+    return addresses[0] if addresses else ""
+
+def build_sockets(targets=None):
+    """
+    Build the sockets of the targets from their IPs, URLs and ports
+    (default: sockets_to_view from ips_to_view, ports_to_view, and urls_to_view).
+    For IPs: Creates IP:port combinations
+    For URLs: Creates URL with port combinations (will be converted to http:// or https:// later)
+    Returns True if successful.
+    """
+    if targets is None:
+        targets = input_targets()
+    ports = targets["ports"]
+    sockets = targets["sockets"]
+    
+    # Add IP:port combinations
+    for ip in targets["ips"]:
+        for port in ports:
+            socket = f"{ip}:{port}"
+            sockets.append(socket)
+    
+    # Add URL:port combinations (same as IPs now)
+    for url in targets["urls"]:
+        for port in ports:
+            socket = f"{url}:{port}"
+            sockets.append(socket)
     
-    total_ip_combinations = len(ips_to_view) * len(ports_to_view)
-    total_url_combinations = len(urls_to_view) * len(ports_to_view)
+    total_ip_combinations = len(targets["ips"]) * len(ports)
+    total_url_combinations = len(targets["urls"]) * len(ports)
     
-    print2(f"Total targets to check: {len(sockets_to_view)}", level=2)
+    print2(f"Total targets to check: {len(sockets)}", level=2)
     print2(f"  - IP:port combinations: {total_ip_combinations}", level=3)
     print2(f"  - URL:port combinations: {total_url_combinations}", level=3)
     
     return True
 
-def build_visits():
+def visits_build(sockets):
     """
     Build the visits dictionary to track visited targets grouped by IP/URL with ports.
     New structure: {"ips": [{"ip": "", "url": "", "ports": [{port_num: {data}}]}]}
-    Loads the structure from visits_template.json and creates entries for each target.
+    Loads the structure from visits_template.json and creates entries for each socket.
+    Returns the visits dictionary, or None on error.
     """
-    global visits
-    
     # Load template
     try:
         with open(get_resource_path("visits_template.json"), "r") as f:
@@ -713,17 +1650,20 @@ def build_visits():
         print2("Loaded visits_template.json", level=3)
     except Exception as e:
         print2(f"Error loading visits_template.json: {str(e)}", level=-1)
-        return False
+        return None
     
     # Initialize visits with the new structure
-    visits = {"ips": []}
+    new_visits = {"ips": []}
     
-    # Dictionary to group ports by IP/URL
-    # Key: IP address or URL, Value: list of ports
-    target_ports_map = {}
+    # Dictionary to group ports by IP/URL, built in a single pass
+    # Key: IP address or URL, Value: (ip_entry, set of ports already added)
+    target_entries = {}
+    
+    # Avoid formatting one debug line per target unless it will be printed
+    debug = verbosity_level >= 3
     
     # Process all targets and group by IP/URL
-    for target in sockets_to_view:
+    for target in sockets:
         ip = ""
         url = ""
         port = ""
@@ -733,65 +1673,90 @@ def build_visits():
             parts = target.rsplit(':', 1)  # Split from right to get last colon (port)
             target_base = parts[0]
             port = parts[1]
-            
+            target_key = target_base
+        else:
+            # This shouldn't happen anymore, but handle it just in case
+            print2(f"Warning: Target without port: {target}", level=1)
+            continue
+        
+        # Add to the mapping
+        if target_key not in target_entries:
             # Check if target_base is an IP address
             try:
-                ipaddress.ip_address(target_base)
+                ip_address_check(target_base)
                 # It's an IP
                 ip = target_base
-                target_key = ip
-                print2(f"Processing IP:port: {ip}:{port}", level=3)
             except ValueError:
                 # It's a URL/domain
                 url = target_base
-                target_key = url
-                print2(f"Processing URL:port: {url}:{port}", level=3)
-        else:
-            # This shouldn't happen anymore, but handle it just in case
-            print2(f"Warning: Target without port: {target}", level=1)
-            continue
-        
-        # Add to the mapping
-        if target_key not in target_ports_map:
-            target_ports_map[target_key] = {
+            
+            ip_entry = {
                 "ip": ip,
                 "url": url,
                 "ports": []
             }
+            new_visits["ips"].append(ip_entry)
+            target_entries[target_key] = (ip_entry, set())
         
-        # Add port to the list (avoid duplicates)
-        if port not in target_ports_map[target_key]["ports"]:
-            target_ports_map[target_key]["ports"].append(port)
-    
-    # Build the final structure
-    for target_key, target_data in target_ports_map.items():
-        ip_entry = {
-            "ip": target_data["ip"],
-            "url": target_data["url"],
-            "ports": []
-        }
+        ip_entry, added_ports = target_entries[target_key]
+        
+        if debug:
+            if ip_entry["ip"]:
+                print2(f"Processing IP:port: {target_base}:{port}", level=3)
+            else:
+                print2(f"Processing URL:port: {target_base}:{port}", level=3)
         
-        # Add each port with empty visit data
-        for port in target_data["ports"]:
+        # Add port with empty visit data (avoid duplicates)
+        if port not in added_ports:
+            added_ports.add(port)
             port_entry = {
                 port: {
                     "response": "",
                     "visited_first": "",
                     "visited_last": "",
+                    "visit_duration": "",
                     "user_agent": "",
                     "screenshot_path_full": "",
                     "screenshot_path_relative": "",
                     "screenshot_pathname": "",
-                    "screenshot_filename": ""
+                    "screenshot_filename": "",
+                    "visited_url": "",
+                    "etag": "",
+                    "last_modified": "",
+                    "content_hash": "",
+                    "screenshot_hash": "",
+                    "title": "",
+                    "server": "",
+                    "technologies": [],
+                    "tls_subject": "",
+                    "tls_issuer": "",
+                    "tls_san": [],
+                    "tls_valid_to": "",
+                    "favicon_hash": "",
+                    "trace_path": "",
+                    "attempts": []
                 }
             }
             ip_entry["ports"].append(port_entry)
-        
-        visits["ips"].append(ip_entry)
     
-    total_targets = sum(len(ip_entry["ports"]) for ip_entry in visits["ips"])
-    print2(f"Built visits structure with {len(visits['ips'])} unique IPs/URLs and {total_targets} total port entries", level=3)
-    print2(f"Visits structure: {visits}", level=3)
+    total_targets = sum(len(ip_entry["ports"]) for ip_entry in new_visits["ips"])
+    print2(f"Built visits structure with {len(new_visits['ips'])} unique IPs/URLs and {total_targets} total port entries", level=3)
+    if verbosity_level >= 3:
+        print2(f"Visits structure: {new_visits}", level=3)
+    
+    return new_visits
+
+def build_visits():
+    """
+    Build the module-level visits dictionary from sockets_to_view.
+    Returns True if successful, False otherwise.
+    """
+    global visits
+    
+    new_visits = visits_build(sockets_to_view)
+    if new_visits is None:
+        return False
+    visits = new_visits
     
     return True
 
@@ -891,29 +1856,39 @@ def output_save():
     Save output to the specified output folder.
     Generates HTML report and saves it along with the JSON data.
     """
-    print2("\nGenerating HTML report...", level=0)
+    print2("\nGenerating HTML report..." if live_report is None else "\nFinalizing the live report...", level=0)
+    
+    report_start = time.perf_counter()
     
     try:
-        # Generate the HTML content
-        html_content = generate_html()
+        # Generate the HTML content (a sharded report is written straight to its files,
+        # the live report is already written)
+        html_content = generate_html() if not report_shards and live_report is None else None
         
-        if not html_content:
+        if not html_content and not report_shards and live_report is None:
             print2("Failed to generate HTML content", level=-1)
             return False
         
-        # Determine HTML filename based on same logic as JSON
-        global output_filename
-        if not output_filename or output_filename == "pagehawk_results.html":
-            # Check if we have a custom JSON filename to derive from
-            if output_json_final_filename != "pagehawk_results.json":
-                output_filename = output_json_final_filename.replace('.json', '.html')
-            else:
-                output_filename = "pagehawk_results.html"
-        
         # Save HTML file
-        html_file_path = os.path.join(output_path, output_filename)
-        with open(html_file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        html_file_path = output_html_path()
+        if live_report is not None:
+            html_file_path = live_report_finish()
+        elif report_shards:
+            if generate_html_sharded(html_file_path, visits["ips"], report_shards, {"stats": scan_stats}) is None:
+                return False
+        else:
+            with open(html_file_path, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+        
+        scan_stats["report_write_seconds"] = round(time.perf_counter() - report_start, 3)
+        
+        # Save the final JSON with the scan statistics
+        visits["stats"] = scan_stats
+        with json_write_lock:
+            with open(os.path.join(output_path, output_json_final_filename), 'w') as f:
+                json.dump(visits, f, indent=4)
+        
+        archive_finish(html_file_path, os.path.join(output_path, output_json_final_filename))
         
         print2(f"HTML report saved to: {html_file_path}", level=0)
         print2(f"JSON data saved to: {os.path.join(output_path, output_json_final_filename)}", level=0)
@@ -925,62 +1900,517 @@ def output_save():
         print2(f"Error saving output: {str(e)}", level=-1)
         return False
 
-def generate_html():
+def archive_open(archive_path):
+    """
+    Open the --archive bundle of the scan: a .zip, .tar, .tar.gz or .tgz file
+    that screenshots and journal records are streamed into as they are
+    produced (see archive_add() and archive_journal()), the report and the
+    final JSON being added by archive_finish().
+    Returns True if successful, False otherwise.
+    """
+    global output_archive
+    
+    try:
+        if archive_path.lower().endswith(".zip"):
+            archive_format = "zip"
+            handle = zipfile.ZipFile(archive_path, "w", allowZip64=True)
+        else:
+            archive_format = "tar"
+            gzip_mode = archive_path.lower().endswith((".tar.gz", ".tgz"))
+            handle = tarfile.open(archive_path, "w|gz" if gzip_mode else "w")
+    except OSError as e:
+        print2(f"Can't create the archive {archive_path}: {str(e)}", level=-1)
+        return False
+    
+    output_archive = {
+        "path": archive_path,
+        "format": archive_format,
+        "handle": handle,
+        "lock": threading.Lock(),
+        "names": set(),
+        "journal": [],
+        "journal_parts": 0,
+        "journal_flushed": time.time()
+    }
+    # An interrupted scan still closes the archive with what it has
+    atexit.register(archive_close)
+    print2(f"Streaming results into {archive_path}", level=2)
+    return True
+
+def archive_add(name, data, compress=True):
+    """
+    Add a member to the archive from bytes. A name already in the archive is
+    not added again (deduplicated screenshots).
+    """
+    archive = output_archive
+    name = name.replace(os.sep, "/")
+    with archive["lock"]:
+        if name in archive["names"]:
+            return
+        archive["names"].add(name)
+        if archive["format"] == "zip":
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            archive["handle"].writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            archive["handle"].addfile(info, io.BytesIO(data))
+
+def archive_add_file(file_path, name):
+    """
+    Add a file to the archive, read from disk without loading it in memory.
+    """
+    archive = output_archive
+    name = name.replace(os.sep, "/")
+    with archive["lock"]:
+        if name in archive["names"]:
+            return
+        archive["names"].add(name)
+        if archive["format"] == "zip":
+            archive["handle"].write(file_path, name, compress_type=zipfile.ZIP_DEFLATED)
+        else:
+            archive["handle"].add(file_path, name, recursive=False)
+
+def archive_journal(ip_entry, port_key, port_data):
+    """
+    Record a finished visit in the archive journal: records are JSON lines
+    ({"ip", "url", "port", "data"}, as read by the report subcommand) added
+    as "journal/*.jsonl" members every archive_journal_records records or
+    archive_journal_seconds seconds.
+    """
+    if output_archive is None:
+        return
+    record = json.dumps({"ip": ip_entry["ip"], "url": ip_entry["url"], "port": port_key, "data": port_data})
+    with output_archive["lock"]:
+        output_archive["journal"].append(record)
+        flush = (len(output_archive["journal"]) >= archive_journal_records
+                 or time.time() - output_archive["journal_flushed"] >= archive_journal_seconds)
+    if flush:
+        archive_journal_flush()
+
+def archive_journal_flush():
+    """
+    Add the buffered journal records to the archive as one member.
+    """
+    archive = output_archive
+    with archive["lock"]:
+        records = archive["journal"]
+        archive["journal"] = []
+        archive["journal_flushed"] = time.time()
+        if not records:
+            return
+        archive["journal_parts"] += 1
+        name = f"journal/{os.path.splitext(output_json_final_filename)[0]}-{archive['journal_parts']:05d}.jsonl"
+    archive_add(name, ("\n".join(records) + "\n").encode("utf-8"))
+
+def archive_finish(html_file_path, json_file_path):
+    """
+    Complete the archive at the end of a scan: the screenshots already on
+    disk (linked from a --baseline), the final JSON, then the HTML report and
+    its shard files, and close it.
+    """
+    if output_archive is None:
+        return
+    
+    archive_journal_flush()
+    for ip_entry in visits["ips"]:
+        for port_entry in ip_entry["ports"]:
+            for port_data in port_entry.values():
+                screenshot_entries = [port_data] + list(port_data.get("viewports", {}).values())
+                for screenshot_entry in screenshot_entries:
+                    screenshot_path = screenshot_entry.get("screenshot_path_full")
+                    if screenshot_path and os.path.isfile(screenshot_path):
+                        archive_add_file(screenshot_path, os.path.relpath(screenshot_path, output_path))
+                # Playwright traces kept by --trace
+                for attempt in port_data.get("attempts", []):
+                    if attempt.get("trace_path") and os.path.isfile(os.path.join(output_path, attempt["trace_path"])):
+                        archive_add_file(os.path.join(output_path, attempt["trace_path"]), attempt["trace_path"])
+    
+    archive_add_file(json_file_path, os.path.basename(json_file_path))
+    archive_add_file(html_file_path, os.path.basename(html_file_path))
+    # Shard files of a sharded report, chunk files of a live report
+    for data_dir in (os.path.splitext(html_file_path)[0] + "_data", os.path.splitext(html_file_path)[0] + "_live"):
+        if os.path.isdir(data_dir):
+            for filename in sorted(os.listdir(data_dir)):
+                archive_add_file(os.path.join(data_dir, filename), f"{os.path.basename(data_dir)}/{filename}")
+    
+    archive_path = output_archive["path"]
+    archive_close()
+    print2(f"Archive saved to: {archive_path}", level=0)
+
+def archive_close():
+    """
+    Add the last journal records and close the archive (zip files are only
+    readable once closed).
+    """
+    global output_archive
+    
+    archive = output_archive
+    if archive is None:
+        return
+    archive_journal_flush()
+    output_archive = None
+    with archive["lock"]:
+        archive["handle"].close()
+
+def output_html_path():
+    """
+    Return the path of the HTML report: output_filename, derived from a custom
+    JSON filename when not set.
+    """
+    global output_filename
+    if not output_filename or output_filename == "pagehawk_results.html":
+        # Check if we have a custom JSON filename to derive from
+        if output_json_final_filename != "pagehawk_results.json":
+            output_filename = output_json_final_filename.replace('.json', '.html')
+        else:
+            output_filename = "pagehawk_results.html"
+    return os.path.join(output_path, output_filename)
+
+def live_report_open():
+    """
+    Write the shell of the --live-report report before the scan: the page has
+    no data of its own, it polls "<report>_live/index.js" and loads the chunk
+    files that live_report_add() appends as visits complete. Sockets reused
+    from a --baseline go into the first chunk.
+    Returns True if successful, False otherwise.
+    """
+    global live_report
+    
+    html_file_path = output_html_path()
+    live_dir = os.path.splitext(html_file_path)[0] + "_live"
+    try:
+        if os.path.isdir(live_dir):
+            shutil.rmtree(live_dir)
+        os.makedirs(live_dir)
+        with open(html_file_path, 'w', encoding='utf-8') as f:
+            live = {"dir": os.path.basename(live_dir), "poll_seconds": live_report_poll_seconds}
+            if generate_html_stream(f, [], {"live": live}) is None:
+                return False
+    except OSError as e:
+        print2(f"Can't write the live report {html_file_path}: {str(e)}", level=-1)
+        return False
+    
+    live_report = {
+        "html": html_file_path,
+        "dir": live_dir,
+        "lock": threading.Lock(),
+        "sockets": {},  # id(port_data) -> (ip_entry, port_key, port_data), in the order the page lists them
+        "total": sum(len(port_entry) for ip_entry in visits["ips"] for port_entry in ip_entry["ports"]),
+        "pending": [],
+        "chunks": 0,
+        "flushed": time.time()
+    }
+    atexit.register(live_report_flush)
+    
+    for ip_entry in visits["ips"]:
+        for port_entry in ip_entry["ports"]:
+            for port_key, port_data in port_entry.items():
+                if port_data.get("baseline_status") in ("fresh", "carried"):
+                    live_report_add(ip_entry, port_key, port_data, flush=False)
+    live_report_flush()
+    
+    print2(f"Live report: {html_file_path} (updated every {live_report_chunk_seconds} seconds)", level=0, color="cyan")
+    return True
+
+def live_report_add(ip_entry, port_key, port_data, flush=True):
+    """
+    Queue a finished visit for the live report, and write the queued ones as
+    a chunk every live_report_chunk_records records or live_report_chunk_seconds
+    seconds. A socket visited again (retries) replaces its earlier record.
+    """
+    if live_report is None:
+        return
+    record = generate_html_json({"ip": ip_entry["ip"], "url": ip_entry["url"], "port": port_key, "data": port_data})
+    with live_report["lock"]:
+        live_report["sockets"][id(port_data)] = (ip_entry, port_key, port_data)
+        live_report["pending"].append(record)
+        flush = flush and (len(live_report["pending"]) >= live_report_chunk_records
+                           or time.time() - live_report["flushed"] >= live_report_chunk_seconds)
+    if flush:
+        live_report_flush()
+
+def live_report_flush(finished=False):
+    """
+    Write the queued records as the next chunk file, then the index that tells
+    the page how many chunks to load. Both are written under a temporary name
+    first, so the page never loads a partial file. The finished index also
+    carries the aggregates of the complete report.
+    """
+    report = live_report
+    if report is None:
+        return
+    
+    with report["lock"]:
+        records = report["pending"]
+        report["pending"] = []
+        report["flushed"] = time.time()
+        index = {
+            "chunks": report["chunks"],
+            "sockets": len(report["sockets"]),
+            "total": report["total"],
+            "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "finished": finished
+        }
+        if records:
+            index["chunks"] += 1
+            chunk_path = os.path.join(report["dir"], f"chunk-{report['chunks']:05d}.js")
+            live_report_write(chunk_path, f"pagehawkLive({report['chunks']},[\n" + ",\n".join(records) + "\n]);\n")
+            report["chunks"] += 1
+        if finished:
+            # Same entries, in the same order, as the page builds from the chunks
+            index["aggregates"] = report_aggregates(
+                {"ip": ip_entry["ip"], "url": ip_entry["url"], "ports": [{port_key: port_data}]}
+                for ip_entry, port_key, port_data in report["sockets"].values()
+            )
+        live_report_write(os.path.join(report["dir"], "index.js"), f"pagehawkLiveIndex({generate_html_json(index)});\n")
+
+def live_report_write(file_path, content):
+    """
+    Write a file of the live report under a temporary name, then rename it.
+    """
+    temporary_path = f"{file_path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temporary_path, file_path)
+
+def live_report_finish():
+    """
+    Finalize the live report at the end of the scan: the sockets that were not
+    visited (skipped, closed on another name) go into a last chunk, and the
+    index is marked finished. The shell written by live_report_open() is the
+    final report.
+    Returns the path of the HTML report.
+    """
+    global live_report
+    
+    for ip_entry in visits["ips"]:
+        for port_entry in ip_entry["ports"]:
+            for port_key, port_data in port_entry.items():
+                if id(port_data) not in live_report["sockets"]:
+                    live_report_add(ip_entry, port_key, port_data, flush=False)
+    live_report_flush(finished=True)
+    html_file_path = live_report["html"]
+    live_report = None
+    return html_file_path
+
+def generate_html_template():
+    """
+    Load the report template files and build the standalone HTML around the data.
+    Returns (html_head, html_tail): the JSON data goes between the two parts.
+    """
+    # Read the HTML template
+    with open(get_resource_path("report_template.html"), "r", encoding="utf-8") as f:
+        html_template = f.read()
+    
+    # Read the CSS file
+    with open(get_resource_path("report_template.css"), "r", encoding="utf-8") as f:
+        css_content = f.read()
+    
+    # Read the JS file
+    with open(get_resource_path("report_template.js"), "r", encoding="utf-8") as f:
+        js_content = f.read()
+    
+    # Read and encode the logo as base64
+    logo_base64 = ""
+    try:
+        with open(get_resource_path("pagehawk_logo.png"), "rb") as f:
+            logo_data = f.read()
+            logo_base64 = base64.b64encode(logo_data).decode('utf-8')
+        print2("Loaded and encoded logo as base64", level=3)
+    except FileNotFoundError:
+        print2("Warning: pagehawk_logo.png not found, logo will not be embedded", level=1)
+    except Exception as e:
+        print2(f"Warning: Could not read logo file: {str(e)}", level=1)
+    
+    print2("Loaded template files", level=3)
+    
+    # Create the style tag with CSS
+    css_block = f"<style>\n{css_content}\n    </style>"
+    
+    # Create the data script tag, the JSON data is inserted at the marker
+    data_marker = "{{JSON_DATA}}"
+    data_block = f"<script>\n        let json_data = {data_marker};\n    </script>"
+    
+    # Create the JS script tag
+    js_block = f"<script>\n{js_content}\n    </script>"
+    
+    # Replace placeholders
+    html_output = html_template.replace("{{CSS_PLACEHOLDER}}", css_block)
+    html_output = html_output.replace("{{JS_PLACEHOLDER}}", js_block)
+    
+    # Replace logo src with base64 data URI if logo was loaded
+    if logo_base64:
+        html_output = html_output.replace('src="pagehawk_logo.png"', f'src="data:image/png;base64,{logo_base64}"')
+    
+    html_output = html_output.replace("{{DATA_PLACEHOLDER}}", data_block)
+    html_head, html_tail = html_output.split(data_marker, 1)
+    
+    return html_head, html_tail
+
+def generate_html_json(data):
+    """
+    Serialize data for embedding in the report <script> block.
+    Compact separators use the fast C encoder, and "</" is escaped so scanned
+    content can never close the script tag.
+    """
+    return json.dumps(data, separators=(',', ':')).replace("</", "<\\/")
+
+class ReportAggregates:
+    """
+    Aggregates embedded in a report next to its entries ("aggregates"), so
+    the page doesn't rescan every socket when it loads: sidebar stats,
+    response/port/host facets, the lists of the Outputs view, and for each
+    sortable table column the socket indexes in ascending order.
+    Socket indexes follow the order in which the report flattens the
+    entries (see report_entry_sockets()).
+    """
+    SORT_COLUMNS = ("ip", "port", "response", "title", "server", "visited_first", "visited_last")
+    
+    def __init__(self):
+        self.sockets = 0
+        self.accessible = 0
+        self.screenshots = set()
+        self.with_screenshot = 0
+        self.facets = {"response": {}, "port": {}, "host": {}}
+        self.outputs = {
+            "all-targets-no-ports": {},
+            "all-targets-with-ports": [],
+            "screenshots-no-ports": {},
+            "screenshots-with-ports": [],
+            "unreachable": {}
+        }
+        self.sort_keys = {column: [] for column in self.SORT_COLUMNS}
+    
+    def add(self, ip_entry):
+        target = ip_entry.get("url") or ip_entry.get("ip") or ""
+        for port_key, port_data in report_entry_sockets(ip_entry):
+            index = self.sockets
+            self.sockets += 1
+            response = str(port_data.get("response", ""))
+            code = int(response) if response.isdigit() else None
+            
+            for facet, value in (("response", response or "-"), ("port", port_key), ("host", target)):
+                self.facets[facet][value] = self.facets[facet].get(value, 0) + 1
+            
+            # Same rules as the report: accessible is 2xx/3xx, unreachable is an error code or no code
+            if code is not None and 200 <= code < 400:
+                self.accessible += 1
+            if code is None or code >= 400:
+                self.outputs["unreachable"][target] = None
+            self.outputs["all-targets-no-ports"][target] = None
+            self.outputs["all-targets-with-ports"].append(f"{target}:{port_key}")
+            if port_data.get("screenshot_filename"):
+                self.screenshots.add(port_data["screenshot_filename"])
+                self.with_screenshot += 1
+                self.outputs["screenshots-no-ports"][target] = None
+                self.outputs["screenshots-with-ports"].append(f"{target}:{port_key}")
+            
+            # IPs sort by address, before URLs; empty values sort last
+            try:
+                address = ipaddress.ip_address(ip_entry.get("ip") or "")
+                target_key = (0, address.version, int(address), "")
+            except ValueError:
+                target_key = (1, 0, 0, target.lower())
+            text = {column: str(port_data.get(column) or "") for column in ("title", "server", "visited_first", "visited_last")}
+            self.sort_keys["ip"].append((target_key, index))
+            self.sort_keys["port"].append((int(port_key) if port_key.isdigit() else 0, index))
+            self.sort_keys["response"].append(((0, code, "") if code is not None else (1, 0, response), index))
+            for column, value in text.items():
+                self.sort_keys[column].append(((not value, value.lower()), index))
+    
+    def result(self):
+        return {
+            "stats": {
+                "total": self.sockets,
+                "accessible": self.accessible,
+                "unreachable": self.sockets - self.accessible,
+                "unique_screenshots": len(self.screenshots),
+                "duplicate_screenshots": self.with_screenshot - len(self.screenshots)
+            },
+            "facets": self.facets,
+            "outputs": {name: "\n".join(values) for name, values in self.outputs.items()},
+            "sort": {column: [index for _, index in sorted(keys)] for column, keys in self.sort_keys.items()}
+        }
+
+def report_entry_sockets(ip_entry):
+    """
+    Yield (port, port data) of an IP/URL entry in the order the report's
+    JavaScript flattens them: Object.entries() lists integer-like keys in
+    ascending order, before the other keys.
+    """
+    for port_entry in ip_entry.get("ports", []):
+        for port_key in sorted(port_entry, key=lambda key: (0, int(key)) if key.isdigit() and str(int(key)) == key else (1, 0)):
+            yield port_key, port_entry[port_key]
+
+def report_aggregates(ip_entries):
+    """
+    Return the aggregates of a complete list of IP/URL entries (see ReportAggregates).
+    """
+    aggregates = ReportAggregates()
+    for ip_entry in ip_entries:
+        aggregates.add(ip_entry)
+    return aggregates.result()
+
+def generate_html(data=None):
     """
-    Generate HTML output from the visits data.
+    Generate HTML output from the visits data (or the given data).
     Creates a standalone HTML file with embedded CSS, JS, and data.
     """
     try:
-        # Read the HTML template
-        with open(get_resource_path("report_template.html"), "r", encoding="utf-8") as f:
-            html_template = f.read()
-        
-        # Read the CSS file
-        with open(get_resource_path("report_template.css"), "r", encoding="utf-8") as f:
-            css_content = f.read()
-        
-        # Read the JS file
-        with open(get_resource_path("report_template.js"), "r", encoding="utf-8") as f:
-            js_content = f.read()
-        
-        # Read and encode the logo as base64
-        logo_base64 = ""
-        try:
-            with open(get_resource_path("pagehawk_logo.png"), "rb") as f:
-                logo_data = f.read()
-                logo_base64 = base64.b64encode(logo_data).decode('utf-8')
-            print2("Loaded and encoded logo as base64", level=3)
-        except FileNotFoundError:
-            print2("Warning: pagehawk_logo.png not found, logo will not be embedded", level=1)
-        except Exception as e:
-            print2(f"Warning: Could not read logo file: {str(e)}", level=1)
-        
-        print2("Loaded template files", level=3)
+        html_head, html_tail = generate_html_template()
         
-        # Prepare the JSON data
-        json_data = json.dumps(visits, indent=2)
+        # Prepare the JSON data, with the aggregates the page would otherwise compute
+        if data is None:
+            data = visits
+        json_data = generate_html_json(dict(data, aggregates=report_aggregates(data.get("ips", []))))
         
-        # Create the style tag with CSS
-        css_block = f"<style>\n{css_content}\n    </style>"
+        html_output = html_head + json_data + html_tail
         
-        # Create the data script tag
-        data_block = f"<script>\n        let json_data = {json_data};\n    </script>"
+        print2("Generated standalone HTML with embedded assets", level=3)
         
-        # Create the JS script tag
-        js_block = f"<script>\n{js_content}\n    </script>"
+        return html_output
         
-        # Replace placeholders
-        html_output = html_template.replace("{{CSS_PLACEHOLDER}}", css_block)
-        html_output = html_output.replace("{{DATA_PLACEHOLDER}}", data_block)
-        html_output = html_output.replace("{{JS_PLACEHOLDER}}", js_block)
+    except FileNotFoundError as e:
+        print2(f"Template file not found: {str(e)}", level=-1)
+        return None
+    except Exception as e:
+        print2(f"Error generating HTML: {str(e)}", level=-1)
+        return None
+
+def generate_html_stream(f, ip_entries, extra_data=None):
+    """
+    Write the standalone HTML report to an open file, serializing the IP/URL
+    entries one at a time so the full result set is never built as one string.
+    Keys of extra_data (e.g. the "changes" of the diff subcommand) are added
+    next to "ips", as are the aggregates computed along the way.
+    Returns the number of entries written, or None on error.
+    """
+    try:
+        html_head, html_tail = generate_html_template()
+        aggregates = ReportAggregates()
         
-        # Replace logo src with base64 data URI if logo was loaded
-        if logo_base64:
-            html_output = html_output.replace('src="pagehawk_logo.png"', f'src="data:image/png;base64,{logo_base64}"')
+        f.write(html_head)
+        f.write('{"ips":[\n')
+        count = 0
+        for ip_entry in ip_entries:
+            if count:
+                f.write(',\n')
+            f.write(generate_html_json(ip_entry))
+            aggregates.add(ip_entry)
+            count += 1
+        f.write('\n]')
+        f.write(f',"aggregates":{generate_html_json(aggregates.result())}')
+        for key, value in (extra_data or {}).items():
+            f.write(f',{json.dumps(key)}:{generate_html_json(value)}')
+        f.write('}')
+        f.write(html_tail)
         
-        print2("Generated standalone HTML with embedded assets", level=3)
+        print2(f"Streamed {count} entries into the HTML report", level=3)
         
-        return html_output
+        return count
         
     except FileNotFoundError as e:
         print2(f"Template file not found: {str(e)}", level=-1)
@@ -989,357 +2419,3744 @@ def generate_html():
         print2(f"Error generating HTML: {str(e)}", level=-1)
         return None
 
-def ready_to_start_recon():
+def report_shards_parse(value):
     """
-    Perform pre-recon checks to ensure everything is set up correctly.
-    Returns True if ready, False otherwise.
+    Parse the --report-shards value (argparse type): "subnet", "port", or a
+    number of sockets per shard.
     """
-    # Check if visits dict is populated with new structure
-    if not visits or "ips" not in visits or len(visits["ips"]) == 0:
-        print2("No targets to process", level=-1)
-        return False
-    
-    # Count total port entries
-    total_ports = sum(len(ip_entry["ports"]) for ip_entry in visits["ips"])
-    print2(f"Ready to start recon for {len(visits['ips'])} IPs/URLs with {total_ports} total port checks", level=2)
-    
-    return True
+    if value in ("subnet", "port"):
+        return value
+    try:
+        size = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard mode {value!r}: use subnet, port or a number of sockets per shard")
+    if size < 1:
+        raise argparse.ArgumentTypeError("the number of sockets per shard must be at least 1")
+    return size
 
-def visit_website(ip_entry, port_key, port_data):
+def report_shard_label(ip_entry, port_key, mode):
     """
-    Visit a website at the given IP:port or URL:port, render JavaScript, and take a screenshot.
-    Updates the port_data dictionary with timestamp and response status.
-    
-    Port 80 uses http:// without :80 suffix, no HTTPS fallback
-    Port 443 uses https:// without :443 suffix
-    Other ports use http://target:port format with HTTPS fallback
-    
-    Args:
-        ip_entry: The IP/URL entry from visits["ips"]
-        port_key: The port number (as string)
-        port_data: The data dictionary for this specific port
+    Return the shard of a socket in a sharded report: its /24 (IPv4) or /64
+    (IPv6) subnet, or for URL targets their parent domain, with mode "subnet";
+    its port with mode "port".
     """
-    ip = ip_entry["ip"]
-    url_target = ip_entry["url"]
-    
-    # Determine if this is a URL or IP target
-    is_url_target = bool(url_target)
-    target_base = url_target if is_url_target else ip
+    if mode == "port":
+        return f"port {port_key}"
     
-    # Build display target
-    display_target = f"{target_base}:{port_key}"
-    print2(f"Visiting website {display_target}", level=2)
-    
-    response_status = "unreachable"
-    screenshot_path = None
+    target = ip_entry.get("ip") or dns_hostname(ip_entry.get("url", ""))
+    try:
+        address = ipaddress.ip_address(target)
+        return str(ipaddress.ip_network(f"{address}/{24 if address.version == 4 else 64}", strict=False))
+    except ValueError:
+        return ".".join(target.split(".")[-2:]) or "-"
+
+def report_shard_sort_key(shard, mode):
+    """
+    Order of the shards in the index: by port, by subnet (networks first, then
+    domains), or in scan order.
+    """
+    label = shard["label"]
+    if mode == "port":
+        return (0, int(label.split()[-1]), "")
+    if mode == "subnet":
+        try:
+            network = ipaddress.ip_network(label)
+            return (network.version, int(network.network_address), "")
+        except ValueError:
+            return (7, 0, label)
+    return (0, shard["id"], "")
+
+def generate_html_sharded(html_file_path, ip_entries, mode, extra_data=None):
+    """
+    Write a sharded report for very large scans: the HTML page only embeds an
+    index (aggregate stats, status, server, technology and screenshot cluster
+    summaries, and the list of shards), and the sockets of each shard go to a
+    sidecar script in the "<report>_data" folder that the page loads when the
+    shard is opened. Sidecars are JSONP-style scripts (pagehawkShard(id, data))
+    because browsers block fetch() of local files.
+    Sockets are grouped by report_shard_label() or, with a number as mode, cut
+    into shards of that many sockets. They are appended to per-shard part files
+    every report_shard_buffer sockets, so memory does not grow with the scan.
+    Returns the number of sockets written, or None on error.
+    """
+    html_dir = os.path.dirname(os.path.abspath(html_file_path))
+    data_name = os.path.splitext(os.path.basename(html_file_path))[0] + "_data"
+    data_dir = os.path.join(html_dir, data_name)
     
-    # Determine protocol and port suffix based on port number
-    port_num = int(port_key)
-    use_https_fallback = True  # By default, try HTTPS if HTTP fails
+    try:
+        os.makedirs(data_dir, exist_ok=True)
+        # Shards of a previous report in the same folder would be mixed in
+        for filename in os.listdir(data_dir):
+            if filename.startswith("shard-") and filename.endswith((".js", ".part")):
+                os.remove(os.path.join(data_dir, filename))
+        
+        shards = {}  # Label -> shard summary
+        buffered = {}  # Shard id -> serialized sockets waiting to be appended
+        statuses = {}
+        servers = {}
+        technologies = {}
+        favicons = {}
+        clusters = {}  # Screenshot hash -> {"count", "screenshot", "target", "shard"}
+        sockets = 0
+        accessible = 0
+        with_screenshot = 0
+        
+        def flush():
+            for shard_id, lines in buffered.items():
+                with open(os.path.join(data_dir, f"shard-{shard_id:05d}.part"), 'a', encoding='utf-8') as part:
+                    part.write("".join(lines))
+            buffered.clear()
+        
+        for ip_entry in ip_entries:
+            for port_entry in ip_entry.get("ports", []):
+                for port_key, port_data in port_entry.items():
+                    if isinstance(mode, int):
+                        start = sockets - sockets % mode
+                        label = f"sockets {start + 1}-{start + mode}"
+                    else:
+                        label = report_shard_label(ip_entry, port_key, mode)
+                    shard = shards.get(label)
+                    if shard is None:
+                        shard = {"id": len(shards) + 1, "label": label, "sockets": 0, "accessible": 0, "screenshots": 0}
+                        shard["file"] = f"{data_name}/shard-{shard['id']:05d}.js"
+                        shards[label] = shard
+                    
+                    # One socket per line, each is a complete IP/URL entry
+                    buffered.setdefault(shard["id"], []).append(generate_html_json({
+                        "ip": ip_entry.get("ip", ""),
+                        "url": ip_entry.get("url", ""),
+                        "ports": [{port_key: port_data}]
+                    }) + "\n")
+                    
+                    response = str(port_data.get("response", "")) or "-"
+                    statuses[response] = statuses.get(response, 0) + 1
+                    shard["sockets"] += 1
+                    sockets += 1
+                    if response.isdigit() and 200 <= int(response) < 400:
+                        shard["accessible"] += 1
+                        accessible += 1
+                    if port_data.get("server"):
+                        servers[port_data["server"]] = servers.get(port_data["server"], 0) + 1
+                    for technology in port_data.get("technologies", []):
+                        technologies[technology] = technologies.get(technology, 0) + 1
+                    if port_data.get("favicon_hash"):
+                        favicons[port_data["favicon_hash"]] = favicons.get(port_data["favicon_hash"], 0) + 1
+                    if port_data.get("screenshot_filename"):
+                        shard["screenshots"] += 1
+                        with_screenshot += 1
+                        cluster_key = port_data.get("screenshot_hash") or port_data["screenshot_filename"]
+                        cluster = clusters.get(cluster_key)
+                        if cluster is None:
+                            clusters[cluster_key] = {
+                                "count": 1,
+                                "screenshot": f"{port_data.get('screenshot_pathname', '.')}/{port_data['screenshot_filename']}",
+                                "target": f"{ip_entry.get('url') or ip_entry.get('ip')}:{port_key}",
+                                "shard": shard["id"]
+                            }
+                        else:
+                            cluster["count"] += 1
+                    
+                    if sockets % report_shard_buffer == 0:
+                        flush()
+        flush()
+        
+        # Part files become the sidecar scripts
+        for shard in shards.values():
+            if isinstance(mode, int):
+                # The last shard is usually not full
+                first = (shard["id"] - 1) * mode + 1
+                shard["label"] = f"sockets {first}-{first + shard['sockets'] - 1}"
+            part_path = os.path.join(data_dir, f"shard-{shard['id']:05d}.part")
+            aggregates = ReportAggregates()
+            with open(part_path, 'r', encoding='utf-8') as part, open(os.path.join(html_dir, shard["file"]), 'w', encoding='utf-8') as f:
+                f.write(f'pagehawkShard({shard["id"]},{{"ips":[\n')
+                for index, line in enumerate(part):
+                    f.write((",\n" if index else "") + line.rstrip("\n"))
+                    aggregates.add(json.loads(line))
+                f.write(f'\n],"aggregates":{generate_html_json(aggregates.result())}}});\n')
+            os.remove(part_path)
+        
+        def top(counts, limit=report_summary_top):
+            return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        
+        index = {
+            "mode": mode,
+            "sockets": sockets,
+            "accessible": accessible,
+            "screenshots": with_screenshot,
+            "unique_screenshots": len(clusters),
+            "statuses": top(statuses, None),
+            "servers": top(servers),
+            "technologies": top(technologies),
+            "favicons": top(favicons),
+            "clusters": sorted(
+                (dict(cluster, hash=key) for key, cluster in clusters.items() if cluster["count"] > 1),
+                key=lambda cluster: -cluster["count"]
+            )[:report_summary_top],
+            "shards": sorted(shards.values(), key=lambda shard: report_shard_sort_key(shard, mode))
+        }
+        
+        with open(html_file_path, 'w', encoding='utf-8') as f:
+            if generate_html_stream(f, [], dict(extra_data or {}, sharded=index)) is None:
+                return None
+        
+        print2(f"Wrote {len(shards)} report shards to {data_dir}", level=2)
+        return sockets
     
-    if port_num == 80:
-        protocol = "http"
-        port_suffix = ""  # Don't add :80
-        use_https_fallback = False  # Don't try HTTPS for port 80
-    elif port_num == 443:
-        protocol = "https"
-        port_suffix = ""  # Don't add :443
-        use_https_fallback = False  # Already HTTPS, no fallback needed
-    else:
-        protocol = "http"
-        port_suffix = f":{port_key}"
-        use_https_fallback = True  # Try HTTPS if HTTP fails for other ports
+    except OSError as e:
+        print2(f"Error writing the sharded report: {str(e)}", level=-1)
+        return None
+
+def baseline_apply(filepath):
+    """
+    Merge the results of a previous scan (JSON or .jsonl journal) into visits
+    for an incremental rescan:
+    - sockets visited within the freshness window are reused as they are ("fresh")
+    - older sockets are revalidated cheaply before any browser visit ("stale")
+    - sockets only present in the baseline are carried over ("carried")
+    Returns True if successful, False otherwise.
+    """
+    print2(f"Loading baseline: {filepath}", level=2)
     
     try:
-        with sync_playwright() as p:
-            # Launch browser
-            browser = p.chromium.launch(headless=True)
-            
-            # Create context with SSL verification disabled
-            context = browser.new_context(ignore_https_errors=True)
-            page = context.new_page()
-            
-            # Set timeout (increased for slower loading pages)
-            page.set_default_timeout(30000)
-            
-            # Build initial URL
-            if is_url_target:
-                # Handle URL with potential path
-                if '/' in url_target:
-                    parts = url_target.split('/', 1)
-                    domain = parts[0]
-                    path = parts[1]
-                    url = f"{protocol}://{domain}{port_suffix}/{path}"
-                else:
-                    url = f"{protocol}://{url_target}{port_suffix}"
-            else:
-                # IP address
-                url = f"{protocol}://{ip}{port_suffix}"
+        if filepath.lower().endswith('.jsonl'):
+            entries = report_jsonl_stream(filepath)
+        else:
+            entries = report_json_stream(filepath)
+        
+        baseline_dir = os.path.dirname(os.path.abspath(filepath))
+        fresh_after = (datetime.now() - timedelta(hours=baseline_fresh_hours)).strftime("%Y-%m-%d %H:%M:%S")
+        current_entries = {(ip_entry["url"] or ip_entry["ip"]): ip_entry for ip_entry in visits["ips"]}
+        counts = {"fresh": 0, "stale": 0, "carried": 0}
+        
+        for baseline_entry in report_merge_entries([entries]):
+            target_key = baseline_entry["url"] or baseline_entry["ip"]
+            ip_entry = current_entries.get(target_key)
+            if ip_entry is None:
+                ip_entry = {"ip": baseline_entry["ip"], "url": baseline_entry["url"], "ports": []}
+                visits["ips"].append(ip_entry)
+                current_entries[target_key] = ip_entry
             
-            print2(f"Trying {url}", level=3)
+            current_ports = {port: data for port_entry in ip_entry["ports"] for port, data in port_entry.items()}
             
-            try:
-                response = page.goto(url, wait_until="domcontentloaded")
-                
-                # Wait a bit for any dynamic content to load
-                try:
-                    page.wait_for_load_state("networkidle", timeout=5000)
-                except:
-                    # If networkidle times out, that's okay, we already have domcontentloaded
-                    print2(f"Network didn't become idle, but page loaded", level=3)
-                
-                # Get HTTP status code
-                if response:
-                    response_status = str(response.status)
-                    print2(f"{protocol.upper()} response: {response_status}", level=3)
-                else:
-                    response_status = "no_response"
-                
-                # Generate screenshot filename
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                if is_url_target:
-                    # Sanitize URL for filename
-                    safe_filename = url_target.replace('://', '_').replace('/', '_').replace(':', '_').replace('.', '_')
-                    screenshot_filename = f"{safe_filename}_{port_key}_{timestamp}.png"
-                else:
-                    screenshot_filename = f"{ip.replace('.', '_')}_{port_key}_{timestamp}.png"
-                
-                # Determine screenshot save path
-                if subdir_screenshots:
-                    screenshot_path = os.path.join(output_path, "screenshots", screenshot_filename)
-                else:
-                    screenshot_path = os.path.join(output_path, screenshot_filename)
-                
-                # Take screenshot
-                page.screenshot(path=screenshot_path, full_page=True)
-                
-                print2(f"Screenshot saved: {screenshot_filename}", level=3)
-                
-                browser.close()
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                
-                # Determine error type
-                if "timeout" in error_str or "navigationtimeout" in error_str:
-                    response_status = "timeout"
-                elif "refused" in error_str or "econnrefused" in error_str:
-                    response_status = "refused"
-                elif "reset" in error_str:
-                    response_status = "reset"
-                else:
-                    response_status = "error"
-                
-                # Only try HTTPS fallback if enabled for this port
-                if use_https_fallback:
-                    print2(f"HTTP failed ({response_status}), trying HTTPS", level=3)
-                    
-                    # Build HTTPS URL
-                    if is_url_target:
-                        if '/' in url_target:
-                            parts = url_target.split('/', 1)
-                            domain = parts[0]
-                            path = parts[1]
-                            url = f"https://{domain}{port_suffix}/{path}"
-                        else:
-                            url = f"https://{url_target}{port_suffix}"
+            for port_entry in baseline_entry["ports"]:
+                for port_key, baseline_data in port_entry.items():
+                    port_data = current_ports.get(port_key)
+                    if port_data is None:
+                        # Not part of this scan, keep the previous result
+                        port_data = dict(baseline_data)
+                        ip_entry["ports"].append({port_key: port_data})
+                        status = "carried"
                     else:
-                        url = f"https://{ip}{port_suffix}"
+                        port_data.update(baseline_data)
+                        # Timestamps are "%Y-%m-%d %H:%M:%S", they compare as strings
+                        status = "fresh" if port_data.get("visited_last", "") >= fresh_after else "stale"
                     
-                    print2(f"Trying {url}", level=3)
+                    # A screenshot that can't be found means the socket needs a full visit,
+                    # fresh results without a screenshot (refused, timeout...) are reused as they are
+                    if port_data.get("screenshot_filename") and not baseline_import_screenshot(port_data, baseline_dir) and status == "fresh":
+                        status = "stale"
                     
-                    try:
-                        response = page.goto(url, wait_until="domcontentloaded")
-                        
-                        # Wait a bit for any dynamic content to load
-                        try:
-                            page.wait_for_load_state("networkidle", timeout=5000)
-                        except:
-                            # If networkidle times out, that's okay, we already have domcontentloaded
-                            print2(f"Network didn't become idle, but page loaded", level=3)
-                        
-                        # Get HTTP status code
-                        if response:
-                            response_status = str(response.status)
-                            print2(f"HTTPS response: {response_status}", level=3)
-                        else:
-                            response_status = "no_response"
-                        
-                        # Generate screenshot filename
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        
-                        if is_url_target:
-                            # Sanitize URL for filename
-                            safe_filename = url_target.replace('://', '_').replace('/', '_').replace(':', '_').replace('.', '_')
-                            screenshot_filename = f"{safe_filename}_{port_key}_{timestamp}.png"
-                        else:
-                            screenshot_filename = f"{ip.replace('.', '_')}_{port_key}_{timestamp}.png"
-                        
-                        # Determine screenshot save path
-                        if subdir_screenshots:
-                            screenshot_path = os.path.join(output_path, "screenshots", screenshot_filename)
-                        else:
-                            screenshot_path = os.path.join(output_path, screenshot_filename)
-                        
-                        # Take screenshot
-                        page.screenshot(path=screenshot_path, full_page=True)
-                        
-                        print2(f"Screenshot saved: {screenshot_filename}", level=3)
-                        
-                        browser.close()
-                        
-                    except Exception as e2:
-                        error_str2 = str(e2).lower()
-                        
-                        # Determine error type
-                        if "timeout" in error_str2 or "navigationtimeout" in error_str2:
-                            response_status = "timeout"
-                        elif "refused" in error_str2 or "econnrefused" in error_str2:
-                            response_status = "refused"
-                        elif "reset" in error_str2:
-                            response_status = "reset"
-                        else:
-                            response_status = "unreachable"
-                        
-                        print2(f"Failed to connect to {url} - {response_status}", level=3)
-                        print2(f"Error details: {str(e2)[:200]}", level=3)
-                        browser.close()
-                else:
-                    # No HTTPS fallback, just report the failure
-                    print2(f"Failed to connect to {url} - {response_status}", level=3)
-                    print2(f"Error details: {str(e)[:200]}", level=3)
-                    browser.close()
-                
+                    port_data["baseline_status"] = status
+                    counts[status] += 1
+        
+        print2(f"Baseline: {counts['fresh']} fresh, {counts['stale']} to revalidate, {counts['carried']} carried over", level=0)
+        return True
+        
+    except FileNotFoundError:
+        print2(f"File not found: {filepath}", level=-1)
+        return False
     except Exception as e:
-        print2(f"Error visiting {display_target} - {str(e)}", level=-1)
-        response_status = "error"
+        print2(f"Error loading baseline {filepath}: {str(e)}", level=-1)
+        return False
+
+def baseline_import_screenshot(port_data, baseline_dir):
+    """
+    Make the screenshot of a baseline entry available in the current output folder
+    (hard link when possible, copy otherwise).
+    Returns True if the entry has a usable screenshot, False otherwise.
+    """
+    screenshot_filename = port_data.get("screenshot_filename")
+    if not screenshot_filename:
+        return False
     
-    # Update port data
-    current_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    candidates = [
+        port_data.get("screenshot_path_full", ""),
+        os.path.join(baseline_dir, port_data.get("screenshot_pathname") or ".", screenshot_filename),
+        os.path.join(baseline_dir, screenshot_filename)
+    ]
+    source = next((path for path in candidates if path and os.path.isfile(path)), None)
+    if source is None:
+        print2(f"Baseline screenshot not found: {screenshot_filename}", level=1)
+        screenshot_paths_set(port_data, None)
+        return False
     
-    # Check if this is the first visit
-    if port_data["visited_first"] == "":
-        port_data["visited_first"] = current_timestamp
-        port_data["visited_last"] = current_timestamp
-    else:
-        # Update only the last visit timestamp
-        port_data["visited_last"] = current_timestamp
+    destination = screenshot_path_for(screenshot_filename)
+    # Content-addressed screenshots of several sockets share one file
+    if not os.path.exists(destination):
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
     
-    port_data["response"] = response_status
+    screenshot_paths_set(port_data, destination)
+    return True
+
+def baseline_revalidate(port_data):
+    """
+    Check whether a stale baseline page changed, without the browser:
+    a conditional HEAD request (ETag / Last-Modified), then a GET compared to
+    the content hash of the previous visit.
+    Returns how the page was found unchanged, or None if it changed or could not be checked.
+    """
+    visited_url = port_data.get("visited_url")
+    if not visited_url or not port_data.get("screenshot_filename"):
+        return None
     
-    # Save screenshot paths in three formats
-    if screenshot_path:
-        port_data["screenshot_path_relative"] = screenshot_path
-        port_data["screenshot_path_full"] = os.path.abspath(screenshot_path)
-        port_data["screenshot_pathname"] = output_screenshots_pathname
-        port_data["screenshot_filename"] = os.path.basename(screenshot_path)
+    # Same as the browser context: certificates are not verified
+    ssl_context = ssl._create_unverified_context()
+    etag = port_data.get("etag", "")
+    last_modified = port_data.get("last_modified", "")
+    
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
     
-    # Save visits to JSON file after each visit (thread-safe)
     try:
-        with json_write_lock:  # Acquire lock before writing
-            json_file_path = os.path.join(output_path, output_json_final_filename)
-            with open(json_file_path, 'w') as f:
-                json.dump(visits, f, indent=4)
-        print2(f"Saved visits to {output_json_final_filename}", level=3)
+        if headers:
+            request = urllib.request.Request(visited_url, method="HEAD", headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=baseline_timeout, context=ssl_context) as response:
+                    if etag and response.headers.get("ETag", "") == etag:
+                        return "etag"
+                    if etag and response.headers.get("ETag", ""):
+                        # A different validator means a different page
+                        return None
+                    if last_modified and response.headers.get("Last-Modified", "") == last_modified:
+                        return "last_modified"
+            except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    return "not_modified"
+                # Other status codes: servers often reject HEAD, fall back to the content hash
+        
+        if port_data.get("content_hash"):
+            request = urllib.request.Request(visited_url)
+            try:
+                with urllib.request.urlopen(request, timeout=baseline_timeout, context=ssl_context) as response:
+                    status = str(response.status)
+                    body = response.read(baseline_max_body + 1)
+            except urllib.error.HTTPError as e:
+                status = str(e.code)
+                body = e.read(baseline_max_body + 1)
+            
+            if status == port_data.get("response") and len(body) <= baseline_max_body:
+                if hashlib.sha256(body).hexdigest() == port_data["content_hash"]:
+                    return "content_hash"
+    
     except Exception as e:
-        print2(f"Error saving visits JSON: {str(e)}", level=-1)
+        print2(f"Revalidation of {visited_url} failed: {str(e)[:200]}", level=3)
+    
+    return None
+
+def ready_to_start_recon():
+    """
+    Perform pre-recon checks to ensure everything is set up correctly.
+    Returns True if ready, False otherwise.
+    """
+    # Check if visits dict is populated with new structure
+    if not visits or "ips" not in visits or len(visits["ips"]) == 0:
+        print2("No targets to process", level=-1)
+        return False
+    
+    # Count total port entries
+    total_ports = sum(len(ip_entry["ports"]) for ip_entry in visits["ips"])
+    print2(f"Ready to start recon for {len(visits['ips'])} IPs/URLs with {total_ports} total port checks", level=2)
     
     return True
 
-def main_recon_process():
+def visit_build_url(ip_entry, port_key, protocol):
     """
-    Main reconnaissance process using multithreading for concurrent visits.
-    New structure: visits["ips"] contains IP/URL entries, each with a "ports" array.
+    Build the URL of a target for the given protocol.
+    Ports 80 and 443 are not added to the URL, other ports are.
     """
-    global start_time
+    port_suffix = "" if int(port_key) in (80, 443) else f":{port_key}"
+    url_target = ip_entry["url"]
     
-    print2("\nStarting the recon process...", level=0)
-    print2(f"Using {threads} concurrent threads", level=0, color="cyan")
-    print2('(You can interrupt / pause this process by pressing "escape". An additional prompt will be asked to truely abort the process)', color="yellow", level=0)
-    print2("", level=0)
+    if url_target:
+        # Handle URL with potential path
+        if '/' in url_target:
+            domain, path = url_target.split('/', 1)
+            return f"{protocol}://{domain}{port_suffix}/{path}"
+        return f"{protocol}://{url_target}{port_suffix}"
     
-    # Start the timer
-    start_time = time.time()
+    # IP address
+    return f"{protocol}://{ip_entry['ip']}{port_suffix}"
+
+def visit_classify_error(error):
+    """
+    Classify a navigation error as timeout, refused or reset, or as error when
+    the browser or its context was closed under the visit (a crash, or the
+    memory governor recycling it).
+    Returns None for any other error.
+    """
+    error_str = str(error).lower()
     
-    # Collect all tasks (ip_entry, port_key, port_data tuples)
-    tasks = []
-    for ip_entry in visits["ips"]:
-        for port_entry in ip_entry["ports"]:
-            for port_key, port_data in port_entry.items():
-                tasks.append((ip_entry, port_key, port_data))
+    if "timeout" in error_str or "navigationtimeout" in error_str:
+        return "timeout"
+    elif "refused" in error_str or "econnrefused" in error_str:
+        return "refused"
+    elif "reset" in error_str:
+        return "reset"
+    elif "target closed" in error_str or "has been closed" in error_str or "browser closed" in error_str:
+        return "error"
+    return None
+
+def visit_response_metadata(response):
+    """
+    Collect the metadata of the main document response that later scans use to
+    revalidate the page cheaply (see --baseline).
+    """
+    metadata = {
+        "visited_url": response.url,
+        "etag": response.headers.get("etag", ""),
+        "last_modified": response.headers.get("last-modified", ""),
+        "content_hash": ""
+    }
     
-    total_tasks = len(tasks)
-    completed_tasks = 0
+    try:
+        metadata["content_hash"] = hashlib.sha256(response.body()).hexdigest()
+    except Exception:
+        # Redirect responses and some error pages have no body
+        pass
     
-    print2(f"Total targets to scan: {total_tasks}", level=2)
+    return metadata
+
+def fingerprint_listen(context, page):
+    """
+    Record, during the navigation of a page, what fingerprint_collect() needs
+    besides the main response: the icons the page loads and, on Chromium, the
+    certificate details of the documents (with the SAN list, which Playwright's
+    security_details() leaves out).
+    Returns the capture dict filled while the page loads.
+    """
+    capture = {"security": {}, "icons": {}}
     
-    # Use ThreadPoolExecutor for concurrent execution
-    with ThreadPoolExecutor(max_workers=threads) as executor:
-        # Submit all tasks
-        future_to_task = {
-            executor.submit(visit_website, ip_entry, port_key, port_data): (ip_entry, port_key, port_data)
-            for ip_entry, port_key, port_data in tasks
-        }
-        
-        # Process completed tasks
-        for future in as_completed(future_to_task):
-            completed_tasks += 1
-            ip_entry, port_key, port_data = future_to_task[future]
-            
-            try:
-                future.result()  # This will raise any exceptions that occurred
-                if verbosity_level < 2:  # Only show progress if not in verbose mode
-                    target = ip_entry["url"] if ip_entry["url"] else ip_entry["ip"]
-                    print2(f"Progress: {completed_tasks}/{total_tasks} - Completed {target}:{port_key}", level=0)
-            except Exception as e:
-                target = ip_entry["url"] if ip_entry["url"] else ip_entry["ip"]
-                print2(f"Exception in thread for {target}:{port_key} - {str(e)}", level=-1)
+    def on_response(response):
+        if response.request.resource_type == "image" or urlsplit(response.url).path.lower().endswith(".ico"):
+            capture["icons"][response.url] = response
     
-    # Calculate elapsed time
-    end_time = time.time()
-    elapsed_seconds = int(end_time - start_time)
+    def on_document(params):
+        if params.get("type") == "Document" and params["response"].get("securityDetails"):
+            capture["security"][params["response"]["url"]] = params["response"]["securityDetails"]
     
-    # Format time display
-    if elapsed_seconds >= 60:
-        minutes = elapsed_seconds // 60
-        seconds = elapsed_seconds % 60
-        time_str = f"{minutes} minute{'s' if minutes != 1 else ''} and {seconds} second{'s' if seconds != 1 else ''}"
-    else:
-        time_str = f"{elapsed_seconds} second{'s' if elapsed_seconds != 1 else ''}"
+    page.on("response", on_response)
+    try:
+        cdp = context.new_cdp_session(page)
+        cdp.on("Network.responseReceived", on_document)
+        cdp.send("Network.enable")
+    except Exception:
+        # Not Chromium: the certificate comes from security_details(), without SAN
+        pass
     
-    print2(f"\nCompleted all {total_tasks} scans in {time_str}", level=0, color="green")
+    return capture
 
-def main():
-    args = arguments_parse()
+def fingerprint_collect(page, response, capture):
+    """
+    Fingerprint a loaded page from what the navigation already fetched, without
+    any extra request: page title, Server header, technologies (headers,
+    cookies, generator meta tag and page scripts), TLS certificate and favicon
+    hash. Never fails, missing information stays empty.
+    Returns a dict with the FINGERPRINT_FIELDS keys.
+    """
+    fingerprint = {key: type(default)() for key, default in FINGERPRINT_FIELDS.items()}
+    technologies = []
     
-    if not input_ip_parse(args.input):
-        print2("Input validation failed.", level=-1)
-        sys.exit(1)
+    try:
+        fingerprint["title"] = " ".join(page.title().split())[:200]
+    except Exception:
+        pass
     
-    if not input_port_parse(args):
-        print2("Port validation failed.", level=-1)
-        sys.exit(1)
+    # Response headers (all_headers() includes Set-Cookie, headers doesn't)
+    try:
+        headers = response.all_headers()
+    except Exception:
+        headers = response.headers
+    fingerprint["server"] = headers.get("server", "")
+    for header, name in FINGERPRINT_HEADERS.items():
+        if headers.get(header):
+            technologies.append(name or headers[header])
+    for cookie in headers.get("set-cookie", "").split("\n"):
+        cookie_name = cookie.split("=", 1)[0].strip()
+        for prefix, name in FINGERPRINT_COOKIES.items():
+            if cookie_name.startswith(prefix):
+                technologies.append(name)
+    
+    # The page's DOM and scripts, read from the loaded page
+    icons = []
+    try:
+        found = page.evaluate(FINGERPRINT_SCRIPT)
+        technologies.extend(found["technologies"])
+        icons = found["icons"]
+    except Exception:
+        pass
+    technologies = list(dict.fromkeys(technology.strip()[:100] for technology in technologies if technology.strip()))
+    # "PHP" from a cookie adds nothing to "PHP/7.4.3" from a header
+    fingerprint["technologies"] = [
+        technology for technology in technologies
+        if not any(other != technology and other.lower().startswith(technology.lower()) for other in technologies)
+    ]
+    
+    # TLS certificate of the main document
+    details = capture["security"].get(response.url)
+    if details is None:
+        try:
+            details = response.security_details()
+        except Exception:
+            details = None
+    if details:
+        fingerprint["tls_subject"] = details.get("subjectName", "")
+        fingerprint["tls_issuer"] = details.get("issuer", "")
+        fingerprint["tls_san"] = list(details.get("sanList", []))
+        if details.get("validTo"):
+            fingerprint["tls_valid_to"] = datetime.fromtimestamp(details["validTo"]).strftime("%Y-%m-%d %H:%M:%S")
+    
+    # Favicon: the first declared icon the page inlined or loaded
+    for icon in icons:
+        try:
+            if icon.startswith("data:"):
+                header, _, payload = icon.partition(",")
+                if not header.endswith(";base64"):
+                    continue
+                icon_bytes = base64.b64decode(payload)
+            elif icon in capture["icons"] and capture["icons"][icon].ok:
+                icon_bytes = capture["icons"][icon].body()
+            else:
+                continue
+        except Exception:
+            continue
+        if icon_bytes:
+            fingerprint["favicon_hash"] = str(fingerprint_favicon_hash(icon_bytes))
+            break
+    
+    return fingerprint
 
-    if not build_sockets():
-        print2("Socket building failed.", level=-1)
-        sys.exit(1)
+def fingerprint_favicon_hash(icon_bytes):
+    """
+    Shodan-style favicon hash (http.favicon.hash): MurmurHash3 of the base64
+    encoding of the icon, with a line break every 76 characters.
+    """
+    return fingerprint_mmh3(base64.encodebytes(icon_bytes))
+
+def fingerprint_mmh3(data, seed=0):
+    """
+    32-bit MurmurHash3 of bytes as a signed integer, like mmh3.hash().
+    Uses the mmh3 module when installed.
+    """
+    if mmh3 is not None:
+        return mmh3.hash(data, seed)
     
-    if not build_visits():
-        print2("Visits building failed.", level=-1)
-        sys.exit(1)
+    mask = 0xffffffff
+    c1, c2 = 0xcc9e2d51, 0x1b873593
+    length = len(data)
+    h = seed & mask
+    blocks_end = length - length % 4
     
-    if not output_check(args.output, args):
-        print2("Output folder validation failed.", level=-1)
-        sys.exit(1)
+    for offset in range(0, blocks_end, 4):
+        k = int.from_bytes(data[offset:offset + 4], "little")
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
+        h = ((h << 13) | (h >> 19)) & mask
+        h = (h * 5 + 0xe6546b64) & mask
     
-    if not ready_to_start_recon():
-        print2("Pre-recon checks failed.", level=-1)
-        sys.exit(1)
+    k = 0
+    tail = data[blocks_end:]
+    for index in range(len(tail) - 1, -1, -1):
+        k = (k << 8) | tail[index]
+    if tail:
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
     
-    main_recon_process()
+    h ^= length
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & mask
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & mask
+    h ^= h >> 16
     
-    output_save()
+    return h - 0x100000000 if h & 0x80000000 else h
 
-if __name__ == "__main__":
+def screenshot_store(screenshot_bytes, screenshot_dir=None):
+    """
+    Store a screenshot under the SHA-256 of its bytes ("<hash>.png") in
+    screenshot_dir (default: the screenshot folder of the output), so that
+    identical pages share one file. A screenshot already stored is not
+    written again.
+    Returns (screenshot_path, screenshot_hash).
+    """
+    screenshot_hash = hashlib.sha256(screenshot_bytes).hexdigest()
+    screenshot_filename = f"{screenshot_hash}.png"
+    if screenshot_dir is not None:
+        screenshot_path = os.path.join(screenshot_dir, screenshot_filename)
+    else:
+        screenshot_path = screenshot_path_for(screenshot_filename)
+    
+    with screenshot_store_lock:
+        known = screenshot_path in screenshot_store_known
+        screenshot_store_known.add(screenshot_path)
+        scan_stats["screenshots_deduplicated" if known else "screenshots_written"] += 1
+    if known:
+        return screenshot_path, screenshot_hash
+    
+    if os.path.exists(screenshot_path):
+        # Stored by another process (--workers) or linked from a baseline
+        with screenshot_store_lock:
+            scan_stats["screenshots_written"] -= 1
+            scan_stats["screenshots_deduplicated"] += 1
+        return screenshot_path, screenshot_hash
+    
+    # During a scan the writer stage does the file I/O, off the browser threads
+    if screenshot_writer is not None:
+        screenshot_writer_enqueue(screenshot_path, screenshot_bytes)
+    else:
+        screenshot_write(screenshot_path, screenshot_bytes)
+    
+    return screenshot_path, screenshot_hash
+
+def screenshot_write(screenshot_path, screenshot_bytes):
+    """
+    Write a screenshot file under a temporary name first: an interrupted write
+    must not leave a truncated file that later duplicates would point to.
+    With --archive, screenshots of the output folder go to the archive instead,
+    unless a --live-report shows them during the scan (archive_finish() adds
+    them at the end).
+    """
+    if output_archive is not None and live_report is None:
+        relative_path = os.path.relpath(screenshot_path, output_path)
+        if not relative_path.startswith(".."):
+            # PNG data is already compressed
+            archive_add(relative_path, screenshot_bytes, compress=False)
+            return
+
+    temporary_path = f"{screenshot_path}.{os.getpid()}_{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(screenshot_bytes)
+        os.replace(temporary_path, screenshot_path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+def screenshot_optimize(png_bytes):
+    """
+    Losslessly shrink a PNG: the image data (IDAT chunks) is recompressed with
+    the highest zlib level into a single chunk, other chunks are kept as is.
+    Runs in the writer's process pool.
+    Returns the smaller of the optimized and the original bytes.
+    """
+    if png_bytes[:8] != b'\x89PNG\r\n\x1a\n':
+        return png_bytes
+    
+    chunks = []
+    image_data = []
+    offset = 8
+    while offset + 8 <= len(png_bytes):
+        length, chunk_type = struct.unpack(">I4s", png_bytes[offset:offset + 8])
+        chunk_data = png_bytes[offset + 8:offset + 8 + length]
+        offset += 12 + length
+        if chunk_type == b'IDAT':
+            if not image_data:
+                chunks.append((b'IDAT', None))
+            image_data.append(chunk_data)
+        else:
+            chunks.append((chunk_type, chunk_data))
+    
+    try:
+        compressed = zlib.compress(zlib.decompress(b"".join(image_data)), 9)
+    except zlib.error:
+        return png_bytes
+    
+    optimized = [png_bytes[:8]]
+    for chunk_type, chunk_data in chunks:
+        if chunk_data is None:
+            chunk_data = compressed
+        optimized.append(struct.pack(">I", len(chunk_data)) + chunk_type + chunk_data + struct.pack(">I", zlib.crc32(chunk_type + chunk_data)))
+    optimized = b"".join(optimized)
+    
+    return optimized if len(optimized) < len(png_bytes) else png_bytes
+
+def screenshot_writer_start():
+    """
+    Start the screenshot writer stage of a scan: screenshot_store() hands the
+    captured bytes to a bounded queue instead of writing them in the browser
+    thread, and screenshot_writer_threads threads write them (optimized in a
+    process pool with --optimize-screenshots). A full queue blocks the
+    capture, so a slow disk slows the browsers down instead of filling memory.
+    """
+    global screenshot_writer
+    
+    if screenshot_writer is not None:
+        return
+    
+    writer = {
+        "queue": queue.Queue(maxsize=screenshot_queue_size),
+        "pool": ProcessPoolExecutor(max_workers=os.cpu_count() or 1) if screenshot_optimize_enabled else None,
+        "threads": []
+    }
+    for index in range(screenshot_writer_threads):
+        thread = threading.Thread(target=screenshot_writer_run, args=(writer,), name=f"screenshot-writer-{index}", daemon=True)
+        thread.start()
+        writer["threads"].append(thread)
+    screenshot_writer = writer
+    
+    # Screenshots still queued when the scan is interrupted are written before exiting
+    atexit.register(screenshot_writer_stop)
+
+def screenshot_writer_enqueue(screenshot_path, screenshot_bytes):
+    """
+    Queue a screenshot for the writer stage, waiting while the queue is full.
+    """
+    enqueued = time.perf_counter()
+    screenshot_writer["queue"].put((screenshot_path, screenshot_bytes, enqueued))
+    blocked = time.perf_counter() - enqueued
+    
+    depth = screenshot_writer["queue"].qsize()
+    with screenshot_store_lock:
+        scan_stats["screenshot_queue_max"] = max(scan_stats.get("screenshot_queue_max", 0), depth)
+        scan_stats["screenshot_backpressure_seconds"] = scan_stats.get("screenshot_backpressure_seconds", 0) + blocked
+
+def screenshot_writer_run(writer):
+    """
+    Writer thread: write the queued screenshots until it gets None.
+    """
+    while True:
+        item = writer["queue"].get()
+        try:
+            if item is None:
+                return
+            screenshot_path, screenshot_bytes, enqueued = item
+            written_start = time.perf_counter()
+            size = len(screenshot_bytes)
+            try:
+                if writer["pool"] is not None:
+                    screenshot_bytes = writer["pool"].submit(screenshot_optimize, screenshot_bytes).result()
+                screenshot_write(screenshot_path, screenshot_bytes)
+            except Exception as e:
+                print2(f"Error writing screenshot {os.path.basename(screenshot_path)}: {str(e)}", level=-1)
+                # The next identical screenshot is written again instead of pointing to the missing file
+                with screenshot_store_lock:
+                    screenshot_store_known.discard(screenshot_path)
+                    screenshot_store_failed.add(screenshot_path)
+                    scan_stats["screenshot_write_failures"] = scan_stats.get("screenshot_write_failures", 0) + 1
+                continue
+            written = time.perf_counter()
+            
+            with screenshot_store_lock:
+                screenshot_store_failed.discard(screenshot_path)
+                scan_stats["screenshot_write_seconds"] = scan_stats.get("screenshot_write_seconds", 0) + written - written_start
+                scan_stats["screenshot_latency_max_seconds"] = max(scan_stats.get("screenshot_latency_max_seconds", 0), written - enqueued)
+                if writer["pool"] is not None:
+                    scan_stats["screenshot_bytes_saved"] = scan_stats.get("screenshot_bytes_saved", 0) + size - len(screenshot_bytes)
+        finally:
+            writer["queue"].task_done()
+
+def screenshot_writer_stop():
+    """
+    Wait for the writer stage to write every queued screenshot, then stop it.
+    """
+    global screenshot_writer
+    
+    writer = screenshot_writer
+    if writer is None:
+        return
+    screenshot_writer = None
+    
+    for _ in writer["threads"]:
+        writer["queue"].put(None)
+    for thread in writer["threads"]:
+        thread.join()
+    if writer["pool"] is not None:
+        writer["pool"].shutdown()
+    
+    for key in ("screenshot_write_seconds", "screenshot_latency_max_seconds", "screenshot_backpressure_seconds"):
+        if key in scan_stats:
+            scan_stats[key] = round(scan_stats[key], 3)
+    
+    screenshot_failed_clear()
+
+def screenshot_failed_clear():
+    """
+    Clear the screenshot paths of the sockets whose screenshot the writer stage
+    could not write, so the JSON and the report don't point to missing files.
+    """
+    if not screenshot_store_failed:
+        return
+    
+    cleared = 0
+    for ip_entry in visits["ips"]:
+        for port_entry in ip_entry["ports"]:
+            for port_key, port_data in port_entry.items():
+                failed = port_data.get("screenshot_path_relative") in screenshot_store_failed
+                if failed:
+                    screenshot_paths_set(port_data, None)
+                    cleared += 1
+                for profile_entry in port_data.get("viewports", {}).values():
+                    if profile_entry.get("screenshot_path_relative") in screenshot_store_failed:
+                        screenshot_paths_set(profile_entry, None)
+                        failed = True
+                if failed:
+                    # The live report already has the record with the missing file
+                    live_report_add(ip_entry, port_key, port_data, flush=False)
+    screenshot_store_failed.clear()
+    print2(f"{scan_stats.get('screenshot_write_failures', 0)} screenshots could not be written, {cleared} sockets are saved without a screenshot", level=1)
+
+def screenshot_path_for(screenshot_filename):
+    """
+    Return the path of a screenshot file in the output folder.
+    """
+    if subdir_screenshots:
+        return os.path.join(output_path, output_screenshots_pathname, screenshot_filename)
+    return os.path.join(output_path, screenshot_filename)
+
+def screenshot_paths_set(port_data, screenshot_path, screenshot_pathname=None):
+    """
+    Save the screenshot paths in the port data, in the formats used by the report.
+    screenshot_pathname is the folder of the screenshot relative to the report
+    (default: the screenshot folder of the output). An empty path clears them.
+    """
+    if not screenshot_path:
+        port_data["screenshot_path_relative"] = ""
+        port_data["screenshot_path_full"] = ""
+        port_data["screenshot_pathname"] = ""
+        port_data["screenshot_filename"] = ""
+        port_data["screenshot_hash"] = ""
+        return
+    
+    port_data["screenshot_path_relative"] = screenshot_path
+    port_data["screenshot_path_full"] = os.path.abspath(screenshot_path)
+    # The report loads "<pathname>/<filename>" relative to the HTML file
+    if screenshot_pathname is None:
+        screenshot_pathname = output_screenshots_pathname if subdir_screenshots else "."
+    port_data["screenshot_pathname"] = screenshot_pathname
+    port_data["screenshot_filename"] = os.path.basename(screenshot_path)
+
+def visits_save_json():
+    """
+    Save visits to the JSON file (thread-safe).
+    Called after each visit so partial results survive an interrupted scan.
+    """
+    try:
+        lock_requested = time.perf_counter()
+        with json_write_lock:  # Acquire lock before writing
+            lock_acquired = time.perf_counter()
+            json_file_path = os.path.join(output_path, output_json_final_filename)
+            with open(json_file_path, 'w') as f:
+                json.dump(visits, f, indent=4)
+            scan_stats["json_writes"] += 1
+            scan_stats["json_write_seconds"] += time.perf_counter() - lock_acquired
+        if profile_enabled:
+            profile_record_lock(lock_acquired - lock_requested, time.perf_counter() - lock_acquired)
+        print2(f"Saved visits to {output_json_final_filename}", level=3)
+    except Exception as e:
+        print2(f"Error saving visits JSON: {str(e)}", level=-1)
+
+def visit_page(browser, ip_entry, port_key, protocols, screenshot_dir=None, timeout=None, viewport_profiles=None):
+    """
+    Load the target in a new browser context, trying each protocol in turn,
+    and take a full-page screenshot. timeout is the navigation timeout in
+    seconds (default: visit_timeout).
+    With viewport_profiles (default: viewports), the page is loaded at the
+    first viewport, then resized to each other one and captured again
+    without navigating.
+    The response metadata includes the fingerprint of the page (see
+    fingerprint_collect()), and the path of the Playwright trace when
+    trace_stop() keeps it.
+    Returns (response_status, screenshot_path, screenshot_hash, response_metadata,
+    viewport_screenshots), the last one being {profile: (screenshot_path, screenshot_hash)}.
+    """
+    response_status = "unreachable"
+    screenshot_path = None
+    screenshot_hash = ""
+    response_metadata = {}
+    viewport_screenshots = {}
+    if viewport_profiles is None:
+        viewport_profiles = viewports
+    
+    # Create context with SSL verification disabled
+    context_options = {"viewport": viewport_size(viewport_profiles[0])} if viewport_profiles else {}
+    context = browser.new_context(ignore_https_errors=True, **context_options)
+    visit_start = time.perf_counter()
+    tracing = False
+    try:
+        if trace_percentile is not None:
+            context.tracing.start(screenshots=True, snapshots=True)
+            tracing = True
+        page = context.new_page()
+        capture = fingerprint_listen(context, page)
+        
+        # Set timeout (increased for slower loading pages)
+        timeout = timeout or visit_timeout
+        page.set_default_timeout(timeout * 1000)
+        
+        for attempt, protocol in enumerate(protocols):
+            if attempt and visit_deadline_reached():
+                print2(f"Time budget reached, {protocol.upper()} is not tried", level=3)
+                break
+            url = visit_build_url(ip_entry, port_key, protocol)
+            print2(f"Trying {url}", level=3)
+            
+            try:
+                response = page.goto(url, wait_until="domcontentloaded", timeout=visit_time_left(timeout) * 1000)
+                # Every later step of the visit ends by the --max-duration deadline
+                page.set_default_timeout(visit_time_left(timeout) * 1000)
+                
+                # Wait a bit for any dynamic content to load
+                try:
+                    page.wait_for_load_state("networkidle", timeout=visit_time_left(min(visit_idle_timeout, timeout)) * 1000)
+                except:
+                    # If networkidle times out, that's okay, we already have domcontentloaded
+                    print2(f"Network didn't become idle, but page loaded", level=3)
+                
+                # Get HTTP status code
+                if response:
+                    response_status = str(response.status)
+                    response_metadata = visit_response_metadata(response)
+                    response_metadata.update(fingerprint_collect(page, response, capture))
+                    print2(f"{protocol.upper()} response: {response_status}", level=3)
+                else:
+                    response_status = "no_response"
+                
+                # Take screenshot, stored by content hash (the diff subcommand also
+                # uses the hash to skip identical screenshots without decoding them)
+                screenshot_bytes = page.screenshot(full_page=True)
+                screenshot_path, screenshot_hash = screenshot_store(screenshot_bytes, screenshot_dir)
+                
+                print2(f"Screenshot saved: {os.path.basename(screenshot_path)}", level=3)
+                
+                # The other viewports are captured from the same loaded page
+                if viewport_profiles:
+                    viewport_screenshots[viewport_profiles[0]] = (screenshot_path, screenshot_hash)
+                for profile in viewport_profiles[1:]:
+                    if visit_deadline_reached():
+                        print2(f"Time budget reached, the other viewports of {url} are not captured", level=2)
+                        break
+                    try:
+                        page.set_viewport_size(viewport_size(profile))
+                        page.wait_for_timeout(viewport_settle_ms)
+                        page.set_default_timeout(visit_time_left(timeout) * 1000)
+                        try:
+                            page.wait_for_load_state("networkidle", timeout=visit_time_left(min(visit_idle_timeout, timeout)) * 1000)
+                        except Exception:
+                            pass
+                        viewport_screenshots[profile] = screenshot_store(page.screenshot(full_page=True), screenshot_dir)
+                    except Exception as e:
+                        print2(f"Could not capture the {profile} viewport of {url}: {str(e)[:200]}", level=2)
+                break
+                
+            except Exception as e:
+                screenshot_path = None
+                response_metadata = {}
+                viewport_screenshots = {}
+                
+                # Determine error type, the last attempt reports unknown errors as unreachable
+                error_status = visit_classify_error(e) or ("error" if attempt == 0 else "unreachable")
+                # A transient failure of an earlier protocol stays retryable whatever the later ones report
+                if response_status not in RETRY_RESPONSES or error_status in RETRY_RESPONSES:
+                    response_status = error_status
+                
+                if attempt + 1 < len(protocols):
+                    print2(f"{protocol.upper()} failed ({error_status}), trying {protocols[attempt + 1].upper()}", level=3)
+                else:
+                    print2(f"Failed to connect to {url} - {error_status}", level=3)
+                    print2(f"Error details: {str(e)[:200]}", level=3)
+    finally:
+        if tracing:
+            trace_path = trace_stop(context, ip_entry, port_key, response_status, time.perf_counter() - visit_start)
+            if trace_path:
+                response_metadata["trace_path"] = trace_path
+        context.close()
+    
+    return response_status, screenshot_path, screenshot_hash, response_metadata, viewport_screenshots
+
+def viewport_size(profile):
+    """
+    Return the viewport size of a profile: a VIEWPORT_PROFILES name or "WIDTHxHEIGHT".
+    """
+    if profile in VIEWPORT_PROFILES:
+        return VIEWPORT_PROFILES[profile]
+    width, height = profile.lower().split("x")
+    return {"width": int(width), "height": int(height)}
+
+def viewport_parse(value):
+    """
+    Parse the comma-separated --viewports profiles (argparse type).
+    """
+    profiles = [profile.strip() for profile in value.split(",") if profile.strip()]
+    for profile in profiles:
+        try:
+            size = viewport_size(profile)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"unknown viewport {profile!r}: use {', '.join(VIEWPORT_PROFILES)} or WIDTHxHEIGHT")
+        if not (100 <= size["width"] <= 10000 and 100 <= size["height"] <= 10000):
+            raise argparse.ArgumentTypeError(f"viewport {profile!r} must be between 100 and 10000 pixels wide and high")
+    if not profiles or len(set(profiles)) != len(profiles):
+        raise argparse.ArgumentTypeError("--viewports must list distinct profiles")
+    return profiles
+
+def trace_stop(context, ip_entry, port_key, response_status, duration):
+    """
+    Stop the Playwright tracing of a visit (tail sampling): the trace is only
+    written for a visit with the "error" status, or one among the slowest of
+    the recent visits (at or above the trace_percentile of the last
+    trace_window durations, once trace_min_samples are known). The other
+    traces are discarded without being written.
+    Returns the path of the trace relative to the output folder, or "".
+    """
+    with trace_lock:
+        window = sorted(trace_durations)
+        trace_durations.append(duration)
+        del trace_durations[:-trace_window]
+    slow = len(window) >= trace_min_samples and duration >= window[min(len(window) - 1, int(len(window) * trace_percentile / 100))]
+    target = ip_entry["url"] or ip_entry["ip"]
+    
+    try:
+        if response_status != "error" and not slow:
+            context.tracing.stop()
+            return ""
+        safe_target = "".join(c if c.isalnum() or c in ".-" else "_" for c in target)[:100]
+        trace_path = os.path.join(trace_dirname, f"{safe_target}_{port_key}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.zip")
+        os.makedirs(os.path.join(output_path, trace_dirname), exist_ok=True)
+        context.tracing.stop(path=os.path.join(output_path, trace_path))
+    except Exception as e:
+        print2(f"Could not stop the tracing of {target}:{port_key}: {str(e)[:200]}", level=2)
+        return ""
+    
+    with trace_lock:
+        scan_stats["traces_kept"] = scan_stats.get("traces_kept", 0) + 1
+    print2(f"Kept the trace of {target}:{port_key} ({response_status if not slow else f'{duration:.1f} s'}): {trace_path}", level=2)
+    return trace_path.replace(os.sep, "/")
+
+def trace_percentile_parse(value):
+    """
+    Parse the --trace percentile (argparse type).
+    """
+    try:
+        percentile = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid percentile: {value!r}")
+    if not 0 < percentile < 100:
+        raise argparse.ArgumentTypeError("the --trace percentile must be between 0 and 100")
+    return percentile
+
+def browser_warm_start(host_rules=None):
+    """
+    Thread pool initializer of the serve subcommand: start Playwright and launch a
+    browser that this thread keeps for all its visits, so jobs don't pay for
+    the browser startup. Playwright objects can only be used from the thread
+    that created them.
+    host_rules pins the --host-resolver-rules of the browsers of this thread
+    (a Scanner's own rules), instead of following dns_host_rules.
+    """
+    browser_local.scanner_host_rules = host_rules
+    try:
+        sync_playwright = get_sync_playwright()
+        browser_local.playwright = sync_playwright().start()
+        browser_local.browser = browser_launch(browser_local.playwright)
+        browser_local.host_rules = browser_host_rules()
+        print2(f"Launched warm browser in {threading.current_thread().name}", level=3)
+    except Exception as e:
+        # Visits of this thread fall back to launching a browser each time
+        print2(f"Could not launch a warm browser: {str(e)}", level=-1)
+        browser_local.playwright = None
+
+def browser_warm_stop():
+    """
+    Close the warm browser of the current thread, if it has one.
+    """
+    browser_local.scanner_host_rules = None
+    playwright = getattr(browser_local, "playwright", None)
+    browser_local.playwright = None
+    if playwright is None:
+        return
+    
+    try:
+        browser_local.browser.close()
+        playwright.stop()
+    except Exception as e:
+        print2(f"Error closing warm browser: {str(e)}", level=3)
+
+def browser_warm_get():
+    """
+    Return the warm browser of the current thread (relaunched if it crashed,
+    or to pass the --host-resolver-rules of a new job), or None if the thread
+    has none.
+    """
+    playwright = getattr(browser_local, "playwright", None)
+    if playwright is None:
+        return None
+    
+    if not browser_local.browser.is_connected():
+        print2("Warm browser disconnected, relaunching it", level=1)
+        browser_local.browser = browser_launch(playwright)
+        browser_local.host_rules = browser_host_rules()
+    elif browser_local.host_rules != browser_host_rules():
+        # The rules are a launch argument, a job with other hostnames needs a new browser
+        print2("Relaunching the warm browser with the resolved addresses of the job", level=3)
+        try:
+            browser_local.browser.close()
+        except Exception as e:
+            print2(f"Error closing warm browser: {str(e)}", level=3)
+        browser_local.browser = browser_launch(playwright)
+        browser_local.host_rules = browser_host_rules()
+    return browser_local.browser
+
+def browser_host_rules():
+    """
+    Return the --host-resolver-rules of the browsers of the current thread:
+    the rules pinned by browser_warm_start(), or else dns_host_rules.
+    """
+    host_rules = getattr(browser_local, "scanner_host_rules", None)
+    return dns_host_rules if host_rules is None else host_rules
+
+def browser_launch(playwright):
+    """
+    Launch a headless Chromium that uses the pre-resolved addresses of
+    dns_cache instead of resolving the hostnames again.
+    """
+    host_rules = browser_host_rules()
+    args = [f"--host-resolver-rules={host_rules}"] if host_rules else []
+    return playwright.chromium.launch(headless=True, args=args)
+
+def visit_website(ip_entry, port_key, port_data, timeout=None, viewport_profiles=None):
+    """
+    Visit a website at the given IP:port or URL:port, render JavaScript, and take a screenshot.
+    Updates the port_data dictionary with timestamp and response status, then
+    saves the visits JSON.
+    
+    Args:
+        ip_entry: The IP/URL entry from visits["ips"]
+        port_key: The port number (as string)
+        port_data: The data dictionary for this specific port
+        timeout: Navigation timeout in seconds (default: visit_timeout)
+        viewport_profiles: Viewports captured from the loaded page (default: viewports)
+    """
+    visit_socket(ip_entry, port_key, port_data, timeout=timeout, viewport_profiles=viewport_profiles)
+    
+    # Save visits to JSON file after each visit (thread-safe)
+    visits_save_json()
+    archive_journal(ip_entry, port_key, port_data)
+    live_report_add(ip_entry, port_key, port_data)
+    
+    return True
+
+def visit_closed_shared(ip_entry, port_key, port_data, timeout=None):
+    """
+    Record a socket as refused without visiting it, because its port refused
+    the connection on another name of the same address. The port data is
+    updated like a refused visit (a --baseline screenshot is cleared) and
+    saved like one.
+    """
+    if port_data.get("baseline_status") == "stale":
+        port_data["baseline_status"] = "changed"
+    visit_update(port_data, "refused", 0, timeout)
+    
+    visits_save_json()
+    archive_journal(ip_entry, port_key, port_data)
+    live_report_add(ip_entry, port_key, port_data)
+
+def visit_socket(ip_entry, port_key, port_data, screenshot_dir=None, screenshot_pathname=None, timeout=None, viewport_profiles=None):
+    """
+    Visit one socket and update its port_data, without touching the scan state:
+    screenshots go to screenshot_dir, and the report loads them from
+    screenshot_pathname (default: the output folder of the command-line scan).
+    
+    Port 80 uses http:// without :80 suffix, no HTTPS fallback
+    Port 443 uses https:// without :443 suffix
+    Other ports use http://target:port format with HTTPS fallback
+    """
+    ip = ip_entry["ip"]
+    url_target = ip_entry["url"]
+    
+    # Determine if this is a URL or IP target
+    is_url_target = bool(url_target)
+    target_base = url_target if is_url_target else ip
+    
+    # Build display target
+    display_target = f"{target_base}:{port_key}"
+    print2(f"Visiting website {display_target}", level=2)
+    
+    # Sockets from a --baseline scan are first revalidated without the browser
+    if port_data.get("baseline_status") == "stale":
+        revalidated_by = baseline_revalidate(port_data)
+        if revalidated_by:
+            print2(f"{display_target} unchanged since baseline ({revalidated_by}), skipping browser visit", level=2)
+            port_data["visited_last"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            port_data["baseline_status"] = "unchanged"
+            return
+        port_data["baseline_status"] = "changed"
+    
+    response_status = "unreachable"
+    screenshot_path = None
+    screenshot_hash = ""
+    response_metadata = {}
+    viewport_screenshots = {}
+    visit_start = time.perf_counter()
+    
+    # Determine protocol based on port number
+    port_num = int(port_key)
+    
+    if port_num == 80:
+        protocols = ["http"]  # Don't try HTTPS for port 80
+    elif port_num == 443:
+        protocols = ["https"]  # Already HTTPS, no fallback needed
+    else:
+        protocols = ["http", "https"]  # Try HTTPS if HTTP fails for other ports
+    
+    try:
+        warm_browser = browser_warm_get()
+        if warm_browser is not None:
+            response_status, screenshot_path, screenshot_hash, response_metadata, viewport_screenshots = visit_page(warm_browser, ip_entry, port_key, protocols, screenshot_dir, timeout, viewport_profiles)
+        else:
+            sync_playwright = get_sync_playwright()
+            with sync_playwright() as p:
+                # Launch browser
+                browser = browser_launch(p)
+                response_status, screenshot_path, screenshot_hash, response_metadata, viewport_screenshots = visit_page(browser, ip_entry, port_key, protocols, screenshot_dir, timeout, viewport_profiles)
+                browser.close()
+                
+    except Exception as e:
+        print2(f"Error visiting {display_target} - {str(e)}", level=-1)
+        response_status = "error"
+    
+    visit_update(port_data, response_status, time.perf_counter() - visit_start, timeout, screenshot_path, screenshot_hash,
+                 response_metadata, viewport_screenshots, screenshot_pathname, viewport_profiles)
+
+def visit_update(port_data, response_status, duration, timeout=None, screenshot_path=None, screenshot_hash="",
+                 response_metadata=None, viewport_screenshots=None, screenshot_pathname=None, viewport_profiles=None):
+    """
+    Update the port data with the outcome of a visit: timestamps, response,
+    attempt record, revalidation metadata, fingerprint and screenshot paths
+    (cleared when the visit got no screenshot).
+    """
+    if response_metadata is None:
+        response_metadata = {}
+    if viewport_screenshots is None:
+        viewport_screenshots = {}
+    
+    # Update port data
+    current_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    # Check if this is the first visit
+    if port_data["visited_first"] == "":
+        port_data["visited_first"] = current_timestamp
+        port_data["visited_last"] = current_timestamp
+    else:
+        # Update only the last visit timestamp
+        port_data["visited_last"] = current_timestamp
+    
+    port_data["response"] = response_status
+    port_data["visit_duration"] = round(duration, 3)
+    
+    # Attempt history of this scan, retries append to it
+    port_data.setdefault("attempts", []).append({
+        "time": current_timestamp,
+        "response": response_status,
+        "duration": port_data["visit_duration"],
+        "timeout": round(timeout or visit_timeout, 1)
+    })
+    
+    # A kept trace belongs to this attempt, the port links the latest one
+    if response_metadata.get("trace_path"):
+        port_data["attempts"][-1]["trace_path"] = response_metadata["trace_path"]
+        port_data["trace_path"] = response_metadata["trace_path"]
+    
+    # Revalidation metadata and fingerprint of the loaded page
+    for key in ("visited_url", "etag", "last_modified", "content_hash"):
+        port_data[key] = response_metadata.get(key, "")
+    for key, default in FINGERPRINT_FIELDS.items():
+        port_data[key] = response_metadata.get(key, type(default)())
+    
+    # Save screenshot paths in three formats (cleared if this visit got no screenshot)
+    screenshot_paths_set(port_data, screenshot_path, screenshot_pathname)
+    if screenshot_path:
+        port_data["screenshot_hash"] = screenshot_hash
+    
+    # One screenshot entry per viewport profile, the report toggles between them
+    if viewport_profiles or (viewport_profiles is None and viewports):
+        port_data["viewports"] = {}
+        for profile, (profile_path, profile_hash) in viewport_screenshots.items():
+            profile_entry = dict(viewport_size(profile))
+            screenshot_paths_set(profile_entry, profile_path, screenshot_pathname)
+            profile_entry["screenshot_hash"] = profile_hash
+            port_data["viewports"][profile] = profile_entry
+
+def main_recon_process():
+    """
+    Main reconnaissance process using multithreading for concurrent visits.
+    New structure: visits["ips"] contains IP/URL entries, each with a "ports" array.
+    """
+    global start_time
+    
+    # Shard processes leave the banner and the progress to the parent process
+    if shard_queue is None:
+        print2("\nStarting the recon process...", level=0)
+        print2(f"Using {threads} concurrent threads", level=0, color="cyan")
+        print2('(You can interrupt / pause this process by pressing "escape". An additional prompt will be asked to truely abort the process)', color="yellow", level=0)
+        print2("", level=0)
+    
+    # Start the timer
+    start_time = time.time()
+    memory_governor_stop = memory_governor_start()
+    screenshot_writer_start()
+    
+    # Collect all tasks (ip_entry, port_key, port_data tuples)
+    tasks = []
+    reused_tasks = 0
+    for ip_entry in visits["ips"]:
+        for port_entry in ip_entry["ports"]:
+            for port_key, port_data in port_entry.items():
+                # Fresh and carried over sockets of a --baseline scan are not revisited
+                if port_data.get("baseline_status") in ("fresh", "carried"):
+                    reused_tasks += 1
+                    continue
+                tasks.append((ip_entry, port_key, port_data))
+    
+    if reused_tasks and shard_queue is None:
+        print2(f"Reusing {reused_tasks} sockets from the baseline", level=0, color="cyan")
+    
+    total_tasks = len(tasks)
+    completed_tasks = 0
+    
+    print2(f"Total targets to scan: {total_tasks}", level=2)
+    if shard_queue is None:
+        progress_start(total_tasks)
+    
+    # Wrap visits with per-thread timing when profiling
+    visit_function = profile_visit_website if profile_enabled else visit_website
+    
+    # Hosts that answered before (baseline) or during this scan are visited first
+    live_hosts = {
+        ip_entry["url"] or ip_entry["ip"]
+        for ip_entry in visits["ips"]
+        for port_entry in ip_entry["ports"]
+        for port_data in port_entry.values()
+        if recon_is_live(port_data.get("response"))
+    }
+    pending_by_host = {}  # Target -> indexes of its tasks, to promote them when the host answers
+    schedule = []  # Heap of schedule keys, the last item of a key is the task index
+    for index, (ip_entry, port_key, port_data) in enumerate(tasks):
+        pending_by_host.setdefault(ip_entry["url"] or ip_entry["ip"], []).append(index)
+        schedule.append(recon_schedule_key(ip_entry, port_key, live_hosts, index))
+    heapq.heapify(schedule)
+    started = set()
+    deadline_reached = False
+    # (address, port) refused by a visit: the other names of the address are not visited on that port
+    closed_sockets = set()
+
+    # Use ThreadPoolExecutor for concurrent execution, with at most one pending visit per thread
+    # so that the next visit is always picked from the current schedule
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        running = {}
+        
+        while True:
+            while schedule and len(running) < threads and not deadline_reached and memory_admitted(running):
+                index = heapq.heappop(schedule)[-1]
+                if index in started:
+                    continue
+                timeout = recon_visit_timeout()
+                if timeout is None:
+                    deadline_reached = True
+                    break
+                started.add(index)
+                ip_entry, port_key, port_data = tasks[index]
+                port_data["attempts"] = []
+                if (dns_address(ip_entry), port_key) in closed_sockets:
+                    visit_closed_shared(ip_entry, port_key, port_data, timeout)
+                    completed_tasks += 1
+                    recon_progress(ip_entry, port_key, port_data)
+                    scan_stats["closed_shared"] = scan_stats.get("closed_shared", 0) + 1
+                    print2(f"{ip_entry['url'] or ip_entry['ip']}:{port_key} refused on another name of {dns_address(ip_entry)}, not visited", level=2)
+                    continue
+                running[executor.submit(visit_function, ip_entry, port_key, port_data, timeout)] = index
+            progress_in_flight(len(running))
+            
+            if not running:
+                break
+            
+            # Process completed tasks
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                completed_tasks += 1
+                ip_entry, port_key, port_data = tasks[running.pop(future)]
+                
+                target = ip_entry["url"] if ip_entry["url"] else ip_entry["ip"]
+                try:
+                    future.result()  # This will raise any exceptions that occurred
+                except Exception as e:
+                    print2(f"Exception in thread for {target}:{port_key} - {str(e)}", level=-1)
+                recon_progress(ip_entry, port_key, port_data)
+                
+                if port_data.get("response") == "refused" and dns_address(ip_entry):
+                    closed_sockets.add((dns_address(ip_entry), port_key))
+                
+                # Move the other ports of a host that just answered ahead of unknown hosts
+                if target not in live_hosts and recon_is_live(port_data.get("response")):
+                    live_hosts.add(target)
+                    for index in pending_by_host[target]:
+                        if index not in started:
+                            heapq.heappush(schedule, recon_schedule_key(tasks[index][0], tasks[index][1], live_hosts, index))
+    
+    progress_stop()
+    recon_retry([tasks[index] for index in sorted(started)], visit_function)
+    if memory_governor_stop is not None:
+        memory_governor_stop.set()
+    screenshot_writer_stop()
+
+    # Sockets left when the time budget ran out keep a consistent state in the output
+    skipped_tasks = 0
+    for index, (ip_entry, port_key, port_data) in enumerate(tasks):
+        if index not in started:
+            skipped_tasks += 1
+            if not port_data.get("response"):
+                port_data["response"] = "skipped"
+    if deadline_reached:
+        scan_stats["deadline_reached"] = True
+        scan_stats["skipped"] = skipped_tasks
+        print2(f"Time budget reached, {skipped_tasks} sockets were not visited", level=1 if shard_queue is not None else 0, color="yellow")
+    
+    # Calculate elapsed time
+    end_time = time.time()
+    scan_stats["scan_seconds"] = round(end_time - start_time, 3)
+    
+    if shard_queue is None:
+        print2(f"\nCompleted {completed_tasks} of {total_tasks} scans in {format_elapsed(end_time - start_time)}", level=0, color="green")
+        if scan_stats["screenshots_deduplicated"]:
+            print2(f"Screenshots: {scan_stats['screenshots_written']} written, {scan_stats['screenshots_deduplicated']} identical to a stored one", level=1)
+
+def recon_progress(ip_entry, port_key, port_data):
+    """
+    Count a completed socket on the progress line, or send it to the parent
+    process from a --workers scan process.
+    """
+    if shard_queue is not None:
+        shard_queue.put(("progress", f"{ip_entry['url'] or ip_entry['ip']}:{port_key}", port_data.get("response")))
+    else:
+        progress_advance(port_data.get("response"))
+
+def recon_retry(tasks, visit_function):
+    """
+    Revisit the tasks whose visit failed with a transient error (RETRY_RESPONSES)
+    once the main pass is done, so they no longer compete with it: with
+    retry_threads concurrent visits, a timeout multiplied by
+    retry_timeout_factor on each round, and at most retry_attempts rounds.
+    """
+    retried = set()
+    
+    for attempt in range(1, retry_attempts + 1):
+        retry_tasks = [task for task in tasks if task[2].get("response") in RETRY_RESPONSES]
+        if not retry_tasks:
+            break
+        
+        base_timeout = visit_timeout * retry_timeout_factor ** attempt
+        if recon_visit_timeout(base_timeout) is None:
+            print2(f"Time budget reached, {len(retry_tasks)} failed visits are not retried", level=1)
+            break
+        if shard_queue is None:
+            print2(f"\nRetrying {len(retry_tasks)} failed visits with {retry_threads} threads (round {attempt}/{retry_attempts}, timeout {base_timeout}s)", level=0, color="cyan")
+            progress_start(len(retry_tasks), "Retry")
+
+        with ThreadPoolExecutor(max_workers=retry_threads) as executor:
+            running = {}
+            pending = list(reversed(retry_tasks))
+            
+            while True:
+                while pending and len(running) < retry_threads and memory_admitted(running):
+                    timeout = recon_visit_timeout(base_timeout)
+                    if timeout is None:
+                        pending = []
+                        break
+                    ip_entry, port_key, port_data = pending.pop()
+                    retried.add(id(port_data))
+                    running[executor.submit(visit_function, ip_entry, port_key, port_data, timeout)] = (ip_entry, port_key, port_data)
+                progress_in_flight(len(running))
+                
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ip_entry, port_key, port_data = running.pop(future)
+                    target = ip_entry["url"] if ip_entry["url"] else ip_entry["ip"]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print2(f"Exception in thread for {target}:{port_key} - {str(e)}", level=-1)
+                    progress_advance(port_data.get("response"))
+        progress_stop()
+    
+    if retried:
+        recovered = sum(1 for _, _, port_data in tasks if id(port_data) in retried and port_data.get("response") not in RETRY_RESPONSES)
+        scan_stats["retried"] = len(retried)
+        scan_stats["recovered"] = recovered
+        if shard_queue is None:
+            print2(f"Retries recovered {recovered} of {len(retried)} failed visits", level=0, color="green" if recovered else "yellow")
+
+def memory_size_parse(value):
+    """
+    Parse a memory size like "4096" (MB), "512M" or "6G" into bytes (argparse type).
+    """
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    try:
+        if value and value[-1].lower() in units:
+            size = float(value[:-1]) * units[value[-1].lower()]
+        else:
+            size = float(value) * units["m"]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid memory size: {value!r} (use e.g. 512M, 6G)")
+    if size <= 0:
+        raise argparse.ArgumentTypeError("the memory size must be positive")
+    return int(size)
+
+def memory_format(size):
+    """
+    Format a size in bytes for the log.
+    """
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.1f} GB"
+    return f"{size / 1024 ** 2:.0f} MB"
+
+def memory_processes():
+    """
+    Return {pid: (parent pid, name, RSS in bytes)} for this process and all its
+    descendants (Playwright driver, browsers and their renderers). Uses psutil
+    when installed, else /proc (Linux).
+    Returns None if memory can't be sampled on this system.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    
+    if psutil is not None:
+        root = psutil.Process()
+        processes = {}
+        for process in [root] + root.children(recursive=True):
+            try:
+                processes[process.pid] = (process.ppid(), process.name(), process.memory_info().rss)
+            except psutil.Error:
+                # Exited while sampling
+                continue
+        return processes
+    
+    if not os.path.isdir("/proc"):
+        return None
+    
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    everything = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # "pid (name) state ppid ... rss ...", the name may contain spaces and parentheses
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        fields = stat[stat.rindex(")") + 2:].split()
+        everything[int(entry)] = (int(fields[1]), name, int(fields[21]) * page_size)
+    
+    # Keep the process tree of PageHawk
+    children = {}
+    for pid, (ppid, _, _) in everything.items():
+        children.setdefault(ppid, []).append(pid)
+    processes = {}
+    pending = [os.getpid()]
+    while pending:
+        pid = pending.pop()
+        if pid in everything:
+            processes[pid] = everything[pid]
+            pending.extend(children.get(pid, ()))
+    return processes
+
+def memory_browsers(processes):
+    """
+    Group the sampled processes by browser: returns a list of (RSS of the whole
+    browser with its renderers, browser process pid), biggest first.
+    """
+    def is_browser(name):
+        name = name.lower()
+        return "chrom" in name or "headless_shell" in name
+    
+    children = {}
+    for pid, (ppid, _, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    
+    browsers = []
+    for pid, (ppid, name, _) in processes.items():
+        # The browser process is the top Chromium process of its tree
+        if not is_browser(name) or (ppid in processes and is_browser(processes[ppid][1])):
+            continue
+        rss = 0
+        pending = [pid]
+        while pending:
+            child = pending.pop()
+            rss += processes[child][2]
+            pending.extend(children.get(child, ()))
+        browsers.append((rss, pid))
+    
+    return sorted(browsers, reverse=True)
+
+def memory_recycle_browser(pid):
+    """
+    Kill a browser process: its visit fails (and goes to the retry queue), a
+    warm browser is relaunched on its next visit (see browser_warm_get()).
+    """
+    try:
+        import psutil
+        psutil.Process(pid).kill()
+    except ImportError:
+        os.kill(pid, signal.SIGKILL)
+
+def memory_governor(stop, last_recycle):
+    """
+    Memory governor thread of a scan: runs memory_governor_check() every
+    memory_sample_seconds until stop is set.
+    """
+    while not stop.wait(memory_sample_seconds):
+        last_recycle = memory_governor_check(last_recycle)
+        if last_recycle is None:
+            break
+    memory_admit.set()
+
+def memory_governor_check(last_recycle):
+    """
+    Sample the RSS of PageHawk and its browsers. Above memory_soft_limit,
+    memory_admit is cleared so no new visit starts; above memory_hard_limit,
+    the biggest browser is recycled (at most once per memory_recycle_seconds,
+    to give its memory time to be released).
+    Returns the time of the last recycle, or None if memory can't be sampled.
+    """
+    processes = memory_processes()
+    if processes is None:
+        print2("Memory can't be sampled on this system (install psutil), the memory governor is disabled", level=1)
+        memory_admit.set()
+        return None
+    
+    total = sum(rss for _, _, rss in processes.values())
+    scan_stats["memory_peak"] = max(scan_stats.get("memory_peak", 0), total)
+    
+    if memory_soft_limit and total > memory_soft_limit:
+        if memory_admit.is_set():
+            print2(f"Memory {memory_format(total)} above the soft limit ({memory_format(memory_soft_limit)}), pausing new visits", level=0, color="yellow")
+            memory_admit.clear()
+    elif not memory_admit.is_set():
+        print2(f"Memory {memory_format(total)} back under the soft limit, resuming visits", level=0, color="green")
+        memory_admit.set()
+    
+    if memory_hard_limit and total > memory_hard_limit and time.time() - last_recycle >= memory_recycle_seconds:
+        browsers = memory_browsers(processes)
+        if browsers:
+            rss, pid = browsers[0]
+            print2(f"Memory {memory_format(total)} above the hard limit ({memory_format(memory_hard_limit)}), recycling the biggest browser (pid {pid}, {memory_format(rss)})", level=0, color="yellow")
+            try:
+                memory_recycle_browser(pid)
+                scan_stats["browsers_recycled"] = scan_stats.get("browsers_recycled", 0) + 1
+            except Exception as e:
+                print2(f"Could not recycle browser {pid}: {str(e)}", level=1)
+            last_recycle = time.time()
+    
+    return last_recycle
+
+def memory_governor_start():
+    """
+    Start the memory governor thread if a limit is set.
+    Returns the Event that stops it, or None.
+    """
+    if not memory_soft_limit and not memory_hard_limit:
+        return None
+    
+    # The first sample is taken before any visit starts
+    memory_admit.set()
+    last_recycle = memory_governor_check(0)
+    if last_recycle is None:
+        return None
+    
+    stop = threading.Event()
+    threading.Thread(target=memory_governor, args=(stop, last_recycle), name="memory-governor", daemon=True).start()
+    return stop
+
+def memory_admitted(running):
+    """
+    Return True if a new visit may start. At least one visit always runs, so
+    the scan keeps going, slowly, when PageHawk alone is above the soft limit.
+    """
+    return not running or memory_admit.is_set()
+
+def recon_is_live(response):
+    """
+    Return True if the response is an HTTP status code, i.e. the host answered.
+    """
+    return isinstance(response, str) and response.isdigit()
+
+def recon_schedule_key(ip_entry, port_key, live_hosts, index):
+    """
+    Return the schedule key of a task, smallest first: --priority targets, then
+    hosts known to be live, then ports by tier (DEFAULT_PORTS_1 first,
+    DEFAULT_PORTS_3 last), then input order.
+    """
+    target = ip_entry["url"] or ip_entry["ip"]
+    prioritized = target in priority_hosts or f"{target}:{port_key}" in priority_sockets
+    return (
+        0 if prioritized else 1,
+        0 if target in live_hosts else 1,
+        PORT_TIERS.get(int(port_key), 1),
+        index
+    )
+
+def recon_visit_timeout(base_timeout=None):
+    """
+    Return the navigation timeout of a visit started now: base_timeout (default:
+    visit_timeout), shrunk as the --max-duration deadline approaches.
+    Returns None when there is no time left to start a visit. The rest of the
+    visit is bounded by the deadline too (see visit_time_left()).
+    """
+    base_timeout = base_timeout or visit_timeout
+    if recon_deadline is None:
+        return base_timeout
+    
+    remaining = recon_deadline - recon_deadline_margin - time.time()
+    if remaining < recon_min_visit_seconds:
+        return None
+    # The visit may try both HTTP and HTTPS
+    return min(base_timeout, remaining / 2)
+
+def visit_time_left(seconds):
+    """
+    Return the timeout in seconds of one step of a visit: seconds, shrunk to
+    the time left before the --max-duration deadline (at least 0.1 s).
+    """
+    if recon_deadline is None:
+        return seconds
+    return max(0.1, min(seconds, recon_deadline - recon_deadline_margin - time.time()))
+
+def visit_deadline_reached():
+    """
+    Return True if the --max-duration deadline leaves no time for another
+    step of a visit (second protocol, extra viewport).
+    """
+    return recon_deadline is not None and recon_deadline - recon_deadline_margin - time.time() < recon_min_visit_seconds
+
+def duration_parse(value):
+    """
+    Parse a duration like "90", "90s", "45m" or "2h" into seconds (argparse type).
+    """
+    units = {"s": 1, "m": 60, "h": 3600}
+    try:
+        if value and value[-1].lower() in units:
+            seconds = float(value[:-1]) * units[value[-1].lower()]
+        else:
+            seconds = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration: {value!r} (use e.g. 90s, 45m, 2h)")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError("the duration must be positive")
+    return seconds
+
+def priority_parse(priority_value):
+    """
+    Parse the --priority targets (same formats as --input) into priority_hosts
+    and priority_sockets.
+    Returns True if valid, False otherwise.
+    """
+    targets = {"ips": [], "urls": [], "ports": [], "sockets": []}
+    if not input_ip_parse(priority_value, targets):
+        return False
+    
+    priority_hosts.update(targets["ips"])
+    priority_sockets.update(targets["sockets"])
+    # "domain:port" is parsed as a URL, it names one socket of the domain
+    for url in targets["urls"]:
+        host, _, port = url.rpartition(":")
+        if host and port.isdigit():
+            priority_sockets.add(url)
+        else:
+            priority_hosts.add(url)
+    print2(f"Priority targets: {len(priority_hosts)} hosts, {len(priority_sockets)} sockets", level=2)
+    
+    return True
+
+def format_elapsed(elapsed):
+    """
+    Format an elapsed time in seconds for display.
+    """
+    elapsed_seconds = int(elapsed)
+    
+    if elapsed_seconds >= 60:
+        minutes = elapsed_seconds // 60
+        seconds = elapsed_seconds % 60
+        return f"{minutes} minute{'s' if minutes != 1 else ''} and {seconds} second{'s' if seconds != 1 else ''}"
+    return f"{elapsed_seconds} second{'s' if elapsed_seconds != 1 else ''}"
+
+class Scanner:
+    """
+    Reentrant scanner for embedding PageHawk in another program.
+    Each Scanner keeps its own targets, resolved addresses (the browsers of its
+    threads get its host resolver rules), results and output folder, so several
+    can run one after the other or at the same time in one process. Results are
+    available per visit as they complete:
+    
+        scanner = Scanner("10.0.0.0/24", "results", ports="80,443", threads=5)
+        for result in scanner.results():
+            print(result["ip"], result["port"], result["data"]["response"])
+        scanner.save()
+    
+    Also available: scanner.run(callback) and `async for result in scanner.results_async()`.
+    Each result is {"ip", "url", "port", "data", "error"}, where data is the port
+    entry of scanner.visits. The output verbosity (print2), the visit settings
+    (visit_timeout, viewports, trace_percentile...) and the scan_stats counters
+    are process-wide: concurrent scanners share them, scanner.stats is per scanner.
+    """
+    def __init__(self, targets, output, ports=None, threads=10, subdir_screenshots=False):
+        """
+        targets: IPs, URLs, domains, CIDR ranges (comma-separated), a target file or an Nmap XML file
+        output: existing folder for the screenshots and the JSON/HTML output
+        ports: comma-separated ports or default1/default2/default3/default_all (default: default_all)
+        Raises ValueError if the targets, ports or output folder are invalid.
+        """
+        if threads < 1:
+            raise ValueError("threads must be at least 1")
+        if not os.path.isdir(output):
+            raise ValueError(f"Output path does not exist: {output}")
+        
+        self.output = output
+        self.threads = threads
+        self.screenshot_pathname = output_screenshots_pathname if subdir_screenshots else "."
+        self.screenshot_dir = os.path.join(output, self.screenshot_pathname)
+        os.makedirs(self.screenshot_dir, exist_ok=True)
+        self.stats = {"scan_seconds": 0.0, "visits": 0}
+        
+        self.targets = {"ips": [], "urls": [], "ports": [], "sockets": []}
+        if not input_ip_parse(targets, self.targets):
+            raise ValueError(f"Invalid targets: {targets}")
+        if not input_port_parse(argparse.Namespace(ports=ports), self.targets):
+            raise ValueError(f"Invalid ports: {ports}")
+        dns_resolve(self.targets)
+        self.host_rules = dns_rules_build(dns_target_hostnames(self.targets)[0])
+        build_sockets(self.targets)
+        self.visits = visits_build(self.targets["sockets"])
+        if self.visits is None:
+            raise ValueError("Visits building failed")
+    
+    def results(self):
+        """
+        Visit every socket with `threads` browsers and yield each result as
+        soon as its visit completes. Stopping the iteration early stops the
+        scan after the visits in progress.
+        """
+        tasks = queue.SimpleQueue()
+        for ip_entry in self.visits["ips"]:
+            for port_entry in ip_entry["ports"]:
+                for port_key, port_data in port_entry.items():
+                    tasks.put((ip_entry, port_key, port_data))
+        results = queue.SimpleQueue()
+        stop_event = threading.Event()
+        
+        def visit_worker():
+            # Each thread keeps one browser for all its visits
+            browser_warm_start(self.host_rules)
+            try:
+                while not stop_event.is_set():
+                    try:
+                        ip_entry, port_key, port_data = tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                    error = ""
+                    try:
+                        visit_socket(ip_entry, port_key, port_data, self.screenshot_dir, self.screenshot_pathname)
+                    except Exception as e:
+                        error = str(e)
+                    results.put({"ip": ip_entry["ip"], "url": ip_entry["url"], "port": port_key, "data": port_data, "error": error})
+            finally:
+                browser_warm_stop()
+                results.put(None)
+        
+        worker_count = min(self.threads, tasks.qsize()) or 1
+        workers = [threading.Thread(target=visit_worker, name=f"pagehawk-scanner-{i}", daemon=True) for i in range(worker_count)]
+        scan_start = time.time()
+        for worker in workers:
+            worker.start()
+        
+        try:
+            running = len(workers)
+            while running:
+                result = results.get()
+                if result is None:
+                    running -= 1
+                    continue
+                self.stats["visits"] += 1
+                yield result
+        finally:
+            stop_event.set()
+            for worker in workers:
+                worker.join()
+            self.stats["scan_seconds"] = round(time.time() - scan_start, 3)
+    
+    def run(self, callback=None):
+        """
+        Run the whole scan, calling callback(result) after each visit.
+        Returns the visits dictionary.
+        """
+        for result in self.results():
+            if callback is not None:
+                callback(result)
+        return self.visits
+    
+    async def results_async(self):
+        """
+        Async iterator over the results, for asyncio programs. The visits run
+        in threads, the event loop only waits for each result.
+        """
+        results = self.results()
+        done = object()
+        try:
+            while True:
+                result = await asyncio.to_thread(next, results, done)
+                if result is done:
+                    break
+                yield result
+        finally:
+            try:
+                results.close()
+            except ValueError:
+                # Cancelled while a thread waits in next(), the scan ends with its visits
+                pass
+    
+    def save(self, html_filename="pagehawk_results.html"):
+        """
+        Write the JSON results and the HTML report to the output folder.
+        Returns the path of the HTML report.
+        """
+        json_path = os.path.join(self.output, os.path.splitext(html_filename)[0] + ".json")
+        with open(json_path, 'w') as f:
+            json.dump(dict(self.visits, stats=self.stats), f, indent=4)
+        
+        html_content = generate_html(self.visits)
+        if html_content is None:
+            raise ValueError("Could not generate the HTML report")
+        html_path = os.path.join(self.output, html_filename)
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        return html_path
+
+def shard_split(shard_count):
+    """
+    Split the sockets to visit into shards for the scan processes.
+    Whole IP/URL entries go to the shard with the fewest sockets so far, and only
+    the ports that need a visit are sent. Names resolving to the same address
+    stay in one shard, which shares the closed ports between them.
+    Returns a list of shards, each a list of (index in visits["ips"], IP/URL entry).
+    """
+    shards = [[] for _ in range(shard_count)]
+    sizes = [0] * shard_count
+    address_shards = {}
+    
+    for entry_index, ip_entry in enumerate(visits["ips"]):
+        ports = [
+            port_entry for port_entry in ip_entry["ports"]
+            if any(port_data.get("baseline_status") not in ("fresh", "carried") for port_data in port_entry.values())
+        ]
+        if not ports:
+            continue
+        address = dns_address(ip_entry)
+        shard_index = address_shards.get(address) if address else None
+        if shard_index is None:
+            shard_index = sizes.index(min(sizes))
+            if address:
+                address_shards[address] = shard_index
+        shards[shard_index].append((entry_index, {"ip": ip_entry["ip"], "url": ip_entry["url"], "ports": ports}))
+        sizes[shard_index] += len(ports)
+    
+    return [shard for shard in shards if shard]
+
+def shard_json_filename(shard_index):
+    """
+    Return the name of the JSON file a scan process saves its partial results to.
+    """
+    return f"{os.path.splitext(output_json_final_filename)[0]}.shard{shard_index}.json"
+
+def shard_worker(shard_index, shard, settings, result_queue):
+    """
+    Entry point of a scan process: visit the sockets of one shard with its own
+    thread pool and browsers, then send the results to the parent process.
+    Partial results are saved to a per-shard JSON file after each visit.
+    """
+    global visits, shard_queue, output_json_final_filename
+    
+    for name, value in settings.items():
+        globals()[name] = value
+    output_json_final_filename = shard_json_filename(shard_index)
+    shard_queue = result_queue
+    visits = {"ips": [ip_entry for _, ip_entry in shard]}
+    
+    try:
+        main_recon_process()
+        result_queue.put(("done", shard_index, [(entry_index, ip_entry) for (entry_index, _), ip_entry in zip(shard, visits["ips"])], scan_stats))
+    except BaseException as e:
+        result_queue.put(("failed", shard_index, str(e)))
+        raise
+
+def shard_merge(results):
+    """
+    Copy the port data of a finished shard back into visits.
+    """
+    for entry_index, shard_entry in results:
+        current_ports = {
+            port_key: port_data
+            for port_entry in visits["ips"][entry_index]["ports"]
+            for port_key, port_data in port_entry.items()
+        }
+        for port_entry in shard_entry["ports"]:
+            for port_key, port_data in port_entry.items():
+                current_ports[port_key].update(port_data)
+
+def shard_recon():
+    """
+    Run the recon with `workers` scan processes instead of one.
+    The sockets are split into shards, each process visits its shard with its own
+    threads and browsers, and the parent aggregates the progress and merges the
+    results into visits. Shards of a failed process are merged from their partial
+    JSON file.
+    """
+    global start_time
+    
+    shards = shard_split(workers)
+    total_tasks = sum(len(ip_entry["ports"]) for shard in shards for _, ip_entry in shard)
+    
+    print2("\nStarting the recon process...", level=0)
+    print2(f"Using {len(shards)} scan processes with {threads} concurrent threads each", level=0, color="cyan")
+    print2("", level=0)
+    
+    start_time = time.time()
+    
+    settings = {
+        "verbosity_level": verbosity_level,
+        "threads": threads,
+        "output_path": output_path,
+        "subdir_screenshots": subdir_screenshots,
+        "output_screenshots_pathname": output_screenshots_pathname,
+        "output_json_final_filename": output_json_final_filename,
+        "baseline_timeout": baseline_timeout,
+        "baseline_max_body": baseline_max_body,
+        "recon_deadline": recon_deadline,
+        "priority_hosts": priority_hosts,
+        "priority_sockets": priority_sockets,
+        "retry_attempts": retry_attempts,
+        "retry_threads": retry_threads,
+        "dns_cache": dns_cache,
+        "dns_host_rules": dns_host_rules,
+        "viewports": viewports,
+        "trace_percentile": trace_percentile,
+        "screenshot_optimize_enabled": screenshot_optimize_enabled,
+        # Each scan process governs its share of the memory limits
+        "memory_soft_limit": memory_soft_limit // len(shards) if memory_soft_limit else None,
+        "memory_hard_limit": memory_hard_limit // len(shards) if memory_hard_limit else None
+    }
+    result_queue = multiprocessing.Queue()
+    processes = {}
+    for shard_index, shard in enumerate(shards):
+        process = multiprocessing.Process(
+            target=shard_worker,
+            args=(shard_index, shard, settings, result_queue),
+            name=f"pagehawk-shard{shard_index}"
+        )
+        process.start()
+        processes[shard_index] = process
+    
+    completed_tasks = 0
+    finished = set()
+    failed = set()
+    exited = set()  # Processes found dead, their last messages may still be in the queue
+    progress_start(total_tasks)
+    progress_in_flight(min(threads * len(shards), total_tasks))
+    while len(finished) < len(processes):
+        try:
+            message = result_queue.get(timeout=1)
+        except queue.Empty:
+            # A process that died without reporting (killed, crashed) is a failed shard. It can
+            # exit right after sending "done": it only fails when the queue stays empty a second later
+            for shard_index, process in processes.items():
+                if shard_index in finished or process.is_alive():
+                    continue
+                if shard_index in exited:
+                    print2(f"Scan process {shard_index} exited with code {process.exitcode} without sending its results", level=-1)
+                    finished.add(shard_index)
+                    failed.add(shard_index)
+                else:
+                    exited.add(shard_index)
+            continue
+        
+        if message[0] == "progress":
+            completed_tasks += 1
+            progress_advance(message[2])
+            progress_in_flight(min(threads * (len(processes) - len(finished)), total_tasks - completed_tasks))
+        elif message[0] == "log":
+            # Messages of the scan processes are written by the logger of this one
+            print2(message[1], color=message[2], level=message[3])
+        elif message[0] == "done":
+            _, shard_index, results, shard_stats = message
+            shard_merge(results)
+            scan_stats["json_writes"] += shard_stats["json_writes"]
+            scan_stats["json_write_seconds"] += shard_stats["json_write_seconds"]
+            for key in ("skipped", "retried", "recovered", "closed_shared", "screenshots_written", "screenshots_deduplicated", "browsers_recycled",
+                        "screenshot_write_seconds", "screenshot_backpressure_seconds", "screenshot_bytes_saved", "screenshot_write_failures", "traces_kept"):
+                if key in shard_stats:
+                    scan_stats[key] = scan_stats.get(key, 0) + shard_stats[key]
+            for key in ("memory_peak", "screenshot_queue_max", "screenshot_latency_max_seconds"):
+                if key in shard_stats:
+                    scan_stats[key] = max(scan_stats.get(key, 0), shard_stats[key])
+            if shard_stats.get("deadline_reached"):
+                scan_stats["deadline_reached"] = True
+            finished.add(shard_index)
+        elif message[0] == "failed":
+            _, shard_index, error = message
+            print2(f"Scan process {shard_index} failed: {error}", level=-1)
+            finished.add(shard_index)
+            failed.add(shard_index)
+    
+    progress_stop()
+    for process in processes.values():
+        process.join()
+    
+    # Recover what the failed processes saved, remove the partial files of the others
+    for shard_index in processes:
+        shard_json_path = os.path.join(output_path, shard_json_filename(shard_index))
+        if shard_index in failed and os.path.isfile(shard_json_path):
+            try:
+                results = list(zip((entry_index for entry_index, _ in shards[shard_index]), report_json_stream(shard_json_path)))
+                shard_merge(results)
+                print2(f"Recovered partial results of scan process {shard_index}", level=1)
+            except (OSError, ValueError) as e:
+                print2(f"Could not recover {shard_json_path}: {str(e)}", level=-1)
+                continue
+        if os.path.isfile(shard_json_path):
+            os.remove(shard_json_path)
+    
+    if failed:
+        print2(f"{len(failed)} scan process(es) failed, {total_tasks - completed_tasks} sockets were not visited", level=-1)
+    
+    end_time = time.time()
+    scan_stats["scan_seconds"] = round(end_time - start_time, 3)
+    
+    print2(f"\nCompleted {completed_tasks} of {total_tasks} scans in {format_elapsed(end_time - start_time)}", level=0, color="green")
+    if scan_stats["screenshots_deduplicated"]:
+        print2(f"Screenshots: {scan_stats['screenshots_written']} written, {scan_stats['screenshots_deduplicated']} identical to a stored one", level=1)
+
+def recon_tasks():
+    """
+    Collect the sockets to visit (coordinator and serve modes).
+    Returns a list of (ip_entry, port_key, port_data) tuples.
+    """
+    tasks = []
+    for ip_entry in visits["ips"]:
+        for port_entry in ip_entry["ports"]:
+            for port_key, port_data in port_entry.items():
+                # Fresh and carried over sockets of a --baseline scan are not revisited
+                if port_data.get("baseline_status") not in ("fresh", "carried"):
+                    tasks.append((ip_entry, port_key, port_data))
+    return tasks
+
+class CoordinatorState:
+    """
+    Work queue of the coordinator: sockets are leased to workers in batches and
+    go back to the queue when their lease expires before the results arrive.
+    All methods are called under the state lock by the HTTP handler threads.
+    """
+    def __init__(self, tasks):
+        self.lock = threading.Lock()
+        self.tasks = tasks
+        self.queue = list(range(len(tasks) - 1, -1, -1))  # Task indexes, popped from the end
+        self.leases = {}  # Lease id -> {"worker", "tasks": set of task indexes, "expires"}
+        self.lease_counter = 0
+        self.completed = set()
+        self.finished = threading.Event()
+        if not tasks:
+            self.finished.set()
+
+    def expire_leases(self):
+        now = time.time()
+        for lease_id, lease in list(self.leases.items()):
+            if lease["expires"] < now:
+                pending = [task for task in lease["tasks"] if task not in self.completed]
+                if pending:
+                    print2(f"Lease {lease_id} of worker {lease['worker']} expired, requeueing {len(pending)} sockets", level=1)
+                self.queue.extend(pending)
+                del self.leases[lease_id]
+
+    def lease(self, worker, batch_size):
+        self.expire_leases()
+        if self.finished.is_set():
+            return {"done": True}
+        if not self.queue:
+            # Everything is leased out, ask the worker to come back in case a lease expires
+            return {"wait": 2}
+
+        tasks = [self.queue.pop() for _ in range(min(batch_size, len(self.queue)))]
+        self.lease_counter += 1
+        lease_id = str(self.lease_counter)
+        self.leases[lease_id] = {"worker": worker, "tasks": set(tasks), "expires": time.time() + coordinator_lease_seconds}
+        print2(f"Leased {len(tasks)} sockets to worker {worker} (lease {lease_id})", level=2)
+
+        sockets = []
+        for task in tasks:
+            ip_entry, port_key, port_data = self.tasks[task]
+            sockets.append({"task": task, "ip": ip_entry["ip"], "url": ip_entry["url"], "port": port_key, "data": port_data})
+        return {"lease": lease_id, "lease_seconds": coordinator_lease_seconds, "sockets": sockets}
+
+    def result(self, lease_id, task, data, screenshot):
+        lease = self.leases.get(lease_id)
+        if lease is not None:
+            # Each result extends the lease of the rest of the batch
+            lease["expires"] = time.time() + coordinator_lease_seconds
+            lease["tasks"].discard(task)
+            if not lease["tasks"]:
+                del self.leases[lease_id]
+
+        if not isinstance(task, int) or not 0 <= task < len(self.tasks):
+            raise ValueError(f"Unknown task {task}")
+        if task in self.completed:
+            # Late result of an expired lease, the socket was already reported by another worker
+            return False
+
+        ip_entry, port_key, port_data = self.tasks[task]
+        # A baseline socket found unchanged keeps the screenshot the coordinator already has
+        screenshot_fields = {key: value for key, value in port_data.items() if key.startswith("screenshot_")}
+        port_data.update(data)
+        if data.get("baseline_status") == "unchanged":
+            port_data.update(screenshot_fields)
+        elif screenshot:
+            # Stored under the hash computed here, not the name sent by the worker
+            screenshot_path, screenshot_hash = screenshot_store(screenshot)
+            screenshot_paths_set(port_data, screenshot_path)
+            port_data["screenshot_hash"] = screenshot_hash
+        else:
+            screenshot_paths_set(port_data, None)
+
+        self.completed.add(task)
+        if task in self.queue:
+            self.queue.remove(task)
+        if len(self.completed) == len(self.tasks):
+            self.finished.set()
+        return True
+
+def coordinator_handler(state):
+    """
+    Build the HTTP request handler class of the coordinator.
+    POST /lease hands out a batch of sockets, POST /result stores the result of one socket.
+    """
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            print2(f"Coordinator: {self.address_string()} {format % args}", level=3)
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if coordinator_token and not hmac.compare_digest(self.headers.get("X-PageHawk-Token", ""), coordinator_token):
+                self.send_json(403, {"error": "invalid token"})
+                return
+
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if self.path == "/lease":
+                    with state.lock:
+                        payload = state.lease(str(request.get("worker", self.address_string())), max(1, int(request.get("batch", 1))))
+                    self.send_json(200, payload)
+                elif self.path == "/result":
+                    screenshot = base64.b64decode(request["screenshot"]) if request.get("screenshot") else b""
+                    with state.lock:
+                        accepted = state.result(request.get("lease"), request.get("task"), request.get("data", {}), screenshot)
+                    if accepted:
+                        visits_save_json()
+                        archive_journal(*state.tasks[request["task"]])
+                        live_report_add(*state.tasks[request["task"]])
+                        progress_advance(state.tasks[request["task"]][2].get("response"))
+                    self.send_json(200, {"accepted": accepted})
+                else:
+                    self.send_json(404, {"error": "unknown endpoint"})
+            except (ValueError, KeyError, TypeError, OSError) as e:
+                print2(f"Coordinator: bad request from {self.address_string()}: {str(e)}", level=1)
+                self.send_json(400, {"error": str(e)})
+
+    return CoordinatorHandler
+
+def coordinator_recon(listen):
+    """
+    Run the recon as the coordinator of a distributed scan: hold the sockets to
+    visit and the results, and serve them over HTTP to `pagehawk.py worker`
+    processes on any number of machines. Returns when every socket has a result.
+    """
+    global start_time
+
+    host, port = listen.rsplit(':', 1)
+    state = CoordinatorState(recon_tasks())
+    total_tasks = len(state.tasks)
+
+    server = ThreadingHTTPServer((host, int(port)), coordinator_handler(state))
+    server.daemon_threads = True
+    server_thread = threading.Thread(target=server.serve_forever, name="pagehawk-coordinator", daemon=True)
+    server_thread.start()
+
+    print2("\nStarting the recon process...", level=0)
+    print2(f"Coordinator listening on {host}:{server.server_address[1]}, waiting for workers", level=0, color="cyan")
+    print2(f"Start workers with: pagehawk.py worker {host}:{server.server_address[1]}", level=0, color="cyan")
+    print2("", level=0)
+
+    start_time = time.time()
+    progress_start(total_tasks)
+    try:
+        while not state.finished.wait(1):
+            # Sockets leased to workers are the ones in flight
+            with state.lock:
+                progress_in_flight(sum(len(lease["tasks"]) for lease in state.leases.values()))
+        progress_stop()
+        # Keep answering for a moment so polling workers learn that the scan is done
+        time.sleep(3)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    end_time = time.time()
+    scan_stats["scan_seconds"] = round(end_time - start_time, 3)
+
+    print2(f"\nCompleted all {total_tasks} scans in {format_elapsed(end_time - start_time)}", level=0, color="green")
+
+def worker_arguments_parse(argv):
+    """
+    Parse command-line arguments of the worker subcommand.
+    Returns the parsed arguments.
+    """
+    global verbosity_level, threads
+
+    parser = argparse.ArgumentParser(
+        prog="pagehawk.py worker",
+        description="PageHawk - Visit sockets leased from a coordinator (pagehawk.py --listen) and send back the results"
+    )
+    parser.add_argument(
+        "coordinator",
+        help="Address of the coordinator (HOST:PORT)"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=10,
+        help="Number of concurrent threads (default: 10)"
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        help="Number of sockets leased at once (default: twice the number of threads)"
+    )
+    parser.add_argument(
+        "--name",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Worker name shown by the coordinator (default: hostname-pid)"
+    )
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("PAGEHAWK_TOKEN", ""),
+        help="Shared secret of the coordinator (default: PAGEHAWK_TOKEN environment variable)"
+    )
+    parser.add_argument(
+        "-v",
+        action="count",
+        default=0,
+        help="Increase verbosity (-v=warning, -vv=info, -vvv=debug)"
+    )
+
+    args = parser.parse_args(argv)
+    verbosity_level = args.v
+    threads = args.threads
+
+    if args.threads < 1:
+        parser.error("--threads must be at least 1")
+    if args.batch is None:
+        args.batch = 2 * args.threads
+    elif args.batch < 1:
+        parser.error("--batch must be at least 1")
+
+    return args
+
+def worker_request(url, payload, token, retry_seconds=30):
+    """
+    POST a JSON payload to the coordinator and return the decoded JSON answer.
+    Connection errors are retried for retry_seconds, then re-raised.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["X-PageHawk-Token"] = token
+
+    deadline = time.time() + retry_seconds
+    while True:
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Coordinator answered {e.code}: {e.read()[:200].decode('utf-8', 'replace')}")
+        except OSError as e:
+            if time.time() >= deadline:
+                raise
+            print2(f"Coordinator unreachable ({str(e)}), retrying", level=1)
+            time.sleep(2)
+
+def worker_visit(base_url, token, lease_id, socket_entry):
+    """
+    Visit one leased socket with the regular visit_website() pipeline and push
+    the result and the screenshot to the coordinator.
+    """
+    ip_entry = {"ip": socket_entry["ip"], "url": socket_entry["url"], "ports": [{socket_entry["port"]: socket_entry["data"]}]}
+    port_data = socket_entry["data"]
+
+    with json_write_lock:
+        visits["ips"].append(ip_entry)
+    try:
+        visit_website(ip_entry, socket_entry["port"], port_data)
+
+        screenshot = ""
+        screenshot_path = port_data.get("screenshot_path_full")
+        if screenshot_path and os.path.isfile(screenshot_path):
+            with open(screenshot_path, 'rb') as f:
+                screenshot = base64.b64encode(f.read()).decode("ascii")
+
+        answer = worker_request(f"{base_url}/result", {
+            "lease": lease_id,
+            "task": socket_entry["task"],
+            "data": port_data,
+            "screenshot": screenshot
+        }, token)
+    finally:
+        # The local copy stays in the temporary folder until the worker exits:
+        # later visits of identical pages point to the same content-addressed file.
+        # The entry is removed by identity, another in-flight entry can be equal to it
+        with json_write_lock:
+            for index, entry in enumerate(visits["ips"]):
+                if entry is ip_entry:
+                    del visits["ips"][index]
+                    break
+
+    if not answer.get("accepted"):
+        print2(f"Result of {socket_entry['url'] or socket_entry['ip']}:{socket_entry['port']} was already reported by another worker", level=2)
+
+def worker_main(argv):
+    """
+    Entry point of the worker subcommand: lease batches of sockets from the
+    coordinator, visit them and push the results back until the scan is done.
+    Screenshots are taken into a temporary folder and uploaded with the results.
+    """
+    global visits, output_path, output_json_final_filename
+
+    args = worker_arguments_parse(argv)
+    base_url = args.coordinator if "://" in args.coordinator else f"http://{args.coordinator}"
+    base_url = base_url.rstrip('/')
+
+    output_path = tempfile.mkdtemp(prefix="pagehawk-worker-")
+    output_json_final_filename = "pagehawk_worker.json"  # Local journal of the sockets in progress
+    visits = {"ips": []}
+
+    print2(f"Worker {args.name} connecting to {base_url} with {args.threads} threads", level=0)
+    completed = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            while True:
+                try:
+                    answer = worker_request(f"{base_url}/lease", {"worker": args.name, "batch": args.batch}, args.token)
+                except OSError as e:
+                    # The coordinator shuts down once every socket has a result
+                    print2(f"Coordinator unreachable, stopping: {str(e)}", level=1 if completed else -1)
+                    break
+
+                if answer.get("done"):
+                    break
+                if "wait" in answer:
+                    time.sleep(answer["wait"])
+                    continue
+
+                lease_id = answer["lease"]
+                futures = [executor.submit(worker_visit, base_url, args.token, lease_id, socket_entry) for socket_entry in answer["sockets"]]
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        completed += 1
+                        if verbosity_level < 2:
+                            print2(f"Progress: {completed} sockets visited", level=0)
+                    except Exception as e:
+                        # The socket stays leased and goes back to the queue when the lease expires
+                        print2(f"Could not report a result to the coordinator: {str(e)}", level=-1)
+    except RuntimeError as e:
+        print2(str(e), level=-1)
+        sys.exit(1)
+    finally:
+        shutil.rmtree(output_path, ignore_errors=True)
+
+    print2(f"\nWorker done, {completed} sockets visited", level=0, color="green")
+
+def profile_stage(stage_name, function, *args):
+    """
+    Run a single-threaded pipeline stage, under cProfile if profiling is enabled.
+    Records the wall time of the stage and returns the result of the function.
+    """
+    if not profile_enabled:
+        return function(*args)
+
+    import cProfile
+    profiler = cProfile.Profile()
+    stage_start = time.perf_counter()
+    try:
+        return profiler.runcall(function, *args)
+    finally:
+        profile_stage_times[stage_name] = profile_stage_times.get(stage_name, 0.0) + time.perf_counter() - stage_start
+        profile_stage_profiles.append(profiler)
+
+def profile_visit_website(ip_entry, port_key, port_data, timeout=None):
+    """
+    Wrapper around visit_website() that records the wall time spent per worker thread.
+    """
+    visit_start = time.perf_counter()
+    try:
+        return visit_website(ip_entry, port_key, port_data, timeout)
+    finally:
+        elapsed = time.perf_counter() - visit_start
+        with profile_stats_lock:
+            thread_times = profile_thread_get(threading.current_thread().name)
+            thread_times["visits"] += 1
+            thread_times["wall"] += elapsed
+
+def profile_thread_get(thread_name):
+    """
+    Return the timing entry of a thread, creating it if needed.
+    Must be called with profile_stats_lock held.
+    """
+    if thread_name not in profile_thread_times:
+        profile_thread_times[thread_name] = {"visits": 0, "wall": 0.0, "lock_wait": 0.0, "lock_held": 0.0}
+    return profile_thread_times[thread_name]
+
+def profile_record_lock(wait_seconds, held_seconds):
+    """
+    Record the time the current thread waited for and held json_write_lock.
+    """
+    with profile_stats_lock:
+        thread_times = profile_thread_get(threading.current_thread().name)
+        thread_times["lock_wait"] += wait_seconds
+        thread_times["lock_held"] += held_seconds
+
+def profile_sampler(stop_event):
+    """
+    Sampling profiler for the worker threads.
+    cProfile cannot follow several threads at once, so the Python stacks of all other
+    threads are sampled every profile_sample_interval seconds and aggregated per thread.
+    """
+    own_ident = threading.get_ident()
+    last_sample = time.perf_counter()
+
+    while not stop_event.wait(profile_sample_interval):
+        now = time.perf_counter()
+        weight = now - last_sample
+        last_sample = now
+
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_ident, frame in sys._current_frames().items():
+            if thread_ident == own_ident:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+
+            thread_samples = profile_samples.setdefault(thread_names.get(thread_ident, str(thread_ident)), {})
+            stack = tuple(stack)
+            thread_samples[stack] = thread_samples.get(stack, 0.0) + weight
+
+def profile_recon():
+    """
+    Run main_recon_process() with the sampling profiler attached if profiling is enabled.
+    """
+    if not profile_enabled:
+        main_recon_process()
+        return
+
+    stop_event = threading.Event()
+    sampler = threading.Thread(target=profile_sampler, args=(stop_event,), name="pagehawk-profiler", daemon=True)
+    sampler.start()
+
+    recon_start = time.perf_counter()
+    try:
+        main_recon_process()
+    finally:
+        profile_stage_times["main_recon_process"] = time.perf_counter() - recon_start
+        stop_event.set()
+        sampler.join()
+
+def profile_save():
+    """
+    Write the collected profiling data to the output folder:
+    - pstats file for the single-threaded stages (snakeviz, gprof2dot, pstats module)
+    - speedscope file with the sampled stacks of every worker thread
+    - JSON summary with stage wall times, per-thread wall time and json_write_lock contention
+    """
+    if not profile_enabled:
+        return True
+
+    try:
+        # pstats of the input/output stages
+        if profile_stage_profiles:
+            import pstats
+
+            stats = pstats.Stats(profile_stage_profiles[0])
+            for profiler in profile_stage_profiles[1:]:
+                stats.add(profiler)
+            pstats_path = os.path.join(output_path, profile_pstats_filename)
+            stats.dump_stats(pstats_path)
+            print2(f"Profile (stages) saved to: {pstats_path}", level=0)
+
+        # Speedscope file, one sampled profile per thread
+        frames = []
+        frame_index = {}
+        profiles = []
+        for thread_name, thread_samples in sorted(profile_samples.items()):
+            samples = []
+            weights = []
+            for stack, weight in thread_samples.items():
+                indexes = []
+                for frame_key in stack:
+                    if frame_key not in frame_index:
+                        frame_index[frame_key] = len(frames)
+                        frames.append({"name": frame_key[0], "file": frame_key[1], "line": frame_key[2]})
+                    indexes.append(frame_index[frame_key])
+                samples.append(indexes)
+                weights.append(weight)
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            })
+
+        if profiles:
+            speedscope_path = os.path.join(output_path, profile_speedscope_filename)
+            with open(speedscope_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "$schema": "https://www.speedscope.app/file-format-schema.json",
+                    "shared": {"frames": frames},
+                    "profiles": profiles,
+                    "name": "PageHawk scan",
+                    "exporter": "pagehawk"
+                }, f)
+            print2(f"Profile (threads) saved to: {speedscope_path}", level=0)
+
+        # Summary
+        lock_wait = sum(t["lock_wait"] for t in profile_thread_times.values())
+        lock_held = sum(t["lock_held"] for t in profile_thread_times.values())
+        summary = {
+            "stages": profile_stage_times,
+            "threads": profile_thread_times,
+            "json_write_lock": {"wait": lock_wait, "held": lock_held}
+        }
+        summary_path = os.path.join(output_path, profile_summary_filename)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=4)
+
+        print2(f"Profile summary saved to: {summary_path}", level=0)
+        print2(f"json_write_lock: {lock_wait:.2f}s waiting, {lock_held:.2f}s held", level=0)
+        return True
+
+    except Exception as e:
+        print2(f"Error saving profile: {str(e)}", level=-1)
+        return False
+
+def report_arguments_parse(argv):
+    """
+    Parse command-line arguments of the report subcommand.
+    Returns the parsed arguments.
+    """
+    global verbosity_level
+
+    parser = argparse.ArgumentParser(
+        prog="pagehawk.py report",
+        description="PageHawk - Rebuild the HTML report from existing scan results without rescanning"
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Results JSON file(s) or .jsonl journal(s). Several inputs are merged into one report"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Output HTML file or folder (default: next to the first input, with a .html extension)"
+    )
+    parser.add_argument(
+        "--shards",
+        type=report_shards_parse,
+        metavar="MODE",
+        help="Write a sharded report: an index page, and shards loaded on demand by subnet, port, or N sockets each (subnet, port or N)"
+    )
+    parser.add_argument(
+        "-v",
+        action="count",
+        default=0,
+        help="Increase verbosity (-v=warning, -vv=info, -vvv=debug)"
+    )
+
+    args = parser.parse_args(argv)
+    verbosity_level = args.v
+
+    return args
+
+def report_json_stream(filepath, key="ips", chunk_size=1024 * 1024):
+    """
+    Stream the items of the top-level array `key` of a results JSON file.
+    Reads the file in chunks and decodes one item at a time, so large result
+    files never have to be fully loaded.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size)
+
+        # Find the start of the array
+        while True:
+            key_pos = buffer.find(f'"{key}"')
+            bracket_pos = buffer.find('[', key_pos) if key_pos != -1 else -1
+            if bracket_pos != -1:
+                pos = bracket_pos + 1
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError(f'No "{key}" array found in {filepath}')
+            buffer += chunk
+
+        while True:
+            # Skip separators between items, refilling the buffer when it runs out
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer):
+                    break
+                buffer = f.read(chunk_size)
+                pos = 0
+                if not buffer:
+                    raise ValueError(f"Unexpected end of file in {filepath}")
+
+            if buffer[pos] == ']':
+                return
+
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Item continues in the next chunk
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            yield item
+
+def report_jsonl_stream(filepath):
+    """
+    Stream IP/URL entries from a JSON-lines journal.
+    Each line is either an IP/URL entry ({"ip", "url", "ports"}) or a single
+    visit record ({"ip", "url", "port", "data"}).
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "ports" in record:
+                yield record
+            elif "port" in record:
+                yield {
+                    "ip": record.get("ip", ""),
+                    "url": record.get("url", ""),
+                    "ports": [{str(record["port"]): record.get("data", {})}]
+                }
+
+def report_read_entries(filepath, html_dir):
+    """
+    Stream the IP/URL entries of a results file (JSON or .jsonl journal).
+    Screenshot paths are rewritten to be relative to the folder of the new report.
+    """
+    if filepath.lower().endswith('.jsonl'):
+        entries = report_jsonl_stream(filepath)
+    else:
+        entries = report_json_stream(filepath)
+
+    input_dir = os.path.dirname(os.path.abspath(filepath))
+    relocate = os.path.normcase(input_dir) != os.path.normcase(os.path.abspath(html_dir))
+
+    for ip_entry in entries:
+        if relocate:
+            for port_entry in ip_entry.get("ports", []):
+                for port_data in port_entry.values():
+                    if port_data.get("screenshot_filename"):
+                        port_data["screenshot_pathname"] = os.path.relpath(
+                            os.path.join(input_dir, port_data.get("screenshot_pathname") or "."),
+                            html_dir
+                        ).replace(os.sep, '/')
+        yield ip_entry
+
+def report_merge_entries(entry_streams):
+    """
+    Merge IP/URL entries from several streams into one set of entries.
+    For each target:port the most recent visit wins, while the earliest
+    visited_first is kept.
+    """
+    merged = {}  # Target key -> {"ip", "url", "ports": {port: data}}
+
+    for entries in entry_streams:
+        for ip_entry in entries:
+            target_key = ip_entry.get("url") or ip_entry.get("ip")
+            if target_key not in merged:
+                merged[target_key] = {"ip": ip_entry.get("ip", ""), "url": ip_entry.get("url", ""), "ports": {}}
+            merged_ports = merged[target_key]["ports"]
+
+            for port_entry in ip_entry.get("ports", []):
+                for port, port_data in port_entry.items():
+                    existing = merged_ports.get(port)
+                    if existing is None:
+                        merged_ports[port] = port_data
+                        continue
+
+                    visited_first = min(
+                        (v for v in (existing.get("visited_first"), port_data.get("visited_first")) if v),
+                        default=""
+                    )
+                    if port_data.get("visited_last", "") >= existing.get("visited_last", ""):
+                        merged_ports[port] = port_data
+                    merged_ports[port]["visited_first"] = visited_first
+
+    for target in merged.values():
+        yield {
+            "ip": target["ip"],
+            "url": target["url"],
+            "ports": [{port: port_data} for port, port_data in target["ports"].items()]
+        }
+
+def report_main(argv):
+    """
+    Entry point of the report subcommand: rebuild the HTML report from
+    existing results without rescanning.
+    """
+    args = report_arguments_parse(argv)
+    report_start = time.perf_counter()
+
+    for filepath in args.inputs:
+        if not os.path.isfile(filepath):
+            print2(f"File not found: {filepath}", level=-1)
+            sys.exit(1)
+
+    # Determine the report file
+    first_input = args.inputs[0]
+    default_filename = os.path.splitext(os.path.basename(first_input))[0] + ".html"
+    if not args.output:
+        html_file_path = os.path.join(os.path.dirname(first_input) or ".", default_filename)
+    elif args.output.endswith('.html'):
+        html_file_path = args.output
+    elif os.path.isdir(args.output):
+        html_file_path = os.path.join(args.output, default_filename)
+    else:
+        print2(f"Output path does not exist: {args.output}", level=-1)
+        sys.exit(1)
+    html_dir = os.path.dirname(os.path.abspath(html_file_path))
+
+    # A single results JSON is streamed straight through, journals and several inputs are merged
+    streams = [report_read_entries(filepath, html_dir) for filepath in args.inputs]
+    if len(streams) == 1 and not first_input.lower().endswith('.jsonl'):
+        entries = streams[0]
+    else:
+        print2(f"Merging {len(streams)} input(s)", level=2)
+        entries = report_merge_entries(streams)
+
+    try:
+        if args.shards:
+            count = generate_html_sharded(html_file_path, entries, args.shards)
+        else:
+            with open(html_file_path, 'w', encoding='utf-8') as f:
+                count = generate_html_stream(f, entries)
+    except (OSError, ValueError) as e:
+        print2(f"Error generating report: {str(e)}", level=-1)
+        sys.exit(1)
+    
+    if count is None:
+        sys.exit(1)
+    
+    elapsed = time.perf_counter() - report_start
+    counted = "sockets" if args.shards else "IPs/URLs"
+    print2(f"HTML report with {count} {counted} saved to: {html_file_path} ({elapsed:.1f}s)", level=0, color="green")
+
+def diff_arguments_parse(argv):
+    """
+    Parse command-line arguments of the diff subcommand.
+    Returns the parsed arguments.
+    """
+    global verbosity_level
+
+    parser = argparse.ArgumentParser(
+        prog="pagehawk.py diff",
+        description="PageHawk - Compare two scans and report which services changed visually"
+    )
+    parser.add_argument(
+        "old",
+        help="Results JSON file or .jsonl journal of the previous scan"
+    )
+    parser.add_argument(
+        "new",
+        help="Results JSON file or .jsonl journal of the current scan"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Output HTML file or folder (default: next to the new results, with a _diff.html suffix)"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="Minimum change score (0-1) for a screenshot to count as visually changed (default: 0.05)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes comparing screenshots (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "-v",
+        action="count",
+        default=0,
+        help="Increase verbosity (-v=warning, -vv=info, -vvv=debug)"
+    )
+
+    args = parser.parse_args(argv)
+    verbosity_level = args.v
+
+    if not 0 <= args.threshold <= 1:
+        parser.error("--threshold must be between 0 and 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    return args
+
+def diff_image_grid(filepath):
+    """
+    Decode a screenshot into a grid of average brightness values
+    (diff_hash_size + 1 columns, diff_hash_size rows) with Pillow when it is
+    installed (C decoder and box resampling), else with diff_png_grid().
+    Returns (width, height, grid).
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return diff_png_grid(filepath)
+    
+    grid_width = diff_hash_size + 1
+    grid_height = diff_hash_size
+    with Image.open(filepath) as image:
+        width, height = image.size
+        # Only the top of long full-page screenshots, like diff_png_grid()
+        image = image.crop((0, 0, width, min(height, diff_max_rows))).convert("RGB")
+        red, green, blue = image.resize((grid_width, grid_height), Image.BOX).split()
+    pixels = [r + 2 * g + b for r, g, b in zip(red.getdata(), green.getdata(), blue.getdata())]
+    grid = [pixels[y * grid_width:(y + 1) * grid_width] for y in range(grid_height)]
+    return width, height, grid
+
+def diff_png_grid(filepath):
+    """
+    Decode a PNG screenshot into a grid of average brightness values
+    (diff_hash_size + 1 columns, diff_hash_size rows) without any image library.
+    Rows are decompressed and unfiltered one at a time and only a few pixels per
+    grid cell are sampled, so memory stays flat on long full-page screenshots.
+    Slow on large screenshots (pure Python unfiltering): the fallback of
+    diff_image_grid() when Pillow is not installed.
+    Returns (width, height, grid).
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f"Not a PNG file: {filepath}")
+
+    # Read the chunks
+    pos = 8
+    header = None
+    palette = b""
+    idat = []
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += length + 12
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif chunk_type == b'PLTE':
+            palette = chunk
+        elif chunk_type == b'IDAT':
+            idat.append(chunk)
+        elif chunk_type == b'IEND':
+            break
+
+    if header is None:
+        raise ValueError(f"PNG without header: {filepath}")
+    width, height, bit_depth, color_type, _, _, interlace = header
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type)
+    if bit_depth != 8 or interlace or channels is None or width == 0 or height == 0:
+        raise ValueError(f"Unsupported PNG format (bit depth {bit_depth}, color type {color_type}, interlace {interlace}): {filepath}")
+
+    grid_width = diff_hash_size + 1
+    grid_height = diff_hash_size
+    rows = min(height, diff_max_rows)
+    stride = width * channels
+
+    # Sampled byte offsets in a row and the grid column each one falls into
+    samples_per_row = min(width, grid_width * diff_samples_per_cell)
+    sample_columns = []
+    for i in range(samples_per_row):
+        x = (2 * i + 1) * width // (2 * samples_per_row)
+        sample_columns.append((x * channels, x * grid_width // width))
+
+    sums = [[0] * grid_width for _ in range(grid_height)]
+    counts = [[0] * grid_width for _ in range(grid_height)]
+
+    decompressor = zlib.decompressobj()
+    compressed = b"".join(idat)
+    buffer = bytearray()
+    previous = bytearray(stride)
+    offset = 0
+    for y in range(rows):
+        # Decompress just enough data for the next rows
+        while len(buffer) - offset < stride + 1:
+            chunk = decompressor.decompress(compressed, 16 * (stride + 1))
+            compressed = decompressor.unconsumed_tail
+            if not chunk:
+                raise ValueError(f"Truncated PNG data: {filepath}")
+            del buffer[:offset]
+            offset = 0
+            buffer += chunk
+        filter_type = buffer[offset]
+        row = buffer[offset + 1:offset + 1 + stride]
+        offset += stride + 1
+
+        # Undo the row filter
+        if filter_type == 1:  # Sub
+            for i in range(channels, stride):
+                row[i] = (row[i] + row[i - channels]) & 0xFF
+        elif filter_type == 2:  # Up
+            row = bytearray(map(lambda a, b: (a + b) & 0xFF, row, previous))
+        elif filter_type == 3:  # Average
+            for i in range(stride):
+                left = row[i - channels] if i >= channels else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif filter_type == 4:  # Paeth
+            for i in range(stride):
+                a = row[i - channels] if i >= channels else 0
+                b = previous[i]
+                c = previous[i - channels] if i >= channels else 0
+                p = a + b - c
+                pa = abs(p - a)
+                pb = abs(p - b)
+                pc = abs(p - c)
+                if pa <= pb and pa <= pc:
+                    row[i] = (row[i] + a) & 0xFF
+                elif pb <= pc:
+                    row[i] = (row[i] + b) & 0xFF
+                else:
+                    row[i] = (row[i] + c) & 0xFF
+        previous = row
+
+        # Accumulate the brightness of the sampled pixels
+        sum_row = sums[y * grid_height // rows]
+        count_row = counts[y * grid_height // rows]
+        for byte_offset, cell in sample_columns:
+            if channels >= 3:
+                value = row[byte_offset] + 2 * row[byte_offset + 1] + row[byte_offset + 2]
+            elif palette:
+                index = row[byte_offset] * 3
+                value = palette[index] + 2 * palette[index + 1] + palette[index + 2]
+            else:
+                value = 4 * row[byte_offset]
+            sum_row[cell] += value
+            count_row[cell] += 1
+
+    grid = [
+        [total / count if count else 0 for total, count in zip(sum_row, count_row)]
+        for sum_row, count_row in zip(sums, counts)
+    ]
+    return width, height, grid
+
+def diff_image_hash(filepath):
+    """
+    Compute the perceptual difference hash of a screenshot: one bit per grid
+    cell, set when the cell is brighter than its right neighbour.
+    Returns (width, height, hash as int).
+    """
+    width, height, grid = diff_image_grid(filepath)
+    value = 0
+    for grid_row in grid:
+        for left, right in zip(grid_row, grid_row[1:]):
+            value = (value << 1) | (left > right)
+    return width, height, value
+
+def diff_compare_screenshots(paths):
+    """
+    Score the visual change between two screenshots from 0 (identical) to 1.
+    The score is the share of differing perceptual hash bits, raised when the
+    page size changed. Runs in the worker processes of the diff subcommand.
+    Returns (score, error message).
+    """
+    old_path, new_path = paths
+    try:
+        old_width, old_height, old_hash = diff_image_hash(old_path)
+        new_width, new_height, new_hash = diff_image_hash(new_path)
+    except Exception as e:
+        return 1.0, str(e)
+
+    score = bin(old_hash ^ new_hash).count("1") / (diff_hash_size * diff_hash_size)
+    if (old_width, old_height) != (new_width, new_height):
+        size_change = 1 - (min(old_width, new_width) * min(old_height, new_height)) / (max(old_width, new_width) * max(old_height, new_height))
+        score = max(score, size_change)
+    return round(score, 4), ""
+
+def diff_screenshot_info(port_data, html_dir):
+    """
+    Return (path on disk, path for the report, sha256) of the screenshot of a
+    port entry, or None if it has no screenshot on disk.
+    The hash recorded at capture time is used when present, older results are
+    hashed from the file bytes.
+    """
+    screenshot_filename = port_data.get("screenshot_filename")
+    if not screenshot_filename:
+        return None
+
+    report_path = f"{port_data.get('screenshot_pathname') or '.'}/{screenshot_filename}"
+    file_path = os.path.join(html_dir, report_path)
+    if not os.path.isfile(file_path):
+        print2(f"Screenshot not found: {file_path}", level=1)
+        return None
+
+    screenshot_hash = port_data.get("screenshot_hash")
+    if not screenshot_hash:
+        with open(file_path, 'rb') as f:
+            screenshot_hash = hashlib.sha256(f.read()).hexdigest()
+    return file_path, report_path, screenshot_hash
+
+def diff_build_changes(old_entries, new_entries, html_dir, threshold, workers):
+    """
+    Pair the sockets of two scans by target and port and score what changed.
+    Identical screenshots (same hash) are never decoded, the others are compared
+    in a pool of worker processes.
+    Returns (changes sorted by score, summary counts).
+    """
+    old_ports = {}
+    for ip_entry in old_entries:
+        target_key = ip_entry.get("url") or ip_entry.get("ip")
+        for port_entry in ip_entry.get("ports", []):
+            for port, port_data in port_entry.items():
+                old_ports[(target_key, port)] = (ip_entry, port, port_data)
+
+    changes = []
+    pending = []  # (change, (old path, new path)) to compare visually
+    summary = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0, "compared": 0}
+
+    for ip_entry in new_entries:
+        target_key = ip_entry.get("url") or ip_entry.get("ip")
+        for port_entry in ip_entry.get("ports", []):
+            for port, port_data in port_entry.items():
+                old = old_ports.pop((target_key, port), None)
+                new_screenshot = diff_screenshot_info(port_data, html_dir)
+                change = {
+                    "ip": ip_entry.get("ip", ""),
+                    "url": ip_entry.get("url", ""),
+                    "port": port,
+                    "change": "added",
+                    "score": 1.0,
+                    "response_old": "",
+                    "response_new": port_data.get("response", ""),
+                    "screenshot_old": "",
+                    "screenshot_new": new_screenshot[1] if new_screenshot else "",
+                    "error": ""
+                }
+
+                if old is None:
+                    changes.append(change)
+                    continue
+
+                old_data = old[2]
+                old_screenshot = diff_screenshot_info(old_data, html_dir)
+                change["response_old"] = old_data.get("response", "")
+                change["screenshot_old"] = old_screenshot[1] if old_screenshot else ""
+                change["change"] = "visual"
+
+                if old_screenshot and new_screenshot:
+                    if old_screenshot[2] == new_screenshot[2]:
+                        change["score"] = 0.0
+                    else:
+                        pending.append((change, (old_screenshot[0], new_screenshot[0])))
+                        continue
+                elif not old_screenshot and not new_screenshot:
+                    change["score"] = 0.0
+                changes.append(change)
+
+    for old_ip_entry, old_port, old_data in old_ports.values():
+        old_screenshot = diff_screenshot_info(old_data, html_dir)
+        changes.append({
+            "ip": old_ip_entry.get("ip", ""),
+            "url": old_ip_entry.get("url", ""),
+            "port": old_port,
+            "change": "removed",
+            "score": 1.0,
+            "response_old": old_data.get("response", ""),
+            "response_new": "",
+            "screenshot_old": old_screenshot[1] if old_screenshot else "",
+            "screenshot_new": "",
+            "error": ""
+        })
+
+    # Decode and compare the screenshots that differ
+    summary["compared"] = len(pending)
+    if pending:
+        print2(f"Comparing {len(pending)} screenshot pair(s) with {min(workers, len(pending))} process(es)", level=2)
+        pairs = [paths for _, paths in pending]
+        if workers == 1 or len(pairs) == 1:
+            results = list(map(diff_compare_screenshots, pairs))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pairs))) as executor:
+                results = list(executor.map(diff_compare_screenshots, pairs, chunksize=max(1, len(pairs) // (workers * 4))))
+        for (change, _), (score, error) in zip(pending, results):
+            change["score"] = score
+            change["error"] = error
+            if error:
+                print2(f"Could not compare screenshots of {change['url'] or change['ip']}:{change['port']}: {error}", level=1)
+            changes.append(change)
+
+    # Keep real changes only: visual changes above the threshold or a different response
+    reported = []
+    for change in changes:
+        if change["change"] in ("added", "removed"):
+            summary[change["change"]] += 1
+        elif change["score"] >= threshold:
+            summary["changed"] += 1
+        elif change["response_old"] != change["response_new"]:
+            change["change"] = "response"
+            summary["changed"] += 1
+        else:
+            summary["unchanged"] += 1
+            continue
+        reported.append(change)
+
+    reported.sort(key=lambda change: (-change["score"], change["url"] or change["ip"], change["port"]))
+    return reported, summary
+
+def diff_main(argv):
+    """
+    Entry point of the diff subcommand: compare two scans and build a report of
+    the new scan with a "Changes" view sorted by change score.
+    """
+    args = diff_arguments_parse(argv)
+    diff_start = time.perf_counter()
+
+    for filepath in (args.old, args.new):
+        if not os.path.isfile(filepath):
+            print2(f"File not found: {filepath}", level=-1)
+            sys.exit(1)
+
+    # Determine the report file
+    default_filename = os.path.splitext(os.path.basename(args.new))[0] + "_diff.html"
+    if not args.output:
+        html_file_path = os.path.join(os.path.dirname(args.new) or ".", default_filename)
+    elif args.output.endswith('.html'):
+        html_file_path = args.output
+    elif os.path.isdir(args.output):
+        html_file_path = os.path.join(args.output, default_filename)
+    else:
+        print2(f"Output path does not exist: {args.output}", level=-1)
+        sys.exit(1)
+    html_dir = os.path.dirname(os.path.abspath(html_file_path))
+
+    try:
+        old_entries = list(report_merge_entries([report_read_entries(args.old, html_dir)]))
+        new_entries = list(report_merge_entries([report_read_entries(args.new, html_dir)]))
+        changes, summary = diff_build_changes(old_entries, new_entries, html_dir, args.threshold, args.workers)
+    except (OSError, ValueError) as e:
+        print2(f"Error comparing scans: {str(e)}", level=-1)
+        sys.exit(1)
+
+    diff_data = {
+        "old": os.path.basename(args.old),
+        "new": os.path.basename(args.new),
+        "threshold": args.threshold,
+        "summary": summary
+    }
+
+    try:
+        with open(html_file_path, 'w', encoding='utf-8') as f:
+            count = generate_html_stream(f, new_entries, {"changes": changes, "diff": diff_data})
+    except OSError as e:
+        print2(f"Error generating report: {str(e)}", level=-1)
+        sys.exit(1)
+
+    if count is None:
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - diff_start
+    print2(
+        f"{summary['changed']} changed, {summary['added']} added, {summary['removed']} removed, "
+        f"{summary['unchanged']} unchanged ({summary['compared']} screenshot pairs decoded)",
+        level=0
+    )
+    print2(f"Diff report saved to: {html_file_path} ({elapsed:.1f}s)", level=0, color="green")
+
+def serve_arguments_parse(argv):
+    """
+    Parse command-line arguments of the serve subcommand.
+    Returns the parsed arguments.
+    """
+    global verbosity_level
+
+    parser = argparse.ArgumentParser(
+        prog="pagehawk.py serve",
+        description="PageHawk - Keep warm browsers running and accept scan jobs over a local HTTP API"
+    )
+    parser.add_argument(
+        "--listen",
+        default="127.0.0.1:8766",
+        metavar="HOST:PORT",
+        help="Address of the job API (default: 127.0.0.1:8766)"
+    )
+    parser.add_argument(
+        "--unix",
+        metavar="PATH",
+        help="Serve the job API on a Unix socket instead of TCP"
+    )
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        default=10,
+        help="Number of warm browsers, the maximum number of concurrent visits (default: 10)"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=16,
+        help="Maximum number of queued jobs, more are rejected (default: 16)"
+    )
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("PAGEHAWK_TOKEN", ""),
+        help="Shared secret clients must send in the X-PageHawk-Token header (default: PAGEHAWK_TOKEN environment variable)"
+    )
+    parser.add_argument(
+        "-v",
+        action="count",
+        default=0,
+        help="Increase verbosity (-v=warning, -vv=info, -vvv=debug)"
+    )
+
+    args = parser.parse_args(argv)
+    verbosity_level = args.v
+
+    if args.browsers < 1:
+        parser.error("--browsers must be at least 1")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    if not args.unix and (':' not in args.listen or not args.listen.rsplit(':', 1)[1].isdigit()):
+        parser.error("--listen must be HOST:PORT")
+
+    return args
+
+def serve_job_options(request):
+    """
+    Validate the options of a new job.
+    Returns the options as a namespace like the command-line arguments.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("The job must be a JSON object")
+    for key in ("input", "output"):
+        if not isinstance(request.get(key), str) or not request[key]:
+            raise ValueError(f'"{key}" is required')
+    threads_value = request.get("threads", serve_browsers)
+    if not isinstance(threads_value, int) or threads_value < 1:
+        raise ValueError('"threads" must be a positive integer')
+
+    return argparse.Namespace(
+        input=request["input"],
+        output=request["output"],
+        ports=str(request["ports"]) if request.get("ports") else None,
+        threads=min(threads_value, serve_browsers),
+        subdir_screenshots=bool(request.get("subdir_screenshots")),
+        subdir_timestamped=bool(request.get("subdir_timestamped")),
+        baseline=request.get("baseline") or None
+    )
+
+def serve_job_event(job, event):
+    """
+    Add an event to the stream of a job and wake up the clients following it.
+    """
+    with serve_condition:
+        job["events"].append(event)
+        serve_condition.notify_all()
+
+def serve_job_run(job, executor):
+    """
+    Run one job with the warm browsers: the usual parsing, visits and output
+    steps, with at most job["options"].threads visits in flight.
+    Jobs run one at a time, as the scan state lives in module globals.
+    """
+    global output_filename, output_json_final_filename, visits
+    options = job["options"]
+
+    # Reset the state left by the previous job
+    for values in (ips_to_view, urls_to_view, ports_to_view, sockets_to_view):
+        values.clear()
+    visits = {}
+    output_filename = "pagehawk_results.html"
+    output_json_final_filename = output_json_filename
+    scan_stats.update({"scan_seconds": 0.0, "json_writes": 0, "json_write_seconds": 0.0, "report_write_seconds": 0.0, "screenshots_written": 0, "screenshots_deduplicated": 0})
+
+    if not input_ip_parse(options.input):
+        raise ValueError("Input validation failed")
+    if not input_port_parse(options):
+        raise ValueError("Port validation failed")
+    if not dns_resolve():
+        raise ValueError("Hostname resolution failed")
+    if not build_sockets() or not build_visits():
+        raise ValueError("Visits building failed")
+    if not output_check(options.output, options):
+        raise ValueError("Output folder validation failed")
+    if options.baseline and not baseline_apply(options.baseline):
+        raise ValueError("Baseline loading failed")
+
+    tasks = recon_tasks()
+    job["total"] = len(tasks)
+    print2(f"Job {job['id']}: visiting {len(tasks)} sockets with {options.threads} browsers", level=0)
+
+    # Per-job concurrency limit on top of the shared browser pool
+    in_flight = threading.Semaphore(options.threads)
+    futures = []
+    scan_start = time.time()
+
+    def visit_done(future, ip_entry, port_key, port_data):
+        in_flight.release()
+        job["completed"] += 1
+        serve_job_event(job, {
+            "event": "visit",
+            "ip": ip_entry["ip"],
+            "url": ip_entry["url"],
+            "port": port_key,
+            "data": dict(port_data),
+            "error": str(future.exception()) if future.exception() else ""
+        })
+
+    for ip_entry, port_key, port_data in tasks:
+        in_flight.acquire()
+        future = executor.submit(visit_website, ip_entry, port_key, port_data)
+        future.add_done_callback(lambda future, task=(ip_entry, port_key, port_data): visit_done(future, *task))
+        futures.append(future)
+    for future in futures:
+        future.exception()  # Wait for the visit, errors are reported in the events
+
+    scan_stats["scan_seconds"] = round(time.time() - scan_start, 3)
+    if not output_save():
+        raise ValueError("Saving the output failed")
+    job["output"] = os.path.abspath(os.path.join(output_path, output_filename))
+
+def serve_job_runner(executor):
+    """
+    Take the queued jobs one by one and run them.
+    """
+    while True:
+        job = serve_queue.get()
+        job["state"] = "running"
+        job["started"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        serve_job_event(job, {"event": "started"})
+        try:
+            serve_job_run(job, executor)
+            job["state"] = "done"
+            print2(f"Job {job['id']} done: {job['output']}", level=0, color="green")
+        except Exception as e:
+            job["state"] = "failed"
+            job["error"] = str(e)
+            print2(f"Job {job['id']} failed: {str(e)}", level=-1)
+        job["finished"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        serve_job_event(job, {"event": job["state"], "output": job["output"], "error": job["error"]})
+
+def serve_job_summary(job):
+    """
+    Return the public fields of a job.
+    """
+    return {key: job[key] for key in ("id", "state", "created", "started", "finished", "total", "completed", "output", "error")}
+
+def serve_handler():
+    """
+    Build the HTTP request handler class of the job API:
+    POST /jobs queues a job, GET /jobs and GET /jobs/<id> return their status,
+    GET /jobs/<id>/events streams the job events as JSON lines until it ends.
+    """
+    class ServeHandler(BaseHTTPRequestHandler):
+        def address_string(self):
+            # Unix socket clients have no address
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            print2(f"API: {self.address_string()} {format % args}", level=3)
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def authorized(self):
+            if serve_token and not hmac.compare_digest(self.headers.get("X-PageHawk-Token", ""), serve_token):
+                self.send_json(403, {"error": "invalid token"})
+                return False
+            return True
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            if self.path != "/jobs":
+                self.send_json(404, {"error": "unknown endpoint"})
+                return
+
+            try:
+                options = serve_job_options(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0)))))
+            except (ValueError, TypeError) as e:
+                self.send_json(400, {"error": str(e)})
+                return
+
+            global serve_job_counter
+            with serve_condition:
+                serve_job_counter += 1
+                job = {
+                    "id": str(serve_job_counter),
+                    "state": "queued",
+                    "options": options,
+                    "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "started": "",
+                    "finished": "",
+                    "total": 0,
+                    "completed": 0,
+                    "output": "",
+                    "error": "",
+                    "events": []
+                }
+                try:
+                    serve_queue.put_nowait(job)
+                except queue.Full:
+                    self.send_json(429, {"error": "job queue is full"})
+                    return
+                serve_jobs[job["id"]] = job
+                # Forget the oldest finished jobs
+                finished = [job_id for job_id, old in serve_jobs.items() if old["state"] in ("done", "failed")]
+                for job_id in finished[:max(0, len(serve_jobs) - serve_history)]:
+                    del serve_jobs[job_id]
+
+            print2(f"Job {job['id']} queued: {options.input}", level=0)
+            self.send_json(202, serve_job_summary(job))
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+
+            parts = [part for part in self.path.split('/') if part]
+            if parts == ["jobs"]:
+                with serve_condition:
+                    self.send_json(200, [serve_job_summary(job) for job in serve_jobs.values()])
+                return
+
+            job = serve_jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+            if job is None or len(parts) > 3 or (len(parts) == 3 and parts[2] != "events"):
+                self.send_json(404, {"error": "unknown job or endpoint"})
+                return
+            if len(parts) == 2:
+                self.send_json(200, serve_job_summary(job))
+                return
+
+            # Stream the events, from the first one, until the job ends
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            sent = 0
+            try:
+                while True:
+                    with serve_condition:
+                        while sent == len(job["events"]) and job["state"] in ("queued", "running"):
+                            serve_condition.wait()
+                        events = job["events"][sent:]
+                        ended = job["state"] not in ("queued", "running")
+                    for event in events:
+                        self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                    sent += len(events)
+                    if ended and sent == len(job["events"]):
+                        break
+            except (BrokenPipeError, ConnectionResetError):
+                print2("API: event stream client disconnected", level=3)
+
+    return ServeHandler
+
+def serve_main(argv):
+    """
+    Entry point of the serve subcommand: launch the warm browsers, then accept
+    scan jobs over the local API and run them one after the other.
+    """
+    global serve_queue, serve_browsers, serve_token
+
+    args = serve_arguments_parse(argv)
+    serve_browsers = args.browsers
+    serve_token = args.token
+    serve_queue = queue.Queue(maxsize=args.queue_size)
+
+    # Long-lived threads, each keeping its own browser
+    executor = ThreadPoolExecutor(max_workers=args.browsers, thread_name_prefix="pagehawk-browser", initializer=browser_warm_start)
+    # Start every thread (and browser) now rather than on the first job
+    for _ in range(args.browsers):
+        executor.submit(time.sleep, 0.1)
+    threading.Thread(target=serve_job_runner, args=(executor,), name="pagehawk-jobs", daemon=True).start()
+
+    if args.unix:
+        if not hasattr(socket, "AF_UNIX"):
+            print2("Unix sockets are not supported on this platform", level=-1)
+            sys.exit(1)
+
+        class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = ThreadingUnixHTTPServer(args.unix, serve_handler())
+        os.chmod(args.unix, 0o600)
+        address = args.unix
+    else:
+        host, port = args.listen.rsplit(':', 1)
+        server = ThreadingHTTPServer((host, int(port)), serve_handler())
+        server.daemon_threads = True
+        address = f"http://{host}:{server.server_address[1]}"
+
+    print2(f"PageHawk serving jobs on {address} with {args.browsers} warm browsers (queue size {args.queue_size})", level=0, color="cyan")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print2("\nStopping", level=0)
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+def main():
+    # Subcommands
+    if len(sys.argv) > 1 and sys.argv[1] == "report":
+        report_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "diff":
+        diff_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        worker_main(sys.argv[2:])
+        return
+
+    args = arguments_parse()
+    
+    # Input parsing builds millions of small acyclic objects on large target lists,
+    # keep the cyclic garbage collector from repeatedly walking them
+    gc.disable()
+    
+    if not profile_stage("input_ip_parse", input_ip_parse, args.input):
+        print2("Input validation failed.", level=-1)
+        sys.exit(1)
+    
+    if not profile_stage("input_port_parse", input_port_parse, args):
+        print2("Port validation failed.", level=-1)
+        sys.exit(1)
+    
+    if args.priority and not priority_parse(args.priority):
+        print2("Priority targets validation failed.", level=-1)
+        sys.exit(1)
+    
+    if not profile_stage("dns_resolve", dns_resolve):
+        print2("Hostname resolution failed.", level=-1)
+        sys.exit(1)
+
+    if not profile_stage("build_sockets", build_sockets):
+        print2("Socket building failed.", level=-1)
+        sys.exit(1)
+    
+    if not profile_stage("build_visits", build_visits):
+        print2("Visits building failed.", level=-1)
+        sys.exit(1)
+    
+    gc.freeze()
+    gc.enable()
+    
+    if not output_check(args.output, args):
+        print2("Output folder validation failed.", level=-1)
+        sys.exit(1)
+    
+    if args.archive and not archive_open(args.archive):
+        print2("Archive creation failed.", level=-1)
+        sys.exit(1)
+    
+    if args.baseline and not baseline_apply(args.baseline):
+        print2("Baseline loading failed.", level=-1)
+        sys.exit(1)
+    
+    if not ready_to_start_recon():
+        print2("Pre-recon checks failed.", level=-1)
+        sys.exit(1)
+    
+    if args.live_report and not live_report_open():
+        print2("Live report creation failed.", level=-1)
+        sys.exit(1)
+    
+    if args.listen:
+        coordinator_recon(args.listen)
+    elif workers > 1:
+        shard_recon()
+    else:
+        profile_recon()
+    
+    profile_stage("output_save", output_save)
+    
+    profile_save()
+
+if __name__ == "__main__":
+    if getattr(sys, 'frozen', False):
+        # The diff subcommand starts worker processes from the bundled executable
+        multiprocessing.freeze_support()
     main()
@@ -0,0 +1,526 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# PageHawk benchmark harness
+#
+# Starts local stand-in web servers on loopback, runs pagehawk.py against synthetic
+# target lists and reports throughput, visit latency, peak RSS and output writing time.
+#
+# Every synthetic target is a "<name>.localhost" host name. Chromium resolves all
+# *.localhost names to loopback without DNS, so thousands of distinct sockets all end
+# up on the handful of local servers started here.
+
+SCENARIOS = ["fast", "slow", "redirect", "https", "closed", "longpoll"]
+
+PAGE_HTML = b"""<!DOCTYPE html>
+<html><head><title>PageHawk benchmark</title></head>
+<body><h1>PageHawk benchmark page</h1><p>Static content.</p></body></html>
+"""
+
+LONGPOLL_HTML = b"""<!DOCTYPE html>
+<html><head><title>PageHawk long polling</title></head>
+<body><h1>Long polling page</h1>
+<script>
+function poll() { fetch('/poll').then(poll).catch(poll); }
+poll(); poll();
+</script></body></html>
+"""
+
+SCAN_METRICS = ["pages_per_second", "visit_p50_seconds", "visit_p95_seconds", "peak_rss_mb", "output_write_seconds", "scan_seconds", "wall_seconds"]
+
+# Scenario settings, overridden by command line arguments
+slow_delay = 2.0
+redirect_hops = 5
+servers_stop = threading.Event()
+
+
+class BenchHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for all benchmark servers.
+    The scenario is taken from the server the request arrived on.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep the benchmark output clean
+        pass
+
+    def send_page(self, body, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        scenario = self.server.scenario
+
+        if scenario == "slow":
+            time.sleep(slow_delay)
+            self.send_page(PAGE_HTML)
+
+        elif scenario == "redirect":
+            # "/" starts the chain, "/r/<n>" redirects until n reaches 0
+            if self.path.startswith("/r/"):
+                hops = int(self.path[3:] or 0)
+            else:
+                hops = redirect_hops
+            if hops > 0:
+                self.send_response(302)
+                self.send_header("Location", f"/r/{hops - 1}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self.send_page(PAGE_HTML)
+
+        elif scenario == "longpoll":
+            if self.path.startswith("/poll"):
+                # Never answer while the benchmark runs, the page never becomes network idle
+                servers_stop.wait()
+                self.send_page(b"{}")
+            else:
+                self.send_page(LONGPOLL_HTML)
+
+        else:
+            self.send_page(PAGE_HTML)
+
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients (the scanner) drop connections all the time, e.g. on long polling pages
+        if not isinstance(sys.exc_info()[1], (ConnectionError, ssl.SSLError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+def create_certificate(directory):
+    """
+    Create a self-signed certificate for the HTTPS-only server using openssl.
+    Returns (certfile, keyfile) or None if openssl is not available.
+    """
+    openssl = shutil.which("openssl")
+    if not openssl:
+        return None
+
+    certfile = os.path.join(directory, "bench_cert.pem")
+    keyfile = os.path.join(directory, "bench_key.pem")
+    result = subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", keyfile, "-out", certfile],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    if result.returncode != 0:
+        return None
+    return certfile, keyfile
+
+
+def get_closed_port():
+    """
+    Return a loopback port that nothing listens on.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def servers_start(scenarios, workdir):
+    """
+    Start one loopback server per scenario.
+    Returns a dict scenario -> port and the list of running servers.
+    """
+    ports = {}
+    servers = []
+
+    for scenario in scenarios:
+        if scenario == "closed":
+            ports[scenario] = get_closed_port()
+            continue
+
+        server = BenchServer(("127.0.0.1", 0), BenchHandler)
+        server.scenario = scenario
+
+        if scenario == "https":
+            certificate = create_certificate(workdir)
+            if certificate is None:
+                print("[WARNING]: openssl not available, skipping the https scenario")
+                server.server_close()
+                continue
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*certificate)
+            # Handshake in the handler threads, plain HTTP probes must not block the accept loop
+            server.socket = context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        ports[scenario] = server.server_address[1]
+
+    return ports, servers
+
+
+def servers_stop_all(servers):
+    servers_stop.set()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def build_targets(path, sockets_count, ports_count):
+    """
+    Write a target list with enough *.localhost host names to reach sockets_count
+    sockets when crossed with the scenario ports.
+    """
+    hosts = math.ceil(sockets_count / ports_count)
+    with open(path, "w") as f:
+        for i in range(hosts):
+            f.write(f"bench{i}.localhost\n")
+    return hosts * ports_count
+
+
+def process_tree_rss(root_pid):
+    """
+    Return the summed RSS in bytes of a process and all its descendants (Linux only).
+    Returns None where /proc is not available.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+
+    children = {}
+    rss = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            # The command name may contain spaces, fields start after the closing parenthesis
+            fields = stat[stat.rindex(")") + 2:].split()
+            pid = int(entry)
+            children.setdefault(int(fields[1]), []).append(pid)
+            rss[pid] = int(fields[21]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def run_scan(pagehawk_cmd, targets_file, ports, output_dir, threads, extra_args):
+    """
+    Run one PageHawk scan and collect its metrics.
+    """
+    cmd = pagehawk_cmd + [
+        "-i", targets_file,
+        "--ports", ",".join(str(p) for p in ports),
+        "-o", output_dir,
+        "--threads", str(threads)
+    ] + extra_args
+
+    log_path = os.path.join(output_dir, "pagehawk_bench.log")
+    peak_rss = 0
+
+    with open(log_path, "w") as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        while process.poll() is None:
+            rss = process_tree_rss(process.pid)
+            if rss:
+                peak_rss = max(peak_rss, rss)
+            time.sleep(0.25)
+        wall_seconds = time.perf_counter() - started
+
+    if not peak_rss:
+        # Fallback: largest single child process, in kilobytes on Linux and bytes on macOS
+        try:
+            import resource
+            maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            peak_rss = maxrss if sys.platform == "darwin" else maxrss * 1024
+        except ImportError:
+            pass
+
+    if process.returncode != 0:
+        print(f"[ERROR]: PageHawk exited with code {process.returncode}, see {log_path}")
+        return None
+
+    with open(os.path.join(output_dir, "pagehawk_results.json")) as f:
+        results = json.load(f)
+
+    durations = []
+    statuses = {}
+    for ip_entry in results.get("ips", []):
+        for port_entry in ip_entry["ports"]:
+            for port_data in port_entry.values():
+                if port_data.get("visit_duration") not in ("", None):
+                    durations.append(float(port_data["visit_duration"]))
+                statuses[port_data["response"]] = statuses.get(port_data["response"], 0) + 1
+
+    stats = results.get("stats", {})
+    scan_seconds = stats.get("scan_seconds") or wall_seconds
+
+    return {
+        "sockets": len(durations),
+        "wall_seconds": round(wall_seconds, 3),
+        "scan_seconds": scan_seconds,
+        "pages_per_second": round(len(durations) / scan_seconds, 3) if scan_seconds else 0.0,
+        "visit_p50_seconds": percentile(durations, 50),
+        "visit_p95_seconds": percentile(durations, 95),
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+        "output_write_seconds": round(stats.get("json_write_seconds", 0.0) + stats.get("report_write_seconds", 0.0), 3),
+        "statuses": statuses
+    }
+
+
+def timed_run(cmd, runs):
+    """
+    Run a command several times and return the median wall time in seconds.
+    """
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return round(sorted(times)[len(times) // 2], 3)
+
+
+def build_results(path, entries):
+    """
+    Write a synthetic results JSON with the given number of IP entries.
+    """
+    port_data = {
+        "response": "200",
+        "visited_first": "2026-01-01 00:00:00",
+        "visited_last": "2026-01-01 00:00:00",
+        "visit_duration": 1.0,
+        "user_agent": "",
+        "screenshot_path_full": "",
+        "screenshot_path_relative": "",
+        "screenshot_pathname": "screenshots",
+        "screenshot_filename": ""
+    }
+    with open(path, "w") as f:
+        f.write('{"ips": [\n')
+        for i in range(entries):
+            ip = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+            port_data["screenshot_filename"] = f"{ip.replace('.', '_')}_80.png"
+            f.write((",\n" if i else "") + json.dumps({"ip": ip, "url": "", "ports": [{"80": port_data}]}, indent=4))
+        f.write("\n]}")
+
+
+def run_startup(pagehawk_cmd, workdir, input_lines, report_entries, runs):
+    """
+    Measure the cheap CLI paths that should never pay for the browser engine.
+    """
+    result = {}
+
+    print("Timing --help...")
+    result["help_seconds"] = timed_run(pagehawk_cmd + ["-h"], runs)
+
+    # Input parsing stops at the output folder validation, before any browser work
+    targets_file = os.path.join(workdir, "startup-targets.txt")
+    with open(targets_file, "w") as f:
+        for i in range(input_lines):
+            f.write(f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}\n")
+    print(f"Timing input parse of {input_lines} lines...")
+    result["input_parse_seconds"] = timed_run(
+        pagehawk_cmd + ["-i", targets_file, "--ports", "80", "-o", os.path.join(workdir, "missing")],
+        runs
+    )
+
+    results_file = os.path.join(workdir, "startup-results.json")
+    build_results(results_file, report_entries)
+    print(f"Timing report regeneration of {report_entries} entries...")
+    result["report_seconds"] = timed_run(pagehawk_cmd + ["report", results_file], runs)
+
+    return result
+
+
+def print_result(title, result, keys, baseline=None):
+    print(f"\n{title}")
+    print("-" * 50)
+    for key in keys:
+        line = f"  {key:<22} {result[key]:>12}"
+        if baseline and key in baseline and baseline[key]:
+            change = (result[key] - baseline[key]) / baseline[key] * 100
+            line += f"   ({change:+.1f}% vs baseline {baseline[key]})"
+        print(line)
+    if "statuses" in result:
+        print(f"  {'statuses':<22} {result['statuses']}")
+
+
+def arguments_parse():
+    parser = argparse.ArgumentParser(
+        description="PageHawk benchmark - runs PageHawk against local stand-in web servers"
+    )
+    parser.add_argument(
+        "--sizes",
+        default="1000",
+        help="Comma-separated socket counts to benchmark (default: 1000, e.g. 1000,10000,100000)"
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"Comma-separated server scenarios (default: {','.join(SCENARIOS)})"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=10,
+        help="PageHawk --threads value (default: 10)"
+    )
+    parser.add_argument(
+        "--slow-delay",
+        type=float,
+        default=2.0,
+        help="Response delay of the slow scenario in seconds (default: 2)"
+    )
+    parser.add_argument(
+        "--redirect-hops",
+        type=int,
+        default=5,
+        help="Length of the redirect chain scenario (default: 5)"
+    )
+    parser.add_argument(
+        "--pagehawk",
+        help="Command used to run PageHawk (default: this Python running pagehawk.py next to this script)"
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="Benchmark startup paths (--help, input parsing, report regeneration) instead of scans"
+    )
+    parser.add_argument(
+        "--startup-lines",
+        type=int,
+        default=1000000,
+        help="Number of lines of the input file parsed by --startup (default: 1000000)"
+    )
+    parser.add_argument(
+        "--startup-entries",
+        type=int,
+        default=100000,
+        help="Number of entries of the results file regenerated by --startup (default: 100000)"
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Number of runs per --startup measurement, the median is reported (default: 5)"
+    )
+    parser.add_argument(
+        "--save",
+        help="Save the results to a JSON file, to be used later as a baseline"
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Compare the results with a JSON file written by --save"
+    )
+    parser.add_argument(
+        "--keep-output",
+        action="store_true",
+        help="Keep the scan output folders"
+    )
+    parser.add_argument(
+        "pagehawk_args",
+        nargs=argparse.REMAINDER,
+        help="Extra arguments passed to PageHawk after '--'"
+    )
+    return parser.parse_args()
+
+
+def main():
+    global slow_delay, redirect_hops
+
+    args = arguments_parse()
+    slow_delay = args.slow_delay
+    redirect_hops = args.redirect_hops
+
+    if args.pagehawk:
+        pagehawk_cmd = args.pagehawk.split()
+    else:
+        pagehawk_cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "pagehawk.py")]
+
+    extra_args = [a for a in args.pagehawk_args if a != "--"]
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"[ERROR]: Unknown scenarios: {', '.join(unknown)}")
+        sys.exit(1)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix="pagehawk-bench-")
+
+    if args.startup:
+        try:
+            result = run_startup(pagehawk_cmd, workdir, args.startup_lines, args.startup_entries, args.runs)
+            print_result("Startup", result, list(result.keys()), baseline.get("startup"))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump({"startup": result}, f, indent=4)
+            print(f"\nResults saved to {args.save}")
+        return
+
+    ports, servers = servers_start(scenarios, workdir)
+    print("Benchmark servers: " + ", ".join(f"{name}=127.0.0.1:{port}" for name, port in ports.items()))
+
+    results = {}
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            output_dir = os.path.join(workdir, f"scan-{size}")
+            os.makedirs(output_dir)
+            targets_file = os.path.join(workdir, f"targets-{size}.txt")
+            sockets_count = build_targets(targets_file, size, len(ports))
+
+            print(f"\nScanning {sockets_count} sockets ({len(ports)} scenarios)...")
+            result = run_scan(pagehawk_cmd, targets_file, list(ports.values()), output_dir, args.threads, extra_args)
+            if result is None:
+                continue
+            results[str(size)] = result
+            print_result(f"{size} sockets", result, SCAN_METRICS, baseline.get(str(size)))
+    finally:
+        servers_stop_all(servers)
+        if not args.keep_output:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"\nOutput kept in {workdir}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nResults saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
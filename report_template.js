@@ -12,6 +12,15 @@ let reportData = {
 let flattenedVisits = [];
 let currentView = 'overview';
 let selectedScreenshot = null;
+let selectedScreenshotIndex = -1;
+let currentViewport = null;
+let shardIndex = null;
+let currentShard = null;
+let liveReport = null;
+let tableFeaturesReady = false;
+let outputButtonsReady = false;
+let tableRows = [];  // Table rows by index in flattenedVisits
+let sortState = {column: null, ascending: true};
 
 // ===========================
 // Data Transformation
@@ -37,24 +46,29 @@ function flattenVisitsData(data) {
             ipEntry.ports.forEach(portEntry => {
                 // Each portEntry is an object with one key (the port number)
                 for (const [portNum, portData] of Object.entries(portEntry)) {
+                    // Keep every port field (response, visits, screenshot paths, baseline status...)
                     flattened.push({
+                        ...portData,
                         ip: ip,
                         url: url,
-                        port: portNum,
-                        response: portData.response,
-                        visited_first: portData.visited_first,
-                        visited_last: portData.visited_last,
-                        user_agent: portData.user_agent,
-                        screenshot_path_full: portData.screenshot_path_full,
-                        screenshot_path_relative: portData.screenshot_path_relative,
-                        screenshot_pathname: portData.screenshot_pathname,
-                        screenshot_filename: portData.screenshot_filename
+                        port: portNum
                     });
                 }
             });
         }
     });
     
+    // Screenshots are stored by content hash: count the sockets sharing each one
+    const screenshotCounts = {};
+    flattened.forEach(visit => {
+        if (visit.screenshot_filename) {
+            screenshotCounts[visit.screenshot_filename] = (screenshotCounts[visit.screenshot_filename] || 0) + 1;
+        }
+    });
+    flattened.forEach(visit => {
+        visit.duplicates = visit.screenshot_filename ? screenshotCounts[visit.screenshot_filename] - 1 : 0;
+    });
+    
     return flattened;
 }
 
@@ -68,11 +82,20 @@ document.addEventListener('DOMContentLoaded', function() {
     initImageModal();
     
     // Load data from embedded json_data variable
-    if (typeof json_data !== 'undefined') {
+    if (typeof json_data !== 'undefined' && json_data.sharded) {
+        // Sharded report: only the index is embedded, shards are loaded on demand
+        loadShardIndex(json_data.sharded);
+    } else if (typeof json_data !== 'undefined' && json_data.live) {
+        // Live report: results are loaded from the chunk files PageHawk appends while scanning
+        loadLiveReport(json_data.live);
+    } else if (typeof json_data !== 'undefined') {
         reportData = json_data;
         // Flatten the nested structure for easier processing
         flattenedVisits = flattenVisitsData(reportData);
         updateReport();
+        if (reportData.changes) {
+            loadChanges(reportData.changes, reportData.diff);
+        }
     } else {
         initPlaceholders();
         console.error('No data available');
@@ -200,7 +223,8 @@ function loadScreenshots(visits) {
     withScreenshots.forEach((visit, index) => {
         const thumb = document.createElement('div');
         thumb.className = 'screenshot-thumbnail';
-        const screenshotPath = `${visit.screenshot_pathname}/${visit.screenshot_filename}`;
+        thumb.classList.toggle('active', index === selectedScreenshotIndex);
+        const screenshotPath = getScreenshotPath(visit);
         
         // Display URL if available, otherwise IP:port
         const displayTarget = visit.url ? visit.url : `${visit.ip}:${visit.port}`;
@@ -211,8 +235,8 @@ function loadScreenshots(visits) {
         let protocol = 'HTTP';
         let protocolClass = 'protocol-http';
         
-        // Check if HTTPS was used (port 443 or response indicates HTTPS)
-        if (port === 443 || visit.screenshot_filename.includes('https')) {
+        // Check if HTTPS was used (port 443 or the loaded page was HTTPS)
+        if (port === 443 || (visit.visited_url || '').startsWith('https')) {
             protocol = 'HTTPS';
             protocolClass = 'protocol-https';
         }
@@ -226,7 +250,7 @@ function loadScreenshots(visits) {
                 <span class="status-indicator ${statusClass}"></span>
                 <span class="${protocolClass}">${protocol}</span>
             </div>
-            <div class="thumb-overlay-top-right">${visit.port}</div>
+            <div class="thumb-overlay-top-right">${visit.port}${visit.duplicates ? ` <span class="duplicate-count" title="Same screenshot as ${visit.duplicates} other socket(s)">×${visit.duplicates + 1}</span>` : ''}</div>
             <div class="thumb-overlay-bottom">${displayTarget}</div>
         `;
         
@@ -246,6 +270,7 @@ function loadScreenshots(visits) {
 
 function selectScreenshot(visit, index) {
     selectedScreenshot = visit;
+    selectedScreenshotIndex = index;
     
     // Update thumbnail highlights
     document.querySelectorAll('.screenshot-thumbnail').forEach((thumb, i) => {
@@ -254,7 +279,7 @@ function selectScreenshot(visit, index) {
     
     // Update viewer
     const viewer = document.getElementById('screenshot-viewer');
-    const screenshotPath = `${visit.screenshot_pathname}/${visit.screenshot_filename}`;
+    const screenshotPath = getScreenshotPath(visit);
     
     // Display URL if available, otherwise IP:port
     const displayTarget = visit.url ? visit.url : `${visit.ip}:${visit.port}`;
@@ -272,6 +297,48 @@ function selectScreenshot(visit, index) {
     updateDetailsPanel(visit);
 }
 
+function getScreenshotPath(visit) {
+    // Screenshot of the selected viewport (--viewports), the main one otherwise
+    const entry = (currentViewport && visit.viewports && visit.viewports[currentViewport]) || visit;
+    return `${entry.screenshot_pathname}/${entry.screenshot_filename}`;
+}
+
+function initViewportToggle(visits) {
+    const profiles = [];
+    visits.forEach(visit => {
+        Object.keys(visit.viewports || {}).forEach(profile => {
+            if (!profiles.includes(profile)) {
+                profiles.push(profile);
+            }
+        });
+    });
+    
+    const toggle = document.getElementById('viewport-toggle');
+    if (profiles.length < 2) {
+        // A previously loaded shard may have had several viewports
+        currentViewport = null;
+        toggle.hidden = true;
+        return;
+    }
+    
+    currentViewport = profiles[0];
+    toggle.hidden = false;
+    toggle.innerHTML = profiles.map(profile =>
+        `<button class="output-btn${profile === currentViewport ? ' active' : ''}" data-viewport="${profile}">${profile}</button>`
+    ).join('');
+    
+    toggle.querySelectorAll('button').forEach(button => {
+        button.addEventListener('click', () => {
+            currentViewport = button.dataset.viewport;
+            toggle.querySelectorAll('button').forEach(other => other.classList.toggle('active', other === button));
+            loadScreenshots(flattenedVisits);
+            if (selectedScreenshot) {
+                selectScreenshot(selectedScreenshot, selectedScreenshotIndex);
+            }
+        });
+    });
+}
+
 function updateDetailsPanel(visit) {
     const detailsContent = document.getElementById('details-content');
     
@@ -282,6 +349,7 @@ function updateDetailsPanel(visit) {
     const urlDisplay = visit.url || '-';
     const ipLinkUrl = visit.ip ? `http://${visit.ip}:${visit.port}` : '#';
     const urlLinkUrl = visit.url ? (visit.url.startsWith('http') ? visit.url : `http://${visit.url}`) : '#';
+    const hostSockets = getFacets(flattenedVisits).host[visit.url || visit.ip] || 0;
     
     detailsContent.innerHTML = `
         <div class="detail-row">
@@ -302,6 +370,11 @@ function updateDetailsPanel(visit) {
                 <div class="detail-value ${statusClass}">${visit.response}</div>
             </div>
         </div>
+        ${hostSockets > 1 ? `
+        <div class="detail-row">
+            <div class="detail-label">Host</div>
+            <div class="detail-value">${hostSockets} sockets on this target</div>
+        </div>` : ''}
         <div class="detail-row">
             <div class="detail-label">First Visit</div>
             <div class="detail-value">${visit.visited_first || 'N/A'}</div>
@@ -310,6 +383,25 @@ function updateDetailsPanel(visit) {
             <div class="detail-label">Last Visit</div>
             <div class="detail-value">${visit.visited_last || 'N/A'}</div>
         </div>
+        <div class="detail-row">
+            <div class="detail-label">Visit Duration</div>
+            <div class="detail-value">${visit.visit_duration !== undefined && visit.visit_duration !== '' ? `${visit.visit_duration} s` : 'N/A'}</div>
+        </div>
+        ${visit.attempts && visit.attempts.length > 1 ? `
+        <div class="detail-row">
+            <div class="detail-label">Attempts</div>
+            <div class="detail-value">${visit.attempts.map(attempt => `${attempt.response} (${attempt.duration} s, timeout ${attempt.timeout} s)`).join(' → ')}</div>
+        </div>` : ''}
+        ${getTraceLinks(visit) ? `
+        <div class="detail-row">
+            <div class="detail-label">Trace</div>
+            <div class="detail-value" title="Open with: npx playwright show-trace FILE, or drop it on trace.playwright.dev">${getTraceLinks(visit)}</div>
+        </div>` : ''}
+        ${visit.baseline_status ? `
+        <div class="detail-row">
+            <div class="detail-label">Baseline</div>
+            <div class="detail-value">${visit.baseline_status}</div>
+        </div>` : ''}
         <div class="detail-row">
             <div class="detail-label">User Agent</div>
             <div class="detail-value">${visit.user_agent || 'N/A'}</div>
@@ -318,9 +410,78 @@ function updateDetailsPanel(visit) {
             <div class="detail-label">Screenshot</div>
             <div class="detail-value">${visit.screenshot_filename || 'N/A'}</div>
         </div>
+        ${visit.duplicates ? `
+        <div class="detail-row">
+            <div class="detail-label">Duplicates</div>
+            <div class="detail-value">Same screenshot as ${visit.duplicates} other socket(s)</div>
+        </div>` : ''}
+        ${visit.title ? `
+        <div class="detail-row">
+            <div class="detail-label">Title</div>
+            <div class="detail-value">${escapeHTML(visit.title)}</div>
+        </div>` : ''}
+        ${visit.server ? `
+        <div class="detail-row">
+            <div class="detail-label">Server</div>
+            <div class="detail-value">${escapeHTML(visit.server)}</div>
+        </div>` : ''}
+        ${visit.technologies && visit.technologies.length ? `
+        <div class="detail-row">
+            <div class="detail-label">Technologies</div>
+            <div class="detail-value">${visit.technologies.map(escapeHTML).join(', ')}</div>
+        </div>` : ''}
+        ${visit.tls_subject ? `
+        <div class="detail-row">
+            <div class="detail-label">Certificate</div>
+            <div class="detail-value">
+                ${escapeHTML(visit.tls_subject)} (issuer: ${escapeHTML(visit.tls_issuer || 'N/A')})
+                ${visit.tls_san && visit.tls_san.length ? `<br>SAN: ${visit.tls_san.map(escapeHTML).join(', ')}` : ''}
+                ${visit.tls_valid_to ? `<br>Expires: ${visit.tls_valid_to}` : ''}
+            </div>
+        </div>` : ''}
+        ${visit.favicon_hash ? `
+        <div class="detail-row">
+            <div class="detail-label">Favicon Hash</div>
+            <div class="detail-value">${visit.favicon_hash}</div>
+        </div>` : ''}
     `;
 }
 
+function getTraceLinks(visit) {
+    // Playwright traces kept by --trace, one per traced attempt
+    const traces = (visit.attempts || []).filter(attempt => attempt.trace_path);
+    if (!traces.length && visit.trace_path) {
+        traces.push({trace_path: visit.trace_path, response: visit.response});
+    }
+    return traces.map(attempt =>
+        `<a href="${escapeHTML(attempt.trace_path)}" download style="color: var(--accent-cyan); text-decoration: none;">${escapeHTML(attempt.trace_path.split('/').pop())}</a>` +
+        `${attempt.duration !== undefined ? ` (${escapeHTML(attempt.response)}, ${attempt.duration} s)` : ''}`
+    ).join('<br>');
+}
+
+function escapeHTML(value) {
+    // Titles, headers and certificates come from the scanned sites
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+function getFingerprintText(visit) {
+    // Fingerprint fields the table search matches, including those not shown in the table
+    return [
+        visit.title,
+        visit.server,
+        ...(visit.technologies || []),
+        visit.tls_subject,
+        visit.tls_issuer,
+        ...(visit.tls_san || []),
+        visit.favicon_hash
+    ].filter(Boolean).join(' ').toLowerCase();
+}
+
 function getStatusClass(response) {
     const resp = parseInt(response);
     if (!isNaN(resp)) {
@@ -337,9 +498,17 @@ function getStatusClass(response) {
 function loadTable(visits) {
     const tbody = document.getElementById('table-body');
     tbody.innerHTML = '';
+    tableRows = [];
+    sortState = {column: null, ascending: true};
+    document.querySelectorAll('.data-table th.sortable').forEach(header => {
+        header.classList.remove('sorted-asc', 'sorted-desc');
+    });
     
-    visits.forEach(visit => {
+    // Rows are built in a fragment, the table is only laid out once
+    const fragment = document.createDocumentFragment();
+    visits.forEach((visit, index) => {
         const row = document.createElement('tr');
+        row.dataset.index = index;
         const statusClass = getStatusClass(visit.response);
         const statusBadge = `<span class="status-badge ${statusClass}">${visit.response}</span>`;
         
@@ -356,27 +525,45 @@ function loadTable(visits) {
             <td>${targetDisplay}</td>
             <td>${portDisplay}</td>
             <td>${statusBadge}</td>
+            <td>${escapeHTML(visit.title || '-')}</td>
+            <td>${escapeHTML(visit.server || '-')}</td>
+            <td>${escapeHTML((visit.technologies || []).join(', ') || '-')}</td>
             <td>${visit.visited_first || 'N/A'}</td>
             <td>${visit.visited_last || 'N/A'}</td>
             <td>${visit.user_agent || 'N/A'}</td>
             <td>${screenshotIndicator}</td>
         `;
         
-        tbody.appendChild(row);
+        tableRows.push(row);
+        fragment.appendChild(row);
     });
+    tbody.appendChild(fragment);
     
+    loadFacets(visits);
     initTableFeatures();
 }
 
 function initTableFeatures() {
-    // Search functionality
+    // The table is reloaded with each shard of a sharded report, the listeners are added once
     const searchInput = document.getElementById('table-search');
+    if (tableFeaturesReady) {
+        filterTable(searchInput ? searchInput.value : '');
+        return;
+    }
+    tableFeaturesReady = true;
+    
+    // Search functionality
     if (searchInput) {
         searchInput.addEventListener('input', function(e) {
             filterTable(e.target.value);
         });
     }
     
+    // Response and port filters
+    document.querySelectorAll('.table-facets select').forEach(select => {
+        select.addEventListener('change', () => filterTable(searchInput ? searchInput.value : ''));
+    });
+    
     // Sortable columns
     const sortableHeaders = document.querySelectorAll('.data-table th.sortable');
     sortableHeaders.forEach(header => {
@@ -430,11 +617,11 @@ function getVisibleTableData() {
     const visibleRows = [];
     const rows = document.querySelectorAll('#table-body tr');
     
-    rows.forEach((row, index) => {
+    rows.forEach(row => {
         // Check if row is visible (not filtered out)
         if (row.style.display !== 'none') {
-            // Get the corresponding data from flattenedVisits
-            visibleRows.push(flattenedVisits[index]);
+            // Get the corresponding data from flattenedVisits (rows may be sorted)
+            visibleRows.push(flattenedVisits[row.dataset.index]);
         }
     });
     
@@ -443,7 +630,7 @@ function getVisibleTableData() {
 
 function generateCSVFromData(data) {
     // Create CSV header
-    const headers = ['Target', 'Port', 'Response', 'First Visit', 'Last Visit', 'User Agent', 'Screenshot'];
+    const headers = ['Target', 'Port', 'Response', 'Title', 'Server', 'Technologies', 'TLS Subject', 'TLS SAN', 'TLS Expiry', 'Favicon Hash', 'First Visit', 'Last Visit', 'User Agent', 'Screenshot'];
     let csv = headers.join(',') + '\n';
     
     // Add data rows
@@ -469,6 +656,13 @@ function generateCSVFromData(data) {
             escapeCSV(target),
             escapeCSV(port),
             escapeCSV(response),
+            escapeCSV(visit.title || ''),
+            escapeCSV(visit.server || ''),
+            escapeCSV((visit.technologies || []).join('; ')),
+            escapeCSV(visit.tls_subject || ''),
+            escapeCSV((visit.tls_san || []).join('; ')),
+            escapeCSV(visit.tls_valid_to || ''),
+            escapeCSV(visit.favicon_hash || ''),
             escapeCSV(firstVisit),
             escapeCSV(lastVisit),
             escapeCSV(userAgent),
@@ -484,16 +678,372 @@ function generateCSVFromData(data) {
 function filterTable(searchTerm) {
     const rows = document.querySelectorAll('#table-body tr');
     const term = searchTerm.toLowerCase();
+    const response = document.getElementById('facet-response').value;
+    const port = document.getElementById('facet-port').value;
     
     rows.forEach(row => {
+        const visit = flattenedVisits[row.dataset.index];
         const text = row.textContent.toLowerCase();
-        row.style.display = text.includes(term) ? '' : 'none';
+        const matches = (!response || String(visit.response || '-') === response)
+            && (!port || String(visit.port) === port)
+            && (!term || text.includes(term) || getFingerprintText(visit).includes(term));
+        row.style.display = matches ? '' : 'none';
+    });
+}
+
+function getFacets(visits) {
+    // Response, port and host counts, precomputed by PageHawk when available
+    const aggregates = reportData.aggregates;
+    if (aggregates && aggregates.facets && aggregates.stats.total === visits.length) {
+        return aggregates.facets;
+    }
+    const facets = {response: {}, port: {}, host: {}};
+    visits.forEach(visit => {
+        const values = {response: String(visit.response || '-'), port: String(visit.port), host: visit.url || visit.ip};
+        Object.entries(values).forEach(([facet, value]) => {
+            facets[facet][value] = (facets[facet][value] || 0) + 1;
+        });
+    });
+    return facets;
+}
+
+function loadFacets(visits) {
+    const facets = getFacets(visits);
+    [['facet-response', 'response', 'All responses'], ['facet-port', 'port', 'All ports']].forEach(([id, facet, allLabel]) => {
+        const select = document.getElementById(id);
+        const selected = select.value;
+        const values = Object.entries(facets[facet]).sort((a, b) => b[1] - a[1]);
+        select.innerHTML = `<option value="">${allLabel}</option>` + values.map(([value, count]) =>
+            `<option value="${escapeHTML(value)}">${escapeHTML(value)} (${count})</option>`
+        ).join('');
+        // Keep the filter when another shard is loaded, if it has that value
+        select.value = facets[facet][selected] ? selected : '';
     });
 }
 
 function sortTable(column) {
-    // Table sorting logic will be implemented here
-    console.log('Sort by:', column);
+    /**
+     * Sort the table by a column, clicking it again reverses the order.
+     * Uses the sort order precomputed by PageHawk, the rows are only moved.
+     */
+    const ascending = sortState.column === column ? !sortState.ascending : true;
+    sortState = {column, ascending};
+    
+    const aggregates = reportData.aggregates;
+    let order = aggregates && aggregates.sort && aggregates.sort[column];
+    if (!order || order.length !== tableRows.length) {
+        order = computeSortOrder(column);
+    }
+    if (!ascending) {
+        order = order.slice().reverse();
+    }
+    
+    const fragment = document.createDocumentFragment();
+    order.forEach(index => fragment.appendChild(tableRows[index]));
+    document.getElementById('table-body').appendChild(fragment);
+    
+    document.querySelectorAll('.data-table th.sortable').forEach(header => {
+        header.classList.remove('sorted-asc', 'sorted-desc');
+        if (header.getAttribute('data-column') === column) {
+            header.classList.add(ascending ? 'sorted-asc' : 'sorted-desc');
+        }
+    });
+}
+
+function computeSortOrder(column) {
+    // Reports without precomputed aggregates (older reports): sort in the browser
+    const key = (visit) => {
+        if (column === 'ip') return (visit.url || visit.ip || '').toLowerCase();
+        if (column === 'port' || column === 'response') {
+            const number = parseInt(visit[column]);
+            return isNaN(number) ? Infinity : number;
+        }
+        return String(visit[column] || '').toLowerCase() || '\uffff';
+    };
+    const keys = flattenedVisits.map(key);
+    return keys.map((_, index) => index).sort((a, b) => (keys[a] < keys[b] ? -1 : keys[a] > keys[b] ? 1 : a - b));
+}
+
+// ===========================
+// Changes Section Functions
+// ===========================
+
+function loadChanges(changes, diff) {
+    /**
+     * Show the changes of a diff report, already sorted by change score
+     */
+    document.getElementById('nav-changes').style.display = '';
+    
+    if (diff) {
+        const s = diff.summary;
+        document.getElementById('changes-summary').textContent =
+            `${diff.old} → ${diff.new}: ${s.changed} changed, ${s.added} added, ${s.removed} removed, ${s.unchanged} unchanged`;
+    }
+    
+    const tbody = document.getElementById('changes-body');
+    tbody.innerHTML = '';
+    
+    const thumbnail = (path) => path
+        ? `<img class="change-thumb" src="${path}" alt="">`
+        : '<span class="screenshot-no">✗</span>';
+    
+    changes.forEach(change => {
+        const row = document.createElement('tr');
+        const targetDisplay = change.url ? change.url : change.ip;
+        const responseOld = change.response_old || '-';
+        const responseNew = change.response_new || '-';
+        
+        row.innerHTML = `
+            <td>${targetDisplay}</td>
+            <td>${change.port}</td>
+            <td>${change.change}${change.error ? ` <span title="${change.error}">⚠</span>` : ''}</td>
+            <td class="change-score">${Math.round(change.score * 100)}%</td>
+            <td><span class="status-badge ${getStatusClass(responseOld)}">${responseOld}</span> → <span class="status-badge ${getStatusClass(responseNew)}">${responseNew}</span></td>
+            <td>${thumbnail(change.screenshot_old)}</td>
+            <td>${thumbnail(change.screenshot_new)}</td>
+        `;
+        
+        row.querySelectorAll('.change-thumb').forEach(img => {
+            img.addEventListener('click', () => openModal(img.getAttribute('src')));
+        });
+        
+        tbody.appendChild(row);
+    });
+}
+
+// ===========================
+// Shards Section Functions
+// ===========================
+
+function loadShardIndex(index) {
+    /**
+     * Show the index of a sharded report: aggregate stats, summaries and the shard list.
+     * Opens the shard named in the URL (#shard-N), so a shard can be bookmarked.
+     */
+    shardIndex = index;
+    document.getElementById('nav-shards').style.display = '';
+    
+    const accessiblePercent = index.sockets ? Math.round(index.accessible * 100 / index.sockets) : 0;
+    document.getElementById('shards-summary').textContent =
+        `${index.sockets} sockets in ${index.shards.length} shards (by ${typeof index.mode === 'number' ? `${index.mode} sockets` : index.mode}): ` +
+        `${index.accessible} accessible (${accessiblePercent}%), ${index.unique_screenshots} unique screenshots out of ${index.screenshots}`;
+    
+    const countsBox = (title, counts) => `
+        <div class="output-box">
+            <div class="output-header"><h3>${title}</h3></div>
+            <div class="shard-counts">
+                ${counts.length ? counts.map(([name, count]) =>
+                    `<div class="shard-count-row"><span title="${escapeHTML(name)}">${escapeHTML(name)}</span><span>${count}</span></div>`
+                ).join('') : 'N/A'}
+            </div>
+        </div>`;
+    document.getElementById('shards-aggregates').innerHTML =
+        countsBox('Responses', index.statuses) +
+        countsBox('Servers', index.servers) +
+        countsBox('Technologies', index.technologies) +
+        countsBox('Favicon Hashes', index.favicons);
+    
+    const shardsBody = document.getElementById('shards-body');
+    shardsBody.innerHTML = '';
+    index.shards.forEach(shard => {
+        const row = document.createElement('tr');
+        row.dataset.shard = shard.id;
+        row.innerHTML = `
+            <td>${escapeHTML(shard.label)}</td>
+            <td>${shard.sockets}</td>
+            <td>${shard.accessible}</td>
+            <td>${shard.screenshots}</td>
+        `;
+        row.addEventListener('click', () => loadShard(shard.id));
+        shardsBody.appendChild(row);
+    });
+    
+    const clustersBody = document.getElementById('clusters-body');
+    clustersBody.innerHTML = '';
+    index.clusters.forEach(cluster => {
+        const row = document.createElement('tr');
+        row.innerHTML = `
+            <td><img class="change-thumb" src="${cluster.screenshot}" alt="" loading="lazy"></td>
+            <td>${cluster.count}</td>
+            <td>${escapeHTML(cluster.target)}</td>
+            <td>${escapeHTML((index.shards.find(shard => shard.id === cluster.shard) || {}).label || '-')}</td>
+        `;
+        row.addEventListener('click', () => loadShard(cluster.shard));
+        clustersBody.appendChild(row);
+    });
+    
+    updateReport();
+    const requested = parseInt(location.hash.replace('#shard-', ''));
+    if (index.shards.some(shard => shard.id === requested)) {
+        loadShard(requested);
+    } else {
+        switchView('shards');
+    }
+}
+
+function loadShard(id) {
+    /**
+     * Load the sidecar script of a shard, it calls pagehawkShard() with its data.
+     * A script tag works on file:// pages, where fetch() is blocked.
+     */
+    const shard = shardIndex.shards.find(s => s.id === id);
+    if (!shard) {
+        return;
+    }
+    
+    const previous = document.getElementById('shard-script');
+    if (previous) {
+        previous.remove();
+    }
+    const script = document.createElement('script');
+    script.id = 'shard-script';
+    script.src = shard.file;
+    script.onerror = () => {
+        document.getElementById('shards-summary').textContent = `Could not load ${shard.file}, it must stay next to the report`;
+        switchView('shards');
+    };
+    document.body.appendChild(script);
+}
+
+function pagehawkShard(id, data) {
+    /**
+     * Called by a shard sidecar script: show its sockets in the overview and table.
+     * Only the current shard is kept in memory.
+     */
+    const shard = shardIndex.shards.find(s => s.id === id);
+    currentShard = id;
+    reportData = data;
+    flattenedVisits = flattenVisitsData(data);
+    selectedScreenshot = null;
+    selectedScreenshotIndex = -1;
+    updateReport();
+    
+    document.querySelector('.tagline').textContent = `Reconnaissance Report · ${shard ? shard.label : `shard ${id}`}`;
+    document.querySelectorAll('#shards-body tr').forEach(row => {
+        row.classList.toggle('active', parseInt(row.dataset.shard) === id);
+    });
+    history.replaceState(null, '', `#shard-${id}`);
+    switchView('overview');
+}
+
+// ===========================
+// Live Report Functions
+// ===========================
+
+function loadLiveReport(live) {
+    /**
+     * Start polling the index of a live report (--live-report).
+     */
+    liveReport = {
+        dir: live.dir,
+        pollSeconds: live.poll_seconds || 5,
+        index: null,
+        loaded: 0,              // Chunks loaded so far
+        positions: new Map(),   // Socket key -> position in reportData.ips
+        changed: false
+    };
+    reportData = {ips: []};
+    updateReport();
+    pollLiveReport();
+}
+
+function loadLiveScript(id, src, onerror) {
+    // A script tag works on file:// pages, where fetch() is blocked
+    const previous = document.getElementById(id);
+    if (previous) {
+        previous.remove();
+    }
+    const script = document.createElement('script');
+    script.id = id;
+    script.src = src;
+    script.onerror = onerror;
+    document.body.appendChild(script);
+}
+
+function pollLiveReport() {
+    // The query string keeps the browser from reusing a cached index
+    loadLiveScript('live-index-script', `${liveReport.dir}/index.js?${Date.now()}`, () => {
+        document.querySelector('.tagline').textContent = `Reconnaissance Report · waiting for ${liveReport.dir}/index.js`;
+        setTimeout(pollLiveReport, liveReport.pollSeconds * 1000);
+    });
+}
+
+function pagehawkLiveIndex(index) {
+    /**
+     * Called by the index script of a live report: load the chunks that are
+     * not loaded yet, one after the other.
+     */
+    liveReport.index = index;
+    loadLiveChunks();
+}
+
+function loadLiveChunks() {
+    const index = liveReport.index;
+    if (liveReport.loaded < index.chunks) {
+        const file = `${liveReport.dir}/chunk-${String(liveReport.loaded).padStart(5, '0')}.js`;
+        loadLiveScript('live-chunk-script', file, () => setTimeout(pollLiveReport, liveReport.pollSeconds * 1000));
+        return;
+    }
+    
+    // Caught up with the index: show the new results once
+    if (index.finished) {
+        reportData.aggregates = index.aggregates;
+    }
+    if (liveReport.changed || index.finished) {
+        liveReport.changed = false;
+        refreshLiveReport();
+    }
+    const progress = `${index.sockets}/${index.total} sockets`;
+    document.querySelector('.tagline').textContent = index.finished
+        ? `Reconnaissance Report · ${progress}`
+        : `Reconnaissance Report · live: ${progress}, updated ${index.updated}`;
+    if (!index.finished) {
+        setTimeout(pollLiveReport, liveReport.pollSeconds * 1000);
+    }
+}
+
+function pagehawkLive(id, records) {
+    /**
+     * Called by a chunk script of a live report: add its visits, a socket
+     * visited again (retries) replaces its earlier record in place.
+     */
+    if (id !== liveReport.loaded) {
+        return;
+    }
+    records.forEach(record => {
+        const key = `${record.ip}|${record.url}|${record.port}`;
+        const entry = {ip: record.ip, url: record.url, ports: [{[record.port]: record.data}]};
+        if (liveReport.positions.has(key)) {
+            reportData.ips[liveReport.positions.get(key)] = entry;
+        } else {
+            liveReport.positions.set(key, reportData.ips.length);
+            reportData.ips.push(entry);
+        }
+    });
+    liveReport.loaded++;
+    liveReport.changed = true;
+    loadLiveChunks();
+}
+
+function refreshLiveReport() {
+    // Redraw with the loaded results, keeping the selected screenshot and the table order
+    const selected = selectedScreenshot ? `${selectedScreenshot.ip}|${selectedScreenshot.url}|${selectedScreenshot.port}` : null;
+    const sorted = sortState.column ? {...sortState} : null;
+    
+    flattenedVisits = flattenVisitsData(reportData);
+    updateReport();
+    
+    if (sorted) {
+        sortState = {column: sorted.column, ascending: !sorted.ascending};
+        sortTable(sorted.column);
+    }
+    if (selected) {
+        const visits = flattenedVisits.filter(visit => visit.screenshot_filename);
+        const index = visits.findIndex(visit => `${visit.ip}|${visit.url}|${visit.port}` === selected);
+        if (index >= 0) {
+            selectScreenshot(visits[index], index);
+        }
+    }
 }
 
 // ===========================
@@ -501,6 +1051,16 @@ function sortTable(column) {
 // ===========================
 
 function generateOutputs(visits) {
+    // Lists precomputed by PageHawk
+    const aggregates = reportData.aggregates;
+    if (aggregates && aggregates.outputs && aggregates.stats.total === visits.length) {
+        Object.entries(aggregates.outputs).forEach(([outputId, content]) => {
+            document.getElementById(`output-${outputId}`).value = content;
+        });
+        initOutputButtons();
+        return;
+    }
+    
     // Helper function to get unique targets (IP or URL)
     const getTarget = (visit) => visit.url || visit.ip;
     
@@ -540,6 +1100,12 @@ function generateOutputs(visits) {
 }
 
 function initOutputButtons() {
+    // Outputs are regenerated with each shard of a sharded report, the listeners are added once
+    if (outputButtonsReady) {
+        return;
+    }
+    outputButtonsReady = true;
+    
     // Copy buttons
     document.querySelectorAll('.copy-btn').forEach(btn => {
         btn.addEventListener('click', function() {
@@ -664,6 +1230,7 @@ function updateReport() {
     updateStats(flattenedVisits);
     
     // Load screenshots in overview
+    initViewportToggle(flattenedVisits);
     loadScreenshots(flattenedVisits);
     
     // Load table
@@ -674,16 +1241,31 @@ function updateReport() {
 }
 
 function updateStats(visits) {
+    // Stats precomputed by PageHawk
+    const aggregates = reportData.aggregates;
+    if (aggregates && aggregates.stats && aggregates.stats.total === visits.length) {
+        document.getElementById('total-scanned').textContent = aggregates.stats.total;
+        document.getElementById('accessible').textContent = aggregates.stats.accessible;
+        document.getElementById('unreachable').textContent = aggregates.stats.unreachable;
+        document.getElementById('unique-screenshots').textContent = aggregates.stats.unique_screenshots;
+        document.getElementById('duplicate-screenshots').textContent = aggregates.stats.duplicate_screenshots;
+        return;
+    }
+    
     const total = visits.length;
     const accessible = visits.filter(v => {
         const resp = parseInt(v.response);
         return !isNaN(resp) && resp >= 200 && resp < 400;
     }).length;
     const unreachable = total - accessible;
+    const uniqueScreenshots = new Set(visits.filter(v => v.screenshot_filename).map(v => v.screenshot_filename)).size;
+    const duplicateScreenshots = visits.filter(v => v.screenshot_filename).length - uniqueScreenshots;
     
     document.getElementById('total-scanned').textContent = total;
     document.getElementById('accessible').textContent = accessible;
     document.getElementById('unreachable').textContent = unreachable;
+    document.getElementById('unique-screenshots').textContent = uniqueScreenshots;
+    document.getElementById('duplicate-screenshots').textContent = duplicateScreenshots;
 }
 
 // ===========================
@@ -700,5 +1282,6 @@ window.PageHawk = {
     loadReportData,
     updateReport,
     switchView,
-    selectScreenshot
+    selectScreenshot,
+    loadShard
 };